@@ -1,76 +1,203 @@
-from io import StringIO
-from datetime import datetime
+from bisect import bisect_left, bisect_right
+from time_lookup import Time_Lookup
 
 
-class Alert:
+class Alert_Record:
     """
-    Designed to manage and send weather alerts and warnings based on geographical location
+    Holds a single weather alert parsed once from the API data, with its effective and expiry times stored as epochs
     """
-    def __init__(self, forecast_alert_data):
-        self.forecast_alert_data = forecast_alert_data
+    __slots__ = ("headline", "msgtype", "severity", "event", "urgency", "effective", "expires", "effective_epoch",
+                 "expires_epoch", "locations")
 
-    def filter_alert_metrics(self):
+    def __init__(self, raw_alert):
+        self.headline = raw_alert["headline"]
+        self.msgtype = raw_alert["msgtype"]
+        self.severity = raw_alert["severity"]
+        self.event = raw_alert["event"]
+        self.urgency = raw_alert["urgency"]
+        self.effective, self.effective_epoch = Time_Lookup.parse_alert_timestamp(raw_alert["effective"])
+        self.expires, self.expires_epoch = Time_Lookup.parse_alert_timestamp(raw_alert["expires"])
+        self.locations = set()
+
+    @staticmethod
+    def build_key(raw_alert):
         """
-        Retrieves the latest weather alert from the specified geographical location
+        Builds the identity of an alert so the same alert repeated across days and locations is only stored once
 
-        Each entry contains the following key-value pairs:
-            - headline
-            - msgtype
-            - severity
-            - event
-            - urgency
-            - effective
-            - expires
+        :param raw_alert: A single alert entry from the API response
 
-        :return: List containing the latest weather alert data
+        :return: Tuple identifying the alert
         """
-        if self.forecast_alert_data:
-            last_weather_alert_index = self.forecast_alert_data[-1]
-            return {"headline": last_weather_alert_index["headline"], "msgtype": last_weather_alert_index["msgtype"],
-                    "severity": last_weather_alert_index["severity"], "event": last_weather_alert_index["event"],
-                    "urgency": last_weather_alert_index["urgency"],
-                    "effective": datetime.strptime(last_weather_alert_index["effective"],
-                                                   "%Y-%m-%dT%H:%M:%S%z").strftime("%Y-%m-%d (%H:%M)"),
-                    "expires": datetime.strptime(last_weather_alert_index["expires"],
-                                                 "%Y-%m-%dT%H:%M:%S%z").strftime("%Y-%m-%d (%H:%M)")
-                    }
-        else:
-            return None
+        return (raw_alert["event"], raw_alert["headline"], raw_alert["effective"], raw_alert["expires"],
+                raw_alert.get("areas", ""))
 
-    def alert_summary(self):
+    def __getitem__(self, key):
         """
-        Generates a summary of any active weather alerts or warnings
+        Allows the record to be read like the dictionary previously returned by 'filter_alert_metrics'
+
+        :param key: Name of the alert attribute (e.g. 'severity')
 
-        :return: A formatted string describing the status of weather alerts for the forecast period
+        :return: Value of the requested attribute
         """
-        string_builder = StringIO()
-        alert_data = self.filter_alert_metrics()
-        string_builder.write(f"Alert: {self.alert_status(alert_data)}\n")
-        return string_builder.getvalue()
+        return getattr(self, key)
+
+
+class Alert_Index:
+    """
+    Stores deduplicated weather alerts in an interval index keyed on their effective and expiry times. An index
+    belongs to one forecast ('for_forecast'): it is filled and rebuilt before its reports are rendered, possibly on
+    several threads, which only read it. The alert monitor keeps one long-lived index on its own thread instead, adding
+    each poll's alerts and evicting the expired ones
+    """
+    # Higher rank sorts first when several alerts overlap the same window
+    SEVERITY_RANK = {"extreme": 4, "severe": 3, "moderate": 2, "minor": 1}
+    URGENCY_RANK = {"immediate": 4, "expected": 3, "future": 2, "past": 1}
 
-    def alert_status(self, alert_data):
+    def __init__(self):
+        self.records = {}
+        # (effective epochs, running maximum of expiry epochs, records sorted by effective time)
+        self.interval_index = ((), (), ())
+        self.is_stale = False
+
+    @staticmethod
+    def for_forecast(forecast):
+        """
+        Returns the alert index of a forecast, building it on first use so every report of the forecast shares it
+
+        :param forecast: A Forecast instance from a weather provider
+
+        :return: The forecast's rebuilt Alert_Index
         """
-        Assesses whether the array contains any alert data and returns the status as a string
+        if forecast.alert_index is None:
+            alert_index = Alert_Index()
+            alert_index.add_alerts(forecast.alerts, forecast.location_key)
+            alert_index.rebuild()
+            forecast.alert_index = alert_index
+        return forecast.alert_index
 
-        :returns: 'ACTIVE' and its severity if an alert is detected, otherwise 'NOT ACTIVE'
+    def add_alerts(self, forecast_alert_data, location_key=None):
         """
-        return f"🟩 NOT ACTIVE" if not alert_data else f"🟥 ACTIVE ({alert_data['severity'].upper()})"
+        Parses and stores alerts from one API response, skipping alerts that are already indexed
 
-    def alert_report(self):
+        :param forecast_alert_data: List of alert entries from the API response ('alerts' -> 'alert')
+        :param location_key: Identifier of the location the alerts were fetched for
+
+        :return: List of records that were not previously indexed
+        """
+        new_records = []
+        for raw_alert in forecast_alert_data or []:
+            alert_key = Alert_Record.build_key(raw_alert)
+            record = self.records.get(alert_key)
+            if record is None:
+                record = Alert_Record(raw_alert)
+                self.records[alert_key] = record
+                new_records.append(record)
+            record.locations.add(location_key)
+        if new_records:
+            self.is_stale = True
+        return new_records
+
+    def evict_expired(self, now_epoch):
         """
-        Generates a formatted summary of active weather alerts and warnings
+        Drops the alerts that expired before a point in time, so a long-running index only holds current alerts
+
+        :param now_epoch: Current time as a Unix timestamp
+
+        :return: Number of alerts dropped
+        """
+        expired_keys = [alert_key for alert_key, record in self.records.items() if record.expires_epoch <= now_epoch]
+        for alert_key in expired_keys:
+            del self.records[alert_key]
+        if expired_keys:
+            self.is_stale = True
+        return len(expired_keys)
+
+    def rebuild(self):
+        """
+        Sorts records by effective time and builds a running maximum of expiry times so a window query only needs two
+        binary searches to find its candidate range, even when long-running alerts contain shorter ones
+
+        :return: The new interval index
+        """
+        sorted_records = sorted(self.records.values(), key=lambda record: record.effective_epoch)
+        max_expires_epochs = []
+        running_max = None
+        for record in sorted_records:
+            running_max = record.expires_epoch if running_max is None else max(running_max, record.expires_epoch)
+            max_expires_epochs.append(running_max)
+        self.interval_index = (tuple(record.effective_epoch for record in sorted_records),
+                               tuple(max_expires_epochs), tuple(sorted_records))
+        self.is_stale = False
+        return self.interval_index
+
+    def query(self, window_start_epoch, window_end_epoch, location_key=None):
+        """
+        Finds the alerts that intersect a time window, ranked by severity and then urgency
+
+        :param window_start_epoch: Start of the window as a Unix timestamp
+        :param window_end_epoch: End of the window as a Unix timestamp
+        :param location_key: Only return alerts issued for this location when provided
+
+        :return: List of overlapping alert records, most severe first
+        """
+        effective_epochs, max_expires_epochs, sorted_records = self.rebuild() if self.is_stale else self.interval_index
+        # Records before 'first_index' all expired before the window opened
+        first_index = bisect_right(max_expires_epochs, window_start_epoch)
+        # Records from 'last_index' onwards only become effective after the window closed
+        last_index = bisect_left(effective_epochs, window_end_epoch)
+        overlapping = [record for record in sorted_records[first_index:last_index]
+                       if record.expires_epoch > window_start_epoch and
+                       (location_key is None or location_key in record.locations)]
+        return sorted(overlapping, key=self.rank, reverse=True)
+
+    def rank(self, record):
+        """
+        Builds the sort key used to rank overlapping alerts
+
+        :param record: An alert record
+
+        :return: Tuple of severity rank, urgency rank and effective time
+        """
+        return (self.SEVERITY_RANK.get(record.severity.lower(), 0), self.URGENCY_RANK.get(record.urgency.lower(), 0),
+                -record.effective_epoch)
+
+
+class Alert:
+    """
+    Designed to manage and send weather alerts and warnings based on geographical location
+    """
+    def __init__(self, alert_index, forecast_data, start_time, end_time, location_key=None, alerts_available=True):
+        self.alert_index = alert_index
+        self.forecast_data = forecast_data
+        self.start_time = start_time
+        self.end_time = end_time
+        self.location_key = location_key
+        self.alerts_available = alerts_available
+
+    def calculate_window_epochs(self):
+        """
+        Converts the assigned start and end hour of the forecast day into Unix timestamps using the API's hourly epochs
+
+        :return: Tuple containing the window start and end timestamps
+        """
+        hourly_forecast_data = self.forecast_data["hour"]
+        return (hourly_forecast_data[self.start_time]["time_epoch"],
+                hourly_forecast_data[self.end_time - 1]["time_epoch"] + 3600)
+
+    def filter_alert_metrics(self):
+        """
+        Retrieves the weather alerts that overlap the assigned window of the forecast day
+
+        Each record contains the following attributes:
+            - headline
+            - msgtype
+            - severity
+            - event
+            - urgency
+            - effective
+            - expires
 
-        :return: A structured string report containing headers, status, and detailed information
+        :return: List of overlapping alert records ranked by severity and urgency
         """
-        alert_data = self.filter_alert_metrics()
-        string_builder = StringIO()
-        alert_status = self.alert_status(alert_data)
-        string_builder.write(f"\n= = = ⚠️ ALERT ⚠️ = = =\n")
-        if alert_data:
-            string_builder.write(f"{alert_data['effective']} - {alert_data['expires']}\n"
-                                 f"{alert_status}\n"
-                                 f"Hazard: {alert_data['event'].upper()}\n"
-                                 f"Note: {alert_data['headline'].upper()}\n")
-        else:
-            string_builder.write(f"{alert_status} (REPORT OMITTED)\n")
-        return string_builder.getvalue()
+        window_start_epoch, window_end_epoch = self.calculate_window_epochs()
+        return self.alert_index.query(window_start_epoch, window_end_epoch, self.location_key)
@@ -0,0 +1,119 @@
+import os
+import time
+from collections import deque
+from dotenv import load_dotenv
+from weather_api import Weather_API
+from alert import Alert_Index, Alert_Record
+from messenger import Messenger
+
+
+class Alert_Monitor:
+    """
+    Polls the weather API for new alerts at a short interval and pushes a compact notification as soon as one appears,
+    without waiting for the daily report
+    """
+    # Seconds between polls; a new alert reaches players within roughly this many seconds plus the request times
+    POLL_INTERVAL_SECONDS = 60
+    # Number of recent notification latencies kept
+    HISTORY_SIZE = 1000
+
+    def __init__(self, locations, poll_interval_seconds=POLL_INTERVAL_SECONDS, notify=Messenger.send_text,
+                 alert_index=None, notify_existing=False, fetch_alerts=Weather_API.fetch_weather_alerts):
+        self.locations = locations
+        self.poll_interval_seconds = poll_interval_seconds
+        self.notify = notify
+        self.alert_index = alert_index or Alert_Index()
+        self.notify_existing = notify_existing
+        self.fetch_alerts = fetch_alerts
+        self.seen_alert_keys = {}
+        self.notification_latencies = deque(maxlen=self.HISTORY_SIZE)
+
+    def poll_once(self):
+        """
+        Fetches the alerts of every location once and notifies about alerts that were not present in the previous poll.
+        On the first poll of a location, alerts already active are only recorded unless 'notify_existing' is set. An
+        alert is only marked as seen once its notification was sent, so a failed send is retried on the next poll. A
+        location whose fetch or notification fails is reported and skipped, so it does not hold back the others
+
+        :return: List of (location, alert record) pairs that were notified
+        """
+        notified = []
+        self.alert_index.evict_expired(time.time())
+        for location in self.locations:
+            try:
+                self.poll_location(location, notified)
+            except Exception as error:
+                print(f"Alert Poll Failed ({location}):\n"
+                      f"{error}")
+        return notified
+
+    def poll_location(self, location, notified):
+        """
+        Fetches the alerts of one location and notifies about the alerts that were not seen before
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param notified: List the notified (location, alert record) pairs are appended to
+
+        :return: None
+        """
+        poll_started = time.monotonic()
+        weather_data = self.fetch_alerts(location, self.poll_interval_seconds / 2)
+        raw_alerts = weather_data.get("alerts", {}).get("alert", [])
+        self.alert_index.add_alerts(raw_alerts, location)
+
+        current_alerts = {Alert_Record.build_key(raw_alert): raw_alert for raw_alert in raw_alerts}
+        previous_keys = self.seen_alert_keys.get(location)
+        if previous_keys is None and not self.notify_existing:
+            self.seen_alert_keys[location] = set(current_alerts)
+            return
+
+        # Alerts that are no longer issued are forgotten, so they are announced again if they return
+        seen_keys = self.seen_alert_keys[location] = (previous_keys or set()) & current_alerts.keys()
+        for alert_key in current_alerts.keys() - seen_keys:
+            record = self.alert_index.records[alert_key]
+            self.notify(self.format_notification(weather_data.get("location"), record))
+            seen_keys.add(alert_key)
+            self.notification_latencies.append(time.monotonic() - poll_started)
+            notified.append((location, record))
+
+    def format_notification(self, forecast_location_data, record):
+        """
+        Builds a short notification for a newly issued alert
+
+        :param forecast_location_data: The 'location' section of the API response (may be None)
+        :param record: The alert record to announce
+
+        :return: A compact string describing the alert
+        """
+        location_name = forecast_location_data["name"] if forecast_location_data else "Your Area"
+        return (f"⚠️ {record.event.upper()} ({record.severity.upper()}) - {location_name}\n"
+                f"{record.effective} - {record.expires}\n"
+                f"{record.headline}")
+
+    def run(self, max_polls=None):
+        """
+        Keeps polling at a fixed interval. The sleep between polls is shortened by the time the poll itself took so
+        the interval does not drift
+
+        :param max_polls: Stops after this many polls when provided (runs indefinitely otherwise)
+
+        :return: None
+        """
+        poll_count = 0
+        while max_polls is None or poll_count < max_polls:
+            poll_started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as error:
+                print(f"Alert Poll Failed:\n"
+                      f"{error}")
+            poll_count += 1
+            if max_polls is None or poll_count < max_polls:
+                time.sleep(max(0.0, self.poll_interval_seconds - (time.monotonic() - poll_started)))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    # ALERT_LOCATIONS holds semicolon separated coordinates (e.g. "43.65,-79.38;45.50,-73.57")
+    monitored_locations = os.getenv("ALERT_LOCATIONS", f"{os.getenv('LAT')},{os.getenv('LON')}").split(";")
+    Alert_Monitor(monitored_locations).run()
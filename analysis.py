@@ -0,0 +1,69 @@
+from types import MappingProxyType
+
+
+class Impact:
+    """
+    Impact of an analyzed value: a level (LOW, MODERATE or HIGH, where HIGH also covers the labels beyond it) and a
+    label such as 'MODERATE (BALL SWERVE)'. Renderers decide how a level is displayed
+    """
+    __slots__ = ("level", "label")
+    LOW = 0
+    MODERATE = 1
+    HIGH = 2
+
+    def __init__(self, level, label):
+        self.level = min(level, self.HIGH)
+        self.label = label
+
+    def to_dict(self):
+        """
+        Converts the impact into JSON-compatible data
+
+        :return: Dictionary with the impact 'level' and 'label'
+        """
+        return {"level": self.level, "label": self.label}
+
+    def __eq__(self, other):
+        return isinstance(other, Impact) and (self.level, self.label) == (other.level, other.label)
+
+    def __hash__(self):
+        return hash((self.level, self.label))
+
+    def __repr__(self):
+        return f"Impact({self.level}, {self.label!r})"
+
+
+class Read_Only_Analysis:
+    """
+    Base class of the analyzers. Every result is computed in '__init__' from the constructor's inputs and attributes
+    cannot be changed afterwards, so one analysis of a location-day can be shared by many threads and reports
+    """
+    __slots__ = ()
+
+    def assign(self, **attributes):
+        """
+        Sets the analysis attributes; only called from '__init__'
+
+        :param attributes: Attribute names and values
+
+        :return: None
+        """
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"- {type(self).__name__.upper()} ANALYSIS IS READ-ONLY (CANNOT SET '{name}')")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"- {type(self).__name__.upper()} ANALYSIS IS READ-ONLY (CANNOT DELETE '{name}')")
+
+    @staticmethod
+    def freeze_rows(rows):
+        """
+        Converts hourly rows into read-only mappings
+
+        :param rows: Iterable of dictionaries
+
+        :return: Tuple of read-only mappings
+        """
+        return tuple(MappingProxyType(each_row) for each_row in rows)
@@ -0,0 +1,21 @@
+from metric_registry import Metric, Metric_Registry, Metric_Analysis
+
+
+class Atmosphere(Metric_Analysis):
+    """
+    Evaluates visibility and dew point, which affect tracking the ball and how muggy play feels. Declared like Wind and
+    Temperature, so the analysis comes from the same single-pass engine
+    """
+    __slots__ = ()
+    VISIBILITY_LOW = 10
+    VISIBILITY_MODERATE = 5
+    DEW_POINT_LOW = 15
+    DEW_POINT_MODERATE = 20
+    METRICS = Metric_Registry.register("atmosphere", (
+        Metric("visibility", "vis_km", "km", (VISIBILITY_LOW, VISIBILITY_MODERATE),
+               ("LOW (CLEAR SIGHT)", "MODERATE (HAZY)", "HIGH (HARD TO TRACK BALL)"), digits=1, worst="min",
+               timeline_title="LOW VISIBILITY"),
+        Metric("dew_point", "dewpoint_c", "°C", (DEW_POINT_LOW, DEW_POINT_MODERATE),
+               ("LOW (COMFORTABLE)", "MODERATE (MUGGY)", "HIGH (OPPRESSIVE)")),
+    ))
+    METRIC_LIST = tuple(metric.name for metric in METRICS)
@@ -1,10 +1,30 @@
-from statistics import mode
+from analysis import Impact
 
 
 class Condition:
     """
     A class that processes weather data, evaluates the condition and generates a report
     """
+    # Category -> playability weight (1.0 = ideal for play, 0.0 = unplayable)
+    CATEGORY_PLAYABILITY = {"clear": 1.0, "cloud": 0.9, "fog": 0.6, "drizzle": 0.5, "rain": 0.2, "snow": 0.1,
+                            "thunder": 0.0}
+    CATEGORIES = tuple(CATEGORY_PLAYABILITY)
+    # WeatherAPI condition codes grouped by category
+    CATEGORY_CODES = {"clear": (1000,),
+                      "cloud": (1003, 1006, 1009),
+                      "fog": (1030, 1135, 1147),
+                      "drizzle": (1072, 1150, 1153, 1168, 1171),
+                      "rain": (1063, 1180, 1183, 1186, 1189, 1192, 1195, 1198, 1201, 1240, 1243, 1246),
+                      "snow": (1066, 1069, 1114, 1117, 1204, 1207, 1210, 1213, 1216, 1219, 1222, 1225, 1237, 1249,
+                               1252, 1255, 1258, 1261, 1264),
+                      "thunder": (1087, 1273, 1276, 1279, 1282)}
+    PLAYABILITY_LOW = 0.8
+    PLAYABILITY_MODERATE = 0.5
+    FIRST_CODE = 1000
+    LAST_CODE = 1282
+    # Index (code - FIRST_CODE) -> category index, built on first use so categorizing an hour is one list lookup
+    CODE_TABLE = None
+
     def __init__(self, hourly_selected_forecast_data):
         self.hourly_selected_forecast_data = hourly_selected_forecast_data
 
@@ -19,20 +39,86 @@ class Condition:
         return [{"condition_text": each_hour["condition"]["text"], "condition_code": each_hour["condition"]["code"]}
                 for each_hour in self.hourly_selected_forecast_data]
 
+    @staticmethod
+    def build_code_table():
+        """
+        Builds the lookup table from condition code to category index. Codes missing from CATEGORY_CODES are treated
+        as cloud
+
+        :return: List indexed by (code - FIRST_CODE)
+        """
+        code_table = [Condition.CATEGORIES.index("cloud")] * (Condition.LAST_CODE - Condition.FIRST_CODE + 1)
+        for category, codes in Condition.CATEGORY_CODES.items():
+            for code in codes:
+                code_table[code - Condition.FIRST_CODE] = Condition.CATEGORIES.index(category)
+        Condition.CODE_TABLE = code_table
+        return code_table
+
+    @staticmethod
+    def categorize_codes(condition_codes):
+        """
+        Looks up the category index of every condition code
+
+        :param condition_codes: Iterable of WeatherAPI condition codes
+
+        :return: List of indexes into CATEGORIES
+        """
+        code_table = Condition.CODE_TABLE or Condition.build_code_table()
+        first_code = Condition.FIRST_CODE
+        table_size = len(code_table)
+        default_index = Condition.CATEGORIES.index("cloud")
+        return [code_table[code - first_code] if 0 <= code - first_code < table_size else default_index
+                for code in condition_codes]
+
     def find_condition_mode(self):
         """
-        Finds the most frequently appeared condition value
+        Finds the most frequently appeared condition code by counting codes. Ties go to the least playable condition,
+        then to the condition that appeared first
 
-        :return: The most common condition value observed during the specified period
+        :return: The most common condition text and its category during the specified period
         """
         condition_data = self.filter_condition_metrics()
-        condition_list = [each_hour["condition_text"] for each_hour in condition_data]
-        return mode(condition_list)
+        code_counts = {}
+        first_hour = {}
+        for hour_index, each_hour in enumerate(condition_data):
+            condition_code = each_hour["condition_code"]
+            code_counts[condition_code] = code_counts.get(condition_code, 0) + 1
+            first_hour.setdefault(condition_code, hour_index)
+
+        categories = {code: self.CATEGORIES[category_index]
+                      for code, category_index in zip(code_counts, self.categorize_codes(code_counts))}
+        mode_code = max(code_counts, key=lambda code: (code_counts[code], -self.CATEGORY_PLAYABILITY[categories[code]],
+                                                       -first_hour[code]))
+        return condition_data[first_hour[mode_code]]["condition_text"], categories[mode_code]
+
+    def calculate_playability(self):
+        """
+        Averages the playability weight of every hour's condition category
+
+        :return: Integer percentage of playability during the specified period (0 when the period has no hours)
+        """
+        category_counts = [0] * len(self.CATEGORIES)
+        for category_index in self.categorize_codes(each_hour["condition"]["code"]
+                                                    for each_hour in self.hourly_selected_forecast_data):
+            category_counts[category_index] += 1
+        hour_count = sum(category_counts)
+        if not hour_count:
+            return 0
+        weighted_total = sum(category_count * self.CATEGORY_PLAYABILITY[category]
+                             for category, category_count in zip(self.CATEGORIES, category_counts))
+        return round(weighted_total / hour_count * 100)
 
-    def condition_summary(self):
+    def playability_impact(self, playability):
         """
-        Summarizes and displays the overall condition for the specified time period
+        Classifies the condition playability into three impact levels
+
+        :param playability: Integer percentage of playability
 
-        :return: A formatted string representing the condition
+        :return: Impact of the playability, labelled with the percentage
         """
-        return f"Condition: {self.find_condition_mode()}\n"
+        if playability >= self.PLAYABILITY_LOW * 100:
+            return Impact(Impact.LOW, f"{playability}% PLAYABLE")
+        elif playability >= self.PLAYABILITY_MODERATE * 100:
+            return Impact(Impact.MODERATE, f"{playability}% PLAYABLE")
+        else:
+            return Impact(Impact.HIGH, f"{playability}% PLAYABLE")
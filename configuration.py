@@ -5,23 +5,41 @@ class Configuration:
     """
     Stores weather configuration parameters and passes them to the Configuration_Validator class for validation
     """
-    def __init__(self, start_time, end_time, top_timeline_count, rain_check_hours_prior, days_to_show):
+    def __init__(self, start_time, end_time, top_timeline_count, rain_check_hours_prior, days_to_show, validate=True):
         self.start_time = start_time
         self.end_time = end_time
         self.top_timeline_count = top_timeline_count
         self.rain_check_hours_prior = rain_check_hours_prior
         self.days_to_show = days_to_show
         self.duration = self.end_time - self.start_time
-        self.activate_validation()
+        if validate:
+            self.activate_validation()
 
     def activate_validation(self):
         """
         Executes all configuration validations functions
 
-        :exception: An Exception will be displayed when validation conditions are not met
+        :exception: An Exception listing every failed validation will be displayed when conditions are not met
+        """
+        validation_errors = self.collect_validation_errors()
+        if validation_errors:
+            raise Exception("\n".join(validation_errors))
+
+    def collect_validation_errors(self):
+        """
+        Runs every configuration validation function, collecting the failures instead of stopping at the first one
+
+        :return: List of error messages (empty when the configuration is valid)
         """
         validator = Configuration_Validator()
-        validator.validate_forecast_days(self.days_to_show)
-        validator.validate_time_range(self.start_time, self.end_time)
-        validator.validate_timeline_fits_range(self.duration, self.top_timeline_count)
-        validator.validate_rain_check_window(self.rain_check_hours_prior, self.start_time)
+        validations = [(validator.validate_forecast_days, (self.days_to_show,)),
+                       (validator.validate_time_range, (self.start_time, self.end_time)),
+                       (validator.validate_timeline_fits_range, (self.duration, self.top_timeline_count)),
+                       (validator.validate_rain_check_window, (self.rain_check_hours_prior, self.start_time))]
+        validation_errors = []
+        for validation, arguments in validations:
+            try:
+                validation(*arguments)
+            except Exception as error:
+                validation_errors.append(str(error))
+        return validation_errors
@@ -54,3 +54,45 @@ s
         """
         if rain_check_hours_prior > start_time or start_time - rain_check_hours_prior < 0:
             raise Exception(f"- RAIN CHECK PERIOD MUST BE SAME DAY AND BEFORE START TIME")
+
+    def validate_phone_number(self, phone_number):
+        """
+        Validates that the phone number is in E.164 format (a '+' followed by 8 to 15 digits), optionally prefixed with
+        'whatsapp:'
+
+        :param phone_number: The subscriber's phone number
+
+        :exception: An error message if the condition is not met
+        """
+        digits = str(phone_number).removeprefix("whatsapp:").removeprefix("+")
+        if not str(phone_number).removeprefix("whatsapp:").startswith("+") or not digits.isdigit() or \
+                not (8 <= len(digits) <= 15):
+            raise Exception(f"- INVALID PHONE NUMBER '{phone_number}' (USE +<COUNTRY CODE><NUMBER>)")
+
+    def validate_channel(self, channel, available_channels):
+        """
+        Validates that the delivery channel is supported
+
+        :param channel: The subscriber's delivery channel (e.g. 'sms' or 'whatsapp')
+        :param available_channels: Names of the supported channels
+
+        :exception: An error message if the condition is not met
+        """
+        if channel not in available_channels:
+            raise Exception(f"- UNKNOWN CHANNEL '{channel}' (CHOOSE FROM {', '.join(available_channels)})")
+
+    def validate_coordinates(self, location):
+        """
+        Validates that the location is formatted as 'lat,lon' with a latitude between -90 and 90 and a longitude
+        between -180 and 180
+
+        :param location: Coordinates of the subscriber's court
+
+        :exception: An error message if the condition is not met
+        """
+        try:
+            latitude, longitude = (float(each_value) for each_value in str(location).split(","))
+        except ValueError:
+            raise Exception(f"- INVALID LOCATION '{location}' (USE LAT,LON)")
+        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+            raise Exception(f"- LOCATION '{location}' OUT OF RANGE")
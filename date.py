@@ -1,4 +1,5 @@
 from datetime import datetime
+from time_lookup import Time_Lookup
 
 
 class Date:
@@ -36,12 +37,10 @@ class Date:
 
     def convert_to_datetime(self, time):
         """
-        Converts an integer time value (start_time or end_time) to a datetime object.
+        Converts an integer time value (start_time or end_time) to its military time label
 
         :param time: An integer representing either the start time or end time in hours (24-hour format)
 
-        :return: A datetime object formatted to display military time (hours and minutes)
+        :return: String formatted as 'HH:MM' (24 returns '23:59')
         """
-        if time == 24:
-            return datetime.strptime(f"23:59", "%H:%M").strftime("%H:%M")
-        return datetime.strptime(f"{time:02d}:00", "%H:%M").strftime("%H:%M")
+        return Time_Lookup.hour_label(time)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from time_lookup import Time_Lookup
 
 
 class Daylight:
@@ -16,7 +16,7 @@ class Daylight:
 
         :return: Sunrise or sunset time in military (24-hour) format
         """
-        return datetime.strptime(time, "%I:%M %p").strftime("%H:%M")
+        return Time_Lookup.parse_astro_time(time)
 
     def retrieve_twilight_time(self, metric):
         """
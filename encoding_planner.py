@@ -0,0 +1,178 @@
+import re
+import unicodedata
+
+
+class Message_Plan:
+    """
+    Describes how a rendered report will be sent: the chosen text, its encoding, the message bodies and their cost
+    """
+    def __init__(self, channel, encoding, text, bodies, segment_count):
+        self.channel = channel
+        self.encoding = encoding
+        self.text = text
+        self.bodies = bodies
+        self.segment_count = segment_count
+
+    def __str__(self):
+        """
+        Overrides the default '__str__' method to summarize the plan
+
+        :return: A formatted string with the channel, encoding, message count and segment count
+        """
+        return (f"{self.channel.upper()} | {self.encoding} | {len(self.bodies)} message(s) | "
+                f"{self.segment_count} segment(s)")
+
+
+class Encoding_Planner:
+    """
+    Computes the exact segment cost of a report for a delivery channel and picks its cheapest representation
+    """
+    GSM_7 = "GSM-7"
+    UCS_2 = "UCS-2"
+    UNICODE = "UNICODE"
+    GSM_7_BASIC_CHARACTERS = frozenset("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?¡"
+                                       "ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà")
+    # Extension characters are sent as an escape plus the character, costing two septets each
+    GSM_7_EXTENSION_CHARACTERS = frozenset("^{}\\[~]|€\f")
+    GSM_7_SINGLE_SEGMENT = 160
+    GSM_7_MULTI_SEGMENT = 153
+    UCS_2_SINGLE_SEGMENT = 70
+    UCS_2_MULTI_SEGMENT = 67
+    # Emoji indicators and units swapped for GSM-7 characters when the report is sent as SMS
+    GSM_7_REPLACEMENTS = {"🟩": "+", "🟨": "~", "🟥": "!", "°C": "C", "\t": " ", "\ufe0f": "", "🗺": "",
+                          "📝": "", "⚠": "", "🌦": "", "🍃": "", "☀": ""}
+    # Removing an emoji leaves the spaces that surrounded it (e.g. '= = =  LOCATION  = = ='), which are merged
+    REPEATED_SPACES = re.compile(" {2,}")
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    @staticmethod
+    def split_content(content, character_limit):
+        """
+        Splits content into message bodies no longer than the character limit, breaking at the last new line of each
+        body when possible
+
+        :param content: Text to split
+        :param character_limit: Maximum number of characters in one message body
+
+        :return: List of message bodies
+        """
+        report_segments = []
+        if not content:
+            return report_segments
+        if len(content) <= character_limit:
+            report_segments.append(content)
+            return report_segments
+
+        while content and len(content) > 0:
+            current_segment = content[:character_limit]
+            new_line_index = current_segment.rfind("\n")
+            if new_line_index == -1:
+                report_segments.append(current_segment)
+                content = content[character_limit:]
+            else:
+                report_segments.append(content[:new_line_index + 1])
+                content = content[new_line_index + 1:]
+        return report_segments
+
+    def detect_encoding(self, text):
+        """
+        Determines the encoding a carrier would use for the text
+
+        :param text: Message text
+
+        :return: 'GSM-7' when every character belongs to the GSM-7 alphabet, otherwise 'UCS-2'
+        """
+        for character in text:
+            if character not in self.GSM_7_BASIC_CHARACTERS and character not in self.GSM_7_EXTENSION_CHARACTERS:
+                return self.UCS_2
+        return self.GSM_7
+
+    def count_sms_segments(self, text, encoding):
+        """
+        Counts the SMS segments of one message. Multi-part messages lose room to their concatenation header, and an
+        extension character or surrogate pair is never split across two segments
+
+        :param text: Message text
+        :param encoding: 'GSM-7' or 'UCS-2'
+
+        :return: Integer number of segments
+        """
+        if encoding == self.GSM_7:
+            unit_costs = [2 if character in self.GSM_7_EXTENSION_CHARACTERS else 1 for character in text]
+            single_limit, multi_limit = self.GSM_7_SINGLE_SEGMENT, self.GSM_7_MULTI_SEGMENT
+        else:
+            unit_costs = [2 if ord(character) > 0xFFFF else 1 for character in text]
+            single_limit, multi_limit = self.UCS_2_SINGLE_SEGMENT, self.UCS_2_MULTI_SEGMENT
+        if sum(unit_costs) <= single_limit:
+            return 1 if text else 0
+
+        segment_count, segment_units = 1, 0
+        for unit_cost in unit_costs:
+            if segment_units + unit_cost > multi_limit:
+                segment_count += 1
+                segment_units = 0
+            segment_units += unit_cost
+        return segment_count
+
+    def transliterate(self, text):
+        """
+        Rewrites a report using only GSM-7 characters, swapping emoji indicators for ASCII markers and replacing any
+        remaining unsupported character with its unaccented form or '?'
+
+        :param text: Rendered report
+
+        :return: GSM-7 compatible report
+        """
+        for original, replacement in self.GSM_7_REPLACEMENTS.items():
+            text = text.replace(original, replacement)
+        text = self.REPEATED_SPACES.sub(" ", text)
+        if self.detect_encoding(text) == self.GSM_7:
+            return text
+        characters = []
+        for character in text:
+            if character in self.GSM_7_BASIC_CHARACTERS or character in self.GSM_7_EXTENSION_CHARACTERS:
+                characters.append(character)
+                continue
+            stripped = "".join(each for each in unicodedata.normalize("NFKD", character)
+                               if not unicodedata.combining(each))
+            characters.append(stripped if stripped and self.detect_encoding(stripped) == self.GSM_7 else "?")
+        return "".join(characters)
+
+    def build_plan(self, text, encoding, character_limit):
+        """
+        Splits a candidate text into message bodies and totals their cost
+
+        :param text: Candidate report text
+        :param encoding: Encoding used for the cost ('GSM-7', 'UCS-2', or 'UNICODE' for WhatsApp)
+        :param character_limit: Maximum number of characters in one message body
+
+        :return: A Message_Plan for the candidate
+        """
+        # One character of each body is kept for the new line that closes it
+        bodies = [f"{each_body}\n" for each_body in self.split_content(text, character_limit - 1)]
+        if encoding == self.UNICODE:
+            segment_count = len(bodies)
+        else:
+            segment_count = sum(self.count_sms_segments(each_body, encoding) for each_body in bodies)
+        return Message_Plan(self.channel, encoding, text, bodies, segment_count)
+
+    def plan(self, text, character_limit):
+        """
+        Picks the cheapest representation of a report for the channel. WhatsApp messages are billed per message and
+        keep the report as is; SMS compares the report in its own encoding with its GSM-7 transliteration and keeps
+        the original when both cost the same
+
+        :param text: Rendered report
+        :param character_limit: Maximum number of characters in one message body
+
+        :return: The cheapest Message_Plan
+        """
+        if self.channel != "sms":
+            return self.build_plan(text, self.UNICODE, character_limit)
+        original_plan = self.build_plan(text, self.detect_encoding(text), character_limit)
+        if original_plan.encoding == self.GSM_7:
+            return original_plan
+        transliterated_plan = self.build_plan(self.transliterate(text), self.GSM_7, character_limit)
+        return transliterated_plan if transliterated_plan.segment_count < original_plan.segment_count else original_plan
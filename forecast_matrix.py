@@ -0,0 +1,281 @@
+import numpy as np
+from functools import cached_property
+from types import MappingProxyType
+from metric_registry import Metric_Registry
+from time_lookup import Time_Lookup
+from template import Report_Template
+from wind import Wind
+from temperature import Temperature
+# Imported so the atmosphere metrics are registered before a matrix is built
+from atmosphere import Atmosphere
+
+
+class Forecast_Matrix:
+    """
+    Converts every forecast day into one days x hours x metrics array in a single pass, holding every registered
+    metric plus the rain fields. Window statistics of all days are computed at once with axis reductions, and the
+    per-day reports read them through Window_Summary.day views
+    """
+    RAIN_FIELDS = ("will_it_rain", "chance_of_rain", "precip_mm")
+    RAIN_FIELD_INDEX = {field: index for index, field in enumerate(RAIN_FIELDS)}
+    HOURS_PER_DAY = 24
+
+    def __init__(self, forecast_days, metrics=None):
+        """
+        Reads every hour of every forecast day once
+
+        :param forecast_days: Forecast days holding 24 hourly entries each (e.g. Forecast.forecast_days)
+        :param metrics: Metric declarations to evaluate (defaults to every registered metric)
+        """
+        self.metrics = Metric_Registry.all_metrics() if metrics is None else tuple(metrics)
+        self.forecast_dates = [forecast_day["date"] for forecast_day in forecast_days]
+        # Per day: the read-only timeline rows of every hour, and the (minutes, row) pairs of the rainy hours
+        self.rows = []
+        self.rainy_hours = []
+        metric_values = []
+        rain_values = []
+        for forecast_day in forecast_days:
+            day_rows = []
+            day_rainy_hours = []
+            for each_hour in forecast_day["hour"]:
+                hour_minutes, hour_label = Time_Lookup.parse_hour_time(each_hour["time"])
+                row = {"time": hour_label}
+                for metric in self.metrics:
+                    value = row[metric.name] = metric.read(each_hour)
+                    metric_values.append(np.nan if value is None else value)
+                day_rows.append(MappingProxyType(row))
+                rain_values.extend(each_hour[field] or 0 for field in self.RAIN_FIELDS)
+                # Only includes hours when rain is expected (API uses 1 = Yes)
+                if each_hour["will_it_rain"] == 1:
+                    day_rainy_hours.append((hour_minutes, MappingProxyType({
+                        "time": hour_label, "rain_percentage": each_hour["chance_of_rain"],
+                        "rain_amount": each_hour["precip_mm"]})))
+            self.rows.append(tuple(day_rows))
+            self.rainy_hours.append(tuple(day_rainy_hours))
+        day_count = len(forecast_days)
+        self.values = np.array(metric_values, dtype=np.float64).reshape(day_count, self.HOURS_PER_DAY,
+                                                                        len(self.metrics))
+        self.rain_values = np.array(rain_values, dtype=np.float64).reshape(day_count, self.HOURS_PER_DAY,
+                                                                           len(self.RAIN_FIELDS))
+        # +1 where high values are worse, -1 where low values are worse, so every metric ranks highest-is-worst
+        self.worst_signs = np.array([1.0 if metric.worst == "max" else -1.0 for metric in self.metrics])
+        self.window_summaries = {}
+
+    @staticmethod
+    def for_forecast(forecast):
+        """
+        Returns the matrix of a forecast, building it on first use so every report of the forecast shares it
+
+        :param forecast: A Forecast instance from a weather provider
+
+        :return: The forecast's Forecast_Matrix
+        """
+        if forecast.forecast_matrix is None:
+            forecast.forecast_matrix = Forecast_Matrix(forecast.forecast_days)
+        return forecast.forecast_matrix
+
+    def rain_field(self, window, field):
+        """
+        Selects one rain field from a window of the rain values
+
+        :param window: A days x hours x rain fields slice of 'rain_values'
+        :param field: Name of the field (one of RAIN_FIELDS)
+
+        :return: A days x hours array of the field's values
+        """
+        return window[:, :, self.RAIN_FIELD_INDEX[field]]
+
+    def summarize(self, start_time, end_time, top_timeline_count=0):
+        """
+        Reduces the assigned window of every day at once; summaries are memoized per window. Metric values are the
+        analyzers' rounded hourly values, hours without a value are skipped, and the top-N hours keep the earlier hour
+        on ties. Rain coverage counts hours the same way the Rain report does (the hour at end_time is included unless
+        end_time is midnight)
+
+        :param start_time: The beginning hour of the analysis period
+        :param end_time: The ending hour of the analysis period
+        :param top_timeline_count: The number of hours kept in each metric's top-N timeline
+
+        :return: A Window_Summary holding the statistics of every day
+        """
+        key = (start_time, end_time, top_timeline_count)
+        window_summary = self.window_summaries.get(key)
+        if window_summary is None:
+            window_summary = self.window_summaries[key] = self.build_window_summary(start_time, end_time,
+                                                                                    top_timeline_count)
+        return window_summary
+
+    def build_window_summary(self, start_time, end_time, top_timeline_count):
+        """
+        Computes the statistics behind 'summarize'
+
+        :return: A Window_Summary
+        """
+        window = self.values[:, start_time:end_time, :]
+        valid = ~np.isnan(window)
+        counts = valid.sum(axis=1)
+        # Accumulated hour by hour, so the totals match a running sum of the same values exactly
+        totals = np.where(valid, window, 0.0).cumsum(axis=1)[:, -1, :]
+        ranks = np.where(valid, window * self.worst_signs, -np.inf)
+        # Hours ordered from the worst value down; the stable sort keeps the earlier hour first on ties
+        order = np.argsort(-ranks, axis=1, kind="stable")
+        top_count = min(top_timeline_count, end_time - start_time)
+        top_positions = np.arange(top_count)[np.newaxis, :, np.newaxis]
+        # Hours past a metric's value count are pushed to the end with HOURS_PER_DAY, then the top hours are sorted
+        # chronologically
+        top_hours = np.sort(np.where(top_positions < counts[:, np.newaxis, :], order[:, :top_count, :],
+                                     self.HOURS_PER_DAY), axis=1)
+
+        rain_window = self.rain_values[:, start_time:min(end_time + 1, self.HOURS_PER_DAY), :]
+        rainy = self.rain_field(rain_window, "will_it_rain") == 1
+        return Window_Summary(self, start_time, end_time, counts, totals, order[:, 0, :], top_hours, {
+            "rain_coverage": np.round(rainy.sum(axis=1) / (end_time - start_time) * 100),
+            "total_precipitation": np.round(np.where(rainy, self.rain_field(rain_window, "precip_mm"), 0).sum(axis=1),
+                                            2),
+        })
+
+
+class Window_Summary:
+    """
+    Holds the statistics of one analysis window for every forecast day as arrays indexed by day (and metric)
+    """
+    def __init__(self, forecast_matrix, start_time, end_time, counts, totals, worst_hours, top_hours, aggregates):
+        self.forecast_matrix = forecast_matrix
+        self.start_time = start_time
+        self.end_time = end_time
+        self.counts = counts
+        self.totals = totals
+        self.worst_hours = worst_hours
+        self.top_hours = top_hours
+        self.aggregates = aggregates
+        self.forecast_dates = forecast_matrix.forecast_dates
+
+    def __len__(self):
+        """
+        Counts the forecast days covered by the summary
+
+        :return: Integer number of forecast days
+        """
+        return len(self.forecast_dates)
+
+    def day(self, forecast_day):
+        """
+        Creates a view of one day's statistics
+
+        :param forecast_day: Index of the forecast day
+
+        :return: A Day_Summary for the day
+        """
+        return Day_Summary(self, forecast_day)
+
+    def __str__(self):
+        """
+        Overrides the default '__str__' method to list every day's summary
+
+        :return: A formatted string with one line per forecast day
+        """
+        return "\n".join(str(self.day(forecast_day)) for forecast_day in range(len(self)))
+
+
+class Day_Summary:
+    """
+    View over one day of a Window_Summary; reads the shared arrays instead of copying them. Exposes 'timeline' and
+    'statistics' like a Metric_Evaluation, so the day's Metric_Analysis analyzers are built from it, and 'rain_hours'
+    for the Rain analyzer
+    """
+    GUST_METRIC = Wind.find_metric("gust")
+    FEELS_LIKE_METRIC = Temperature.find_metric("feels_like")
+    UV_INDEX_METRIC = Temperature.find_metric("uv_index")
+    # Aggregate name -> (metric name, statistic) for the aggregates read as attributes (e.g. 'max_wind_gust')
+    METRIC_AGGREGATES = {"max_wind_speed": ("speed", "worst"), "avg_wind_speed": ("speed", "average"),
+                         "max_wind_gust": ("gust", "worst"), "avg_wind_gust": ("gust", "average"),
+                         "max_feels_like": ("feels_like", "worst"), "avg_feels_like": ("feels_like", "average"),
+                         "max_humidity": ("humidity", "worst"), "avg_humidity": ("humidity", "average"),
+                         "max_uv_index": ("uv_index", "worst")}
+
+    def __init__(self, window_summary, forecast_day):
+        self.window_summary = window_summary
+        self.forecast_day = forecast_day
+
+    @cached_property
+    def timeline(self):
+        """
+        Reads the day's timeline rows of the window, which hold every metric of the matrix
+
+        :return: Tuple of read-only rows
+        """
+        window_summary = self.window_summary
+        return window_summary.forecast_matrix.rows[self.forecast_day][window_summary.start_time:
+                                                                      window_summary.end_time]
+
+    @cached_property
+    def statistics(self):
+        """
+        Reads the worst value, average, impact and top-N hours of every metric with a value in the window
+
+        :return: Read-only mapping of metric name -> read-only statistics
+        """
+        window_summary = self.window_summary
+        forecast_day = self.forecast_day
+        timeline = self.timeline
+        statistics = {}
+        for metric_index, metric in enumerate(window_summary.forecast_matrix.metrics):
+            count = window_summary.counts[forecast_day, metric_index].item()
+            if not count:
+                continue
+            worst_value = timeline[window_summary.worst_hours[forecast_day, metric_index]][metric.name]
+            statistics[metric.name] = MappingProxyType({
+                "worst": worst_value,
+                "average": round(window_summary.totals[forecast_day, metric_index].item() / count,
+                                 metric.digits or None),
+                "impact": metric.impact(worst_value),
+                "top_hours": tuple(timeline[hour_index] for hour_index
+                                   in window_summary.top_hours[forecast_day, :, metric_index].tolist()
+                                   if hour_index < len(timeline))})
+        return MappingProxyType(statistics)
+
+    def rain_hours(self, start_time, end_time):
+        """
+        Selects the day's rainy hours between two hour settings, both included
+
+        :param start_time: The beginning hour (0-24)
+        :param end_time: The ending hour (0-24, where 24 is 23:59)
+
+        :return: Tuple of read-only rows with 'time', 'rain_percentage' and 'rain_amount'
+        """
+        start_minutes = Time_Lookup.hour_minutes(start_time)
+        end_minutes = Time_Lookup.hour_minutes(end_time)
+        return tuple(row for hour_minutes, row in self.window_summary.forecast_matrix.rainy_hours[self.forecast_day]
+                     if start_minutes <= hour_minutes <= end_minutes)
+
+    def __getattr__(self, aggregate):
+        """
+        Reads an aggregate (e.g. 'max_wind_gust') of this view's day
+
+        :param aggregate: Name of the aggregate
+
+        :return: Integer or float value of the aggregate
+        """
+        if aggregate in self.METRIC_AGGREGATES:
+            metric_name, statistic = self.METRIC_AGGREGATES[aggregate]
+            metric_statistics = self.statistics.get(metric_name)
+            return 0 if metric_statistics is None else metric_statistics[statistic]
+        aggregates = self.__dict__["window_summary"].aggregates
+        if aggregate not in aggregates:
+            raise AttributeError(aggregate)
+        value = aggregates[aggregate][self.__dict__["forecast_day"]].item()
+        return value if aggregate == "total_precipitation" else int(value)
+
+    def __str__(self):
+        """
+        Overrides the default '__str__' method to summarize the day on one line, using the report's impact levels
+
+        :return: A formatted string with the day's key aggregates
+        """
+        indicators = Report_Template.IMPACT_INDICATORS
+        return (f"{self.window_summary.forecast_dates[self.forecast_day]} | "
+                f"Gust {self.max_wind_gust} kph {indicators[self.GUST_METRIC.impact(self.max_wind_gust).level]} | "
+                f"Feels {self.max_feels_like} °C "
+                f"{indicators[self.FEELS_LIKE_METRIC.impact(self.max_feels_like).level]} | "
+                f"UV {self.max_uv_index} {indicators[self.UV_INDEX_METRIC.impact(self.max_uv_index).level]} | "
+                f"Rain {self.rain_coverage}% ({self.total_precipitation} mm)")
@@ -0,0 +1,417 @@
+import io
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import redirect_stdout
+from threading import Lock, Thread
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from main import main
+from configuration import Configuration
+from weather_provider import Weather_Provider, WeatherAPI_Provider
+from report_cache import Report_Cache
+from messenger import Messenger
+from outbox import Message_Outbox, Outbox_Worker_Pool
+
+
+class Stub_Server(ABC):
+    """
+    Local HTTP server standing in for an external API, with configurable latency, error rate and rate limit
+    """
+    def __init__(self, latency_seconds=0.0, error_rate=0.0, rate_limit_per_second=None, seed=0):
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.rate_limit_per_second = rate_limit_per_second
+        self.random = random.Random(seed)
+        self.lock = Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self.rate_limited_count = 0
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.build_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        """
+        Base URL of the running server
+
+        :return: String formatted as 'http://127.0.0.1:<port>'
+        """
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        """
+        Serves requests on a background thread
+
+        :return: The running Stub_Server
+        """
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Shuts the server down
+
+        :return: None
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def admit(self):
+        """
+        Counts a request and decides how it is answered, using a one second window for the rate limit
+
+        :return: HTTP status code to answer with when the request is rejected, otherwise None
+        """
+        with self.lock:
+            self.request_count += 1
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            if self.rate_limit_per_second and self.window_count > self.rate_limit_per_second:
+                self.rate_limited_count += 1
+                return 429
+            if self.random.random() < self.error_rate:
+                self.error_count += 1
+                return 500
+        return None
+
+    @abstractmethod
+    def respond(self, method, path, form):
+        """
+        Builds the answer of an admitted request
+
+        :param method: 'GET' or 'POST'
+        :param path: Request path including the query string
+        :param form: Decoded form fields of a POST request
+
+        :return: Tuple of HTTP status code and JSON-compatible body
+        """
+
+    def build_handler(self):
+        """
+        Creates the request handler class bound to this server
+
+        :return: A BaseHTTPRequestHandler subclass
+        """
+        stub = self
+
+        class Stub_Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle_request(self, method):
+                content_length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(content_length).decode()) if content_length else {}
+                time.sleep(stub.latency_seconds)
+                rejected_status = stub.admit()
+                if rejected_status:
+                    status, body = rejected_status, {"code": rejected_status, "message": "stub rejection"}
+                else:
+                    status, body = stub.respond(method, self.path, form)
+                encoded_body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded_body)))
+                self.end_headers()
+                self.wfile.write(encoded_body)
+
+            def do_GET(self):
+                self.handle_request("GET")
+
+            def do_POST(self):
+                self.handle_request("POST")
+
+            def log_message(self, *arguments):
+                pass
+
+        return Stub_Handler
+
+
+class Weather_API_Stub(Stub_Server):
+    """
+    Emulates WeatherAPI.com's forecast endpoint with a deterministic synthetic forecast for each location
+    """
+    CONDITIONS = ({"text": "Sunny", "code": 1000}, {"text": "Partly cloudy", "code": 1003},
+                  {"text": "Light rain", "code": 1183}, {"text": "Patchy light rain with thunder", "code": 1273})
+
+    def respond(self, method, path, form):
+        query = parse_qs(urlparse(path).query)
+        return 200, self.build_forecast(query.get("q", ["0,0"])[0], int(query.get("days", ["1"])[0]))
+
+    def build_forecast(self, location, days_to_show):
+        """
+        Generates a WeatherAPI-shaped forecast, seeded by the location so repeated requests return the same data
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param days_to_show: Number of forecast days
+
+        :return: Dictionary in the WeatherAPI.com response format
+        """
+        forecast_random = random.Random(location)
+        latitude, longitude = (float(each_value) for each_value in location.split(","))
+        first_day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        forecast_days = []
+        for day_index in range(days_to_show):
+            day_start = first_day + timedelta(days=day_index)
+            hourly_forecast_data = []
+            for hour in range(24):
+                hour_start = day_start + timedelta(hours=hour)
+                will_it_rain = 1 if forecast_random.random() < 0.25 else 0
+                hourly_forecast_data.append({
+                    "time": hour_start.strftime("%Y-%m-%d %H:%M"), "time_epoch": int(hour_start.timestamp()),
+                    "wind_kph": round(forecast_random.uniform(0, 35), 1),
+                    "gust_kph": round(forecast_random.uniform(5, 55), 1),
+                    "feelslike_c": round(forecast_random.uniform(5, 36), 1),
+                    "humidity": forecast_random.randint(20, 95), "uv": round(forecast_random.uniform(0, 11), 1),
+                    "will_it_rain": will_it_rain,
+                    "chance_of_rain": (forecast_random.randint(60, 100) if will_it_rain
+                                       else forecast_random.randint(0, 40)),
+                    "precip_mm": round(forecast_random.uniform(0.1, 3), 2) if will_it_rain else 0.0,
+                    "vis_km": 10.0, "dewpoint_c": round(forecast_random.uniform(0, 20), 1),
+                    "condition": forecast_random.choice(self.CONDITIONS)})
+            forecast_days.append({"date": day_start.strftime("%Y-%m-%d"), "date_epoch": int(day_start.timestamp()),
+                                  "astro": {"sunrise": "06:45 AM", "sunset": "07:30 PM"},
+                                  "hour": hourly_forecast_data})
+        alerts = []
+        if forecast_random.random() < 0.2:
+            effective = first_day + timedelta(hours=forecast_random.randint(0, 24 * days_to_show - 6))
+            alerts.append({"headline": "Wind advisory in effect", "msgtype": "Alert", "severity": "Moderate",
+                           "urgency": "Expected", "areas": "Stub County", "event": "Wind Advisory",
+                           "effective": effective.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                           "expires": (effective + timedelta(hours=6)).strftime("%Y-%m-%dT%H:%M:%S%z")})
+        return {"location": {"name": f"Court {location}", "region": "Stub Region", "country": "Stubland",
+                             "lat": latitude, "lon": longitude, "tz_id": "UTC"},
+                "forecast": {"forecastday": forecast_days}, "alerts": {"alert": alerts}}
+
+
+class Twilio_Stub(Stub_Server):
+    """
+    Emulates Twilio's message creation endpoint and records every accepted message
+    """
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.messages = []
+
+    def respond(self, method, path, form):
+        with self.lock:
+            self.messages.append((form["To"][0], form["Body"][0]))
+            message_sid = f"SM{len(self.messages):032d}"
+        return 201, {"sid": message_sid, "status": "queued", "to": form["To"][0], "body": form["Body"][0]}
+
+
+class Timed_Provider(Weather_Provider):
+    """
+    Wraps the weather provider handed to main() and records how long every fetch takes
+    """
+    def __init__(self, load_test, provider):
+        self.load_test = load_test
+        self.provider = provider
+
+    def fetch_forecast(self, location, days_to_show):
+        started = time.perf_counter()
+        try:
+            forecast = self.provider.fetch_forecast(location, days_to_show)
+        except Exception:
+            self.load_test.record("fetch", started, failed=True)
+            raise
+        self.load_test.record("fetch", started)
+        return forecast
+
+
+class Timed_Report_Cache(Report_Cache):
+    """
+    Report cache handed to main() that records how long every report takes to look up or render, and counts the
+    message segments of the reports
+    """
+    def __init__(self, load_test):
+        super().__init__()
+        self.load_test = load_test
+
+    def get_or_render(self, key, render_report):
+        started = time.perf_counter()
+        try:
+            cached_report = super().get_or_render(key, render_report)
+        except Exception:
+            self.load_test.record("render", started, failed=True)
+            raise
+        self.load_test.record("render", started, segment_count=cached_report.message_plan.segment_count)
+        return cached_report
+
+
+class Load_Test:
+    """
+    Drives main() for N locations x M subscribers against local stubs, then delivers the queued messages through the
+    outbox worker pool, and reports throughput, per-stage latency percentiles and API and segment counts
+    """
+    # (start_time, end_time) windows handed out to synthetic subscribers, so some share identical reports
+    PLAY_WINDOWS = ((6, 9), (9, 12), (16, 20), (18, 24))
+    TOP_TIMELINE_COUNT = 2
+    RAIN_CHECK_HOURS_PRIOR = 4
+
+    def __init__(self, location_count, subscriber_count, outbox_path, days_to_show=2, worker_count=8,
+                 weather_options=None, twilio_options=None):
+        self.location_count = location_count
+        self.subscriber_count = subscriber_count
+        self.outbox_path = outbox_path
+        self.days_to_show = days_to_show
+        self.worker_count = worker_count
+        self.weather_stub = Weather_API_Stub(**(weather_options or {})).start()
+        self.twilio_stub = Twilio_Stub(**(twilio_options or {})).start()
+        self.report_cache = Timed_Report_Cache(self)
+        self.stage_latencies = {"fetch": [], "render": [], "send": []}
+        self.stage_errors = {"fetch": 0, "render": 0, "send": 0}
+        self.report_count = 0
+        self.segment_count = 0
+        self.lock = Lock()
+        os.environ.update(TWILIO_API_URL=self.twilio_stub.url, TWILIO_ACCOUNT_SID=f"AC{'0' * 32}",
+                          TWILIO_AUTH_TOKEN="stub", PHONE_NUMBER="+15550000000")
+        Messenger.CLIENT = None
+
+    def record(self, stage, started, failed=False, segment_count=0):
+        """
+        Records the duration of one stage execution
+
+        :param stage: 'fetch', 'render' or 'send'
+        :param started: time.perf_counter() value when the stage started
+        :param failed: Whether the stage raised an error
+        :param segment_count: Message segments produced by the stage
+
+        :return: None
+        """
+        with self.lock:
+            self.stage_latencies[stage].append(time.perf_counter() - started)
+            self.segment_count += segment_count
+            if failed:
+                self.stage_errors[stage] += 1
+
+    def send_text(self, body, to):
+        """
+        Sends one message through Messenger and records how long Twilio took to accept it
+
+        :return: The Twilio message resource that was created
+        """
+        started = time.perf_counter()
+        try:
+            message = Messenger.send_text(body, to)
+        except Exception:
+            self.record("send", started, failed=True)
+            raise
+        self.record("send", started)
+        return message
+
+    def build_subscribers(self, location_index):
+        """
+        Creates the synthetic subscribers of one location
+
+        :param location_index: Index of the location
+
+        :return: List of (phone number, channel, Configuration) tuples
+        """
+        subscribers = []
+        for subscriber_index in range(self.subscriber_count):
+            start_time, end_time = self.PLAY_WINDOWS[subscriber_index % len(self.PLAY_WINDOWS)]
+            subscribers.append((f"+1555{location_index:04d}{subscriber_index:03d}",
+                                ("sms", "whatsapp")[subscriber_index % 2],
+                                Configuration(start_time, end_time, self.TOP_TIMELINE_COUNT,
+                                              self.RAIN_CHECK_HOURS_PRIOR, self.days_to_show)))
+        return subscribers
+
+    def run_location(self, location_index, outbox):
+        """
+        Runs main() for every subscriber of one location, queuing their messages in the outbox. Repeated forecast
+        requests of the location are answered by the weather API's response cache, as in production
+
+        :param location_index: Index of the location
+        :param outbox: Message_Outbox the reports are queued in
+
+        :return: None
+        """
+        location = f"{40 + location_index * 0.01:.2f},{-80 - location_index * 0.01:.2f}"
+        weather_provider = Timed_Provider(self, WeatherAPI_Provider(f"{self.weather_stub.url}/v1/forecast.json"))
+        for phone_number, channel, configuration in self.build_subscribers(location_index):
+            report_count = main(configuration, channel, location, phone_number, weather_provider, self.report_cache,
+                                outbox, deliver=False)
+            with self.lock:
+                self.report_count += report_count
+
+    def run(self):
+        """
+        Runs every location on a thread pool, then drains the outbox
+
+        :return: Dictionary with the load test results
+        """
+        outbox = Message_Outbox(self.outbox_path)
+        started = time.perf_counter()
+        # main() prints every report it queues and every failure; only the results are printed here
+        with redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=self.worker_count) as executor:
+            list(executor.map(lambda location_index: self.run_location(location_index, outbox),
+                              range(self.location_count)))
+        drain_started = time.perf_counter()
+        worker_pool = Outbox_Worker_Pool(outbox, sender=self.send_text, worker_count=self.worker_count)
+        worker_pool.start(stop_when_idle=True)
+        worker_pool.join()
+        drain_seconds = time.perf_counter() - drain_started
+        elapsed_seconds = time.perf_counter() - started
+        self.weather_stub.stop()
+        self.twilio_stub.stop()
+        return {"elapsed_seconds": round(elapsed_seconds, 3),
+                "reports_per_second": round(self.report_count / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+                "stages": {stage: self.summarize_latencies(latencies, self.stage_errors[stage])
+                           for stage, latencies in self.stage_latencies.items()},
+                "outbox_drain_seconds": round(drain_seconds, 3),
+                "weather_api_requests": self.weather_stub.request_count,
+                "weather_api_rejections": self.weather_stub.error_count + self.weather_stub.rate_limited_count,
+                "twilio_requests": self.twilio_stub.request_count,
+                "twilio_messages_accepted": len(self.twilio_stub.messages),
+                "segments": self.segment_count,
+                "report_cache": self.report_cache.statistics()}
+
+    @staticmethod
+    def summarize_latencies(latencies, error_count):
+        """
+        Computes latency percentiles of one stage
+
+        :param latencies: List of durations in seconds
+        :param error_count: Number of failed executions
+
+        :return: Dictionary with the count, errors and p50/p95/p99 in milliseconds
+        """
+        ordered = sorted(latencies)
+        percentile = lambda fraction: round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+        return {"count": len(ordered), "errors": error_count,
+                "p50_ms": percentile(0.50) if ordered else None,
+                "p95_ms": percentile(0.95) if ordered else None,
+                "p99_ms": percentile(0.99) if ordered else None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the report pipeline against local API stubs")
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--subscribers", type=int, default=10, help="Subscribers per location")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="Seconds added to each forecast request")
+    parser.add_argument("--weather-error-rate", type=float, default=0.0)
+    parser.add_argument("--weather-rate-limit", type=int, default=None, help="Forecast requests allowed per second")
+    parser.add_argument("--twilio-latency", type=float, default=0.02, help="Seconds added to each message request")
+    parser.add_argument("--twilio-error-rate", type=float, default=0.0)
+    parser.add_argument("--twilio-rate-limit", type=int, default=None, help="Message requests allowed per second")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        results = Load_Test(arguments.locations, arguments.subscribers, os.path.join(temporary_directory, "outbox.db"),
+                            arguments.days, arguments.workers,
+                            {"latency_seconds": arguments.weather_latency, "error_rate": arguments.weather_error_rate,
+                             "rate_limit_per_second": arguments.weather_rate_limit},
+                            {"latency_seconds": arguments.twilio_latency, "error_rate": arguments.twilio_error_rate,
+                             "rate_limit_per_second": arguments.twilio_rate_limit}).run()
+    print(json.dumps(results, indent=2))
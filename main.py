@@ -1,14 +1,14 @@
-from weather_api import Weather_API
-from location import Location
-from daylight import Daylight
-from rain import Rain
-from wind import Wind
+from weather_provider import Weather_Provider, Hedged_Provider
 from report import Report
-from temperature import Temperature
-from condition import Condition
 from date import Date
 from configuration import Configuration
-# from sms import Sms
+from alert import Alert_Index
+from template import Report_Template
+from report_cache import Report_Cache
+from encoding_planner import Encoding_Planner
+from messenger import Messenger
+from outbox import Message_Outbox, Outbox_Worker_Pool
+from forecast_matrix import Forecast_Matrix
 
 # Show Up To Which Days (E.g. 1 = current day, 2= current day + Next day, 3 = current day + next two days, and etc)
 # (Minimum: 1 day | Maximum: 14 days (currently limited to 3 days on free tier))
@@ -25,35 +25,93 @@ END_TIME = 24
 TOP_TIMELINE_COUNT = 2
 # Specifies how many hours before the start time to check for rain (used in Rain class)
 RAIN_CHECK_HOURS_PRIOR = 4
+# Channel the report is delivered through ("whatsapp" for the full layout, "sms" for the compact layout)
+CHANNEL = "whatsapp"
+# Weather backend ("weatherapi" or "open-meteo")
+WEATHER_PROVIDER = "weatherapi"
+# Optional second backend asked when the first has not answered within the latency budget (None disables hedging)
+BACKUP_WEATHER_PROVIDER = None
+HEDGE_LATENCY_BUDGET_SECONDS = 1.5
+# Prints a one-line summary of every forecast day, computed over all days at once, before the daily reports
+MULTI_DAY_SUMMARY = False
+# Rendered reports shared by subscribers whose forecast and settings are identical
+REPORT_CACHE = Report_Cache()
+# SQLite file holding messages until Twilio accepts them, so a failed or interrupted run resumes without resending
+# (None sends every message directly)
+OUTBOX_PATH = "outbox.db"
 
-def main():
+def render_report(forecast, forecast_day, alert_index, configuration, channel):
+    """
+    Builds the report of one forecast day and plans its messages for the channel
+
+    :param forecast: A Forecast instance from a weather provider
+    :param forecast_day: Index of the forecast day
+    :param alert_index: Alert_Index holding the forecast's alerts
+    :param configuration: Validated Configuration of the report
+    :param channel: "whatsapp" or "sms"
+
+    :return: Tuple of the rendered report text and its Message_Plan
+    """
+    report_details = Report.build(forecast, forecast_day, configuration.start_time, configuration.end_time,
+                                  configuration.top_timeline_count, configuration.rain_check_hours_prior, alert_index,
+                                  Report_Template.for_channel(channel).profile)
+    message_plan = Encoding_Planner(channel).plan(report_details.formatted_report, Messenger.CHARACTER_LIMITS[channel])
+    return report_details.formatted_report, message_plan
+
+
+def main(configuration=None, channel=CHANNEL, location=None, recipient=None, weather_provider=None,
+         report_cache=REPORT_CACHE, outbox=None, deliver=True):
     """
     Validates constant variable values before passing them as arguments, then coordinates fetching weather data,
-    parsing it, and printing a report.
+    parsing it, and sending a report for every forecast day. Every argument defaults to the settings above; the load
+    test passes its own
 
-    :return: None
+    :param configuration: Configuration of the report (defaults to the validated settings above)
+    :param channel: "whatsapp" or "sms"
+    :param location: Coordinates formatted as 'lat,lon' (None uses the LAT and LON environment variables)
+    :param recipient: Phone number receiving the reports (None uses the MY_PHONE_NUMBER environment variable)
+    :param weather_provider: Weather_Provider to fetch from (defaults to WEATHER_PROVIDER, hedged when
+     BACKUP_WEATHER_PROVIDER is set)
+    :param report_cache: Report_Cache sharing rendered reports
+    :param outbox: Message_Outbox queuing the messages (defaults to OUTBOX_PATH)
+    :param deliver: Drains the outbox before returning; False leaves the queued messages to another worker pool
+
+    :return: Number of reports sent or queued (0 when report generation failed)
     """
     try:
-        Configuration(START_TIME, END_TIME, TOP_TIMELINE_COUNT, RAIN_CHECK_HOURS_PRIOR, DAYS_TO_SHOW)
-        weather_data = Weather_API.fetch_weather_forecast(DAYS_TO_SHOW)
-        for forecast_day in range(DAYS_TO_SHOW):
-            forecast_location_data= weather_data["location"]
-            forecast_data = weather_data["forecast"]["forecastday"][forecast_day]
-            hourly_selected_forecast_data=forecast_data["hour"][START_TIME:END_TIME]
-            location_details = Location(forecast_location_data)
-            date_details = Date(START_TIME,END_TIME,forecast_data)
-            daylight_details = Daylight(forecast_data)
-            condition_details = Condition(hourly_selected_forecast_data)
-            rain_details = Rain(START_TIME, END_TIME,TOP_TIMELINE_COUNT, RAIN_CHECK_HOURS_PRIOR, forecast_data)
-            wind_details = Wind(TOP_TIMELINE_COUNT,hourly_selected_forecast_data)
-            temperature_details = Temperature(TOP_TIMELINE_COUNT,hourly_selected_forecast_data)
-            report_details = Report(location_details, daylight_details, rain_details, wind_details, temperature_details,
-                                    condition_details, date_details, START_TIME, END_TIME)
-            # Sms(report_details,date_details)
+        configuration = configuration or Configuration(START_TIME, END_TIME, TOP_TIMELINE_COUNT,
+                                                       RAIN_CHECK_HOURS_PRIOR, DAYS_TO_SHOW)
+        if weather_provider is None:
+            weather_provider = Weather_Provider.create(WEATHER_PROVIDER)
+            if BACKUP_WEATHER_PROVIDER:
+                weather_provider = Hedged_Provider(weather_provider, Weather_Provider.create(BACKUP_WEATHER_PROVIDER),
+                                                   HEDGE_LATENCY_BUDGET_SECONDS)
+        forecast = weather_provider.fetch_forecast(location, configuration.days_to_show)
+        if MULTI_DAY_SUMMARY:
+            print(Forecast_Matrix.for_forecast(forecast).summarize(configuration.start_time, configuration.end_time))
+        alert_index = Alert_Index.for_forecast(forecast)
+        if outbox is None and OUTBOX_PATH:
+            outbox = Message_Outbox(OUTBOX_PATH)
+        for forecast_day in range(configuration.days_to_show):
+            cache_key = report_cache.build_key(forecast.build_payload_hash(), forecast_day, configuration.start_time,
+                                               configuration.end_time, configuration.top_timeline_count,
+                                               configuration.rain_check_hours_prior, channel)
+            cached_report = report_cache.get_or_render(cache_key, lambda: render_report(
+                forecast, forecast_day, alert_index, configuration, channel))
+            Messenger(cached_report, Date(configuration.start_time, configuration.end_time,
+                                          forecast.forecast_days[forecast_day]), channel, cached_report.message_plan,
+                      outbox, recipient, cache_key)
+        if outbox and deliver:
+            # Delivers everything queued, including messages left over from an earlier run
+            worker_pool = Outbox_Worker_Pool(outbox)
+            worker_pool.start(stop_when_idle=True)
+            worker_pool.join()
+        return configuration.days_to_show
     except Exception as error:
         print(f"Report Generation Failed:\n"
               f"{error}")
-main()
-
+        return 0
 
 
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,87 @@
 import os
+import json
+import hashlib
+from threading import Lock
 from twilio.rest import Client
+from encoding_planner import Encoding_Planner
 
 
 class Messenger:
     """
     Connects to the Twilio API to send weather forecast reports to an authorized phone number
     """
-    # The limit is 1024; however, it was reduced account for forecast and generation date details
+    # The WhatsApp limit is 1024; however, it was reduced account for forecast and generation date details
     TWILIO_WHATSAPP_CHARACTER_LIMIT = 950
+    # Twilio rejects SMS bodies longer than 1600 characters (the carrier still bills per segment)
+    TWILIO_SMS_CHARACTER_LIMIT = 1600
+    CHARACTER_LIMITS = {"whatsapp": TWILIO_WHATSAPP_CHARACTER_LIMIT, "sms": TWILIO_SMS_CHARACTER_LIMIT}
+    CLIENT = None
+    CLIENT_LOCK = Lock()
 
-    def __init__(self, report_details, date_details):
-        self.report_content = report_details.formatted_report
+    def __init__(self, report_details, date_details, channel="whatsapp", message_plan=None, outbox=None,
+                 recipient=None, report_key=None):
+        self.channel = channel
+        self.character_limit = self.CHARACTER_LIMITS[channel]
+        self.message_plan = message_plan or Encoding_Planner(channel).plan(report_details.formatted_report,
+                                                                           self.character_limit)
+        self.report_content = self.message_plan.text
         self.date_details = date_details
+        self.outbox = outbox
+        self.recipient = recipient or os.getenv("MY_PHONE_NUMBER")
+        self.report_key = report_key
         self.send_message()
 
-    def split_report(self):
+    def send_message(self):
         """
-        Takes the content of the final report and splits it into individual messages to avoid exceeding the
-        character limit
+        Sends the weather forecast report as a message using Twilio, after reporting how many segments it will use.
+        With an outbox the message bodies are queued there instead and delivered by an Outbox_Worker_Pool
 
-        :return: List of segmented parts of the report
+        :return: None
         """
-        report_segments = []
-        content = self.report_content
-
-        if not content:
-            return report_segments
-        if len(content) <= self.TWILIO_WHATSAPP_CHARACTER_LIMIT:
-            report_segments.append(content)
-            return report_segments
-
-        while content and len(content) > 0:
-            current_segment = content[:self.TWILIO_WHATSAPP_CHARACTER_LIMIT]
-            new_line_index = current_segment.rfind("\n")
-            if new_line_index == -1:
-                report_segments.append(current_segment)
-                content = content[self.TWILIO_WHATSAPP_CHARACTER_LIMIT:]
-            else:
-                report_segments.append(content[:new_line_index + 1])
-                content = content[new_line_index + 1:]
-        return report_segments
+        print(f"Sending {self.date_details.display_forecast_date()}: {self.message_plan}")
+        if self.outbox is None:
+            for each_body in self.message_plan.bodies:
+                self.send_text(each_body, self.recipient)
+            return
+        connection = self.outbox.connect()
+        try:
+            self.outbox.enqueue(connection, self.recipient, self.message_plan.bodies, self.build_idempotency_key())
+        finally:
+            connection.close()
 
-    def send_message(self):
+    def build_idempotency_key(self):
+        """
+        Identifies the report for its recipient by the forecast date and the report's content address: the report
+        cache key when one was given, otherwise a digest of the forecast day, channel and timeframe. The rendered text
+        is not used since it holds the generation time, so re-running the same report later does not send it twice
+
+        :return: String formatted as 'recipient:date:key'
         """
-        Sends the weather forecast report as a message using Twilio
+        report_key = self.report_key or hashlib.sha256(json.dumps(
+            [self.date_details.forecast_data, self.channel, self.date_details.start_time, self.date_details.end_time],
+            sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.recipient}:{self.date_details.forecast_data['date']}:{report_key}"
+
+    @staticmethod
+    def send_text(body, to=None):
+        """
+        Sends a single message through a Twilio client shared by every sender in the process
+
+        :param body: Text of the message
+        :param to: Recipient phone number (defaults to the MY_PHONE_NUMBER environment variable)
 
-        :return: A formatted string detailing the forecasted day's weather, including its generation date and
-         report count
+        :return: The Twilio message resource that was created
         """
-        account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-        auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-        client = Client(account_sid, auth_token)
-
-        for each_segment in self.split_report():
-            client.messages.create(
-                body=f"{each_segment}\n",
-                from_=os.getenv("PHONE_NUMBER"),
-                to=os.getenv("MY_PHONE_NUMBER"),
-            )
+        if Messenger.CLIENT is None:
+            with Messenger.CLIENT_LOCK:
+                if Messenger.CLIENT is None:
+                    client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+                    # Points the client at another Twilio-compatible server (e.g. a local stub) when set
+                    if os.getenv("TWILIO_API_URL"):
+                        client.api.base_url = os.getenv("TWILIO_API_URL")
+                    Messenger.CLIENT = client
+        return Messenger.CLIENT.messages.create(
+            body=body,
+            from_=os.getenv("PHONE_NUMBER"),
+            to=to or os.getenv("MY_PHONE_NUMBER"),
+        )
@@ -0,0 +1,238 @@
+import heapq
+from types import MappingProxyType
+from analysis import Read_Only_Analysis, Impact
+from time_lookup import Time_Lookup
+
+
+class Metric:
+    """
+    Declaration of one hourly metric: where its value comes from, how it is rounded and displayed, and the threshold
+    ladder that turns its worst value into an impact label
+    """
+    __slots__ = ("name", "source_field", "unit", "thresholds", "labels", "digits", "worst", "section_title",
+                 "timeline_title", "summary_title", "statistics_format", "timeline_format")
+
+    def __init__(self, name, source_field, unit, thresholds, labels, digits=0, worst="max", section_title=None,
+                 timeline_title=None, summary_title=None, statistics_format=None,
+                 timeline_format="{indent}{time}: {value} {unit}\n"):
+        """
+        Declares a metric
+
+        :param name: Key of the metric in the timeline rows (e.g. 'gust')
+        :param source_field: Hourly forecast field the value is read from (e.g. 'gust_kph')
+        :param unit: Unit displayed after values (e.g. 'kph')
+        :param thresholds: Ascending (or, for 'min' metrics, descending) impact bounds, one fewer than the labels
+        :param labels: Impact labels from the lowest to the highest impact; labels past the third share the HIGH level
+        :param digits: Rounding of hourly values (0 rounds to an integer, None keeps the value)
+        :param worst: 'max' when high values are worse, 'min' when low values are worse
+        :param section_title: Report section title (defaults to the name in upper case)
+        :param timeline_title: Title of the top-N timeline (defaults to the section title)
+        :param summary_title: Title used in the summary (defaults to the name in title case)
+        :param statistics_format: Line showing the worst and average values
+        :param timeline_format: Line of one timeline hour ('{indent}' is the profile's timeline indentation)
+        """
+        display_name = name.replace("_", " ")
+        self.name = name
+        self.source_field = source_field
+        self.unit = unit
+        self.thresholds = thresholds
+        self.labels = labels
+        self.digits = digits
+        self.worst = worst
+        self.section_title = section_title or display_name.upper()
+        self.timeline_title = timeline_title or self.section_title
+        self.summary_title = summary_title or display_name.title()
+        self.statistics_format = statistics_format or ("Max. {worst} {unit} | Avg. {average} {unit}\n" if worst == "max"
+                                                       else "Min. {worst} {unit} | Avg. {average} {unit}\n")
+        self.timeline_format = timeline_format
+
+    def read(self, each_hour):
+        """
+        Reads and rounds the metric from one hour of forecast data
+
+        :param each_hour: Hourly forecast entry
+
+        :return: The rounded value, or None when the provider did not supply it
+        """
+        value = each_hour[self.source_field]
+        if value is None or self.digits is None:
+            return value
+        return round(value) if self.digits == 0 else round(value, self.digits)
+
+    def impact(self, worst_value):
+        """
+        Classifies the worst value of a period with the metric's threshold ladder
+
+        :param worst_value: Highest (or, for 'min' metrics, lowest) value of the period
+
+        :return: Impact of the first threshold the value stays within
+        """
+        for level, threshold in enumerate(self.thresholds):
+            if (worst_value <= threshold) if self.worst == "max" else (worst_value >= threshold):
+                return Impact(level, self.labels[level])
+        return Impact(len(self.thresholds), self.labels[-1])
+
+
+class Metric_Registry:
+    """
+    Named groups of metric declarations. Every registered metric is evaluated in one pass over the hours ('evaluate')
+    and each analyzer reads its group from the shared result; adding a metric to a group adds it to the analyzer's
+    report, summary and timelines
+    """
+    GROUPS = {}
+
+    @staticmethod
+    def register(group, metrics):
+        """
+        Declares the metrics of a group. Metric names are unique across groups, since they key the shared timeline rows
+
+        :param group: Name of the group (e.g. 'wind')
+        :param metrics: Iterable of Metric declarations, in report order
+
+        :return: Tuple of the group's metrics
+        """
+        metrics = tuple(metrics)
+        registered_names = {metric.name for other_group, other_metrics in Metric_Registry.GROUPS.items()
+                            if other_group != group for metric in other_metrics}
+        for metric in metrics:
+            if metric.name in registered_names:
+                raise Exception(f"- METRIC '{metric.name}' IS ALREADY REGISTERED IN ANOTHER GROUP")
+        Metric_Registry.GROUPS[group] = metrics
+        return metrics
+
+    @staticmethod
+    def all_metrics():
+        """
+        Collects the metrics of every group in registration order
+
+        :return: Tuple of Metric declarations
+        """
+        return tuple(metric for metrics in Metric_Registry.GROUPS.values() for metric in metrics)
+
+    @staticmethod
+    def evaluate(top_timeline_count, hourly_selected_forecast_data, metrics=None):
+        """
+        Evaluates metrics in a single pass over the hours, so the analyzers of one report share one loop
+
+        :param top_timeline_count: The number of hours kept in each metric's top-N timeline
+        :param hourly_selected_forecast_data: Hourly forecast entries of the analysis period
+        :param metrics: Metric declarations to evaluate (defaults to every registered metric)
+
+        :return: A Metric_Evaluation
+        """
+        return Metric_Evaluation(top_timeline_count, hourly_selected_forecast_data,
+                                 Metric_Registry.all_metrics() if metrics is None else tuple(metrics))
+
+    @staticmethod
+    def find(group):
+        """
+        Retrieves the metrics of a group
+
+        :param group: Name of the group
+
+        :return: Tuple of Metric declarations
+        """
+        if group not in Metric_Registry.GROUPS:
+            raise Exception(f"- UNKNOWN METRIC GROUP '{group}' (CHOOSE FROM {', '.join(Metric_Registry.GROUPS)})")
+        return Metric_Registry.GROUPS[group]
+
+
+class Metric_Evaluation(Read_Only_Analysis):
+    """
+    Result of evaluating several metrics in a single pass over the hours: the timeline rows hold every evaluated
+    metric, and the worst value, the average, the impact and the top-N hours of each metric are gathered in the same
+    loop
+    """
+    __slots__ = ("top_timeline_count", "metrics", "timeline", "statistics")
+
+    def __init__(self, top_timeline_count, hourly_selected_forecast_data, metrics):
+        self.assign(top_timeline_count=top_timeline_count, metrics=metrics)
+        self.analyze(hourly_selected_forecast_data)
+
+    def analyze(self, hourly_selected_forecast_data):
+        """
+        Walks the hours once, building the read-only timeline and the statistics of every metric
+
+        :param hourly_selected_forecast_data: Hourly forecast entries of the analysis period
+
+        :return: None
+        """
+        metrics = self.metrics
+        worst_values = [None] * len(metrics)
+        totals = [0] * len(metrics)
+        counts = [0] * len(metrics)
+        # Min-heaps of (rank, -hour index, hour index) keeping the top-N hours; equal values keep the earlier hour
+        top_heaps = [[] for _ in metrics]
+        timeline = []
+        for hour_index, each_hour in enumerate(hourly_selected_forecast_data):
+            row = {"time": Time_Lookup.parse_hour_time(each_hour["time"])[1]}
+            for metric_index, metric in enumerate(metrics):
+                value = row[metric.name] = metric.read(each_hour)
+                if value is None:
+                    continue
+                totals[metric_index] += value
+                counts[metric_index] += 1
+                rank = value if metric.worst == "max" else -value
+                worst_value = worst_values[metric_index]
+                if worst_value is None or rank > (worst_value if metric.worst == "max" else -worst_value):
+                    worst_values[metric_index] = value
+                if self.top_timeline_count > 0:
+                    top_heap = top_heaps[metric_index]
+                    if len(top_heap) < self.top_timeline_count:
+                        heapq.heappush(top_heap, (rank, -hour_index, hour_index))
+                    else:
+                        heapq.heappushpop(top_heap, (rank, -hour_index, hour_index))
+            timeline.append(MappingProxyType(row))
+
+        timeline = tuple(timeline)
+        statistics = {}
+        for metric_index, metric in enumerate(metrics):
+            if not counts[metric_index]:
+                continue
+            statistics[metric.name] = MappingProxyType({
+                "worst": worst_values[metric_index],
+                "average": round(totals[metric_index] / counts[metric_index], metric.digits or None),
+                "impact": metric.impact(worst_values[metric_index]),
+                "top_hours": tuple(timeline[hour_index] for hour_index in
+                                   sorted(hour_index for _, _, hour_index in top_heaps[metric_index]))})
+        self.assign(timeline=timeline, statistics=MappingProxyType(statistics))
+
+
+class Metric_Analysis(Read_Only_Analysis):
+    """
+    Analyzer of the metrics declared in METRICS. The statistics come from a Metric_Evaluation, which is shared when
+    the caller evaluated every analyzer's metrics at once, or evaluated for METRICS alone otherwise
+    """
+    __slots__ = ("top_timeline_count", "hourly_selected_forecast_data", "timeline", "statistics")
+    METRICS = ()
+
+    def __init__(self, top_timeline_count, hourly_selected_forecast_data, evaluation=None):
+        """
+        Selects the analyzer's metrics from an evaluation
+
+        :param top_timeline_count: The number of hours to display in each timeline
+        :param hourly_selected_forecast_data: Hourly forecast entries of the analysis period
+        :param evaluation: Metric_Evaluation or forecast matrix Day_Summary covering METRICS (None evaluates METRICS
+                           here). Its timeline rows may hold other analyzers' metrics as well
+        """
+        hourly_selected_forecast_data = tuple(hourly_selected_forecast_data)
+        if evaluation is None:
+            evaluation = Metric_Registry.evaluate(top_timeline_count, hourly_selected_forecast_data, self.METRICS)
+        self.assign(top_timeline_count=top_timeline_count, hourly_selected_forecast_data=hourly_selected_forecast_data,
+                    timeline=evaluation.timeline,
+                    statistics=MappingProxyType({metric.name: evaluation.statistics[metric.name]
+                                                 for metric in self.METRICS if metric.name in evaluation.statistics}))
+
+    @classmethod
+    def find_metric(cls, name):
+        """
+        Retrieves one of the analyzer's metric declarations
+
+        :param name: Name of the metric (e.g. 'gust')
+
+        :return: The Metric declaration
+        """
+        for metric in cls.METRICS:
+            if metric.name == name:
+                return metric
+        raise Exception(f"- UNKNOWN METRIC '{name}' FOR {cls.__name__.upper()}")
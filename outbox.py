@@ -0,0 +1,283 @@
+import time
+import sqlite3
+from threading import Thread, Event
+from messenger import Messenger
+
+
+class Message_Outbox:
+    """
+    Durable SQLite queue of message bodies waiting to be delivered. Every body has an idempotency key, so enqueuing the
+    same report twice stores it once, and a per-recipient sequence number, so a recipient's messages are delivered in
+    order. Delivery state survives restarts
+    """
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_SECONDS = 2
+    LEASE_SECONDS = 60
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        connection = self.connect()
+        with connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    recipient TEXT NOT NULL,
+                    sequence INTEGER NOT NULL,
+                    body TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease_expires_at REAL,
+                    provider_id TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    sent_at REAL,
+                    UNIQUE (recipient, sequence)
+                );
+                CREATE INDEX IF NOT EXISTS outbox_ready ON outbox (status, available_at);
+            """)
+        connection.close()
+
+    def connect(self):
+        """
+        Opens a connection in write-ahead-log mode so readers never block the worker committing a batch. Each thread
+        uses its own connection
+
+        :return: A sqlite3 connection
+        """
+        connection = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def enqueue(self, connection, recipient, bodies, idempotency_key):
+        """
+        Adds a report's message bodies for one recipient in a single transaction. Bodies whose key already exists are
+        skipped, so re-running a report does not send it twice
+
+        :param connection: A connection from 'connect'
+        :param recipient: Phone number of the recipient
+        :param bodies: List of message bodies, in delivery order
+        :param idempotency_key: Identifies the report for this recipient (e.g. recipient, date and cache key)
+
+        :return: Number of bodies that were added
+        """
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            next_sequence = connection.execute(
+                "SELECT COALESCE(MAX(sequence), 0) + 1 FROM outbox WHERE recipient = ?", (recipient,)).fetchone()[0]
+            added_count = 0
+            for body_index, body in enumerate(bodies):
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO outbox (idempotency_key, recipient, sequence, body, available_at, "
+                    "created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (f"{idempotency_key}:{body_index}", recipient, next_sequence + added_count, body, now, now))
+                added_count += cursor.rowcount
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return added_count
+
+    def claim(self, connection, batch_size):
+        """
+        Leases a batch of messages that are ready to send. A message is only ready when every earlier message of its
+        recipient has been sent or has failed permanently, and leases left behind by a crashed worker are released
+        first
+
+        :param connection: A connection from 'connect'
+        :param batch_size: Maximum number of messages to lease
+
+        :return: List of (id, recipient, body) tuples
+        """
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("UPDATE outbox SET status = ?, lease_expires_at = NULL "
+                               "WHERE status = ? AND lease_expires_at < ?", (self.PENDING, self.SENDING, now))
+            messages = connection.execute(
+                "SELECT id, recipient, body FROM outbox AS message WHERE status = ? AND available_at <= ? "
+                "AND NOT EXISTS (SELECT 1 FROM outbox AS earlier WHERE earlier.recipient = message.recipient "
+                "AND earlier.sequence < message.sequence AND earlier.status IN (?, ?)) "
+                "ORDER BY id LIMIT ?", (self.PENDING, now, self.PENDING, self.SENDING, batch_size)).fetchall()
+            connection.executemany("UPDATE outbox SET status = ?, attempts = attempts + 1, lease_expires_at = ? "
+                                   "WHERE id = ?",
+                                   [(self.SENDING, now + self.LEASE_SECONDS, message[0]) for message in messages])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return messages
+
+    def renew_leases(self, connection, message_ids):
+        """
+        Extends the leases of a batch that is still being sent, so a slow batch is not released to another worker
+        halfway through
+
+        :param connection: A connection from 'connect'
+        :param message_ids: Ids of the leased messages
+
+        :return: None
+        """
+        connection.execute(f"UPDATE outbox SET lease_expires_at = ? WHERE status = ? "
+                           f"AND id IN ({', '.join('?' * len(message_ids))})",
+                           (time.time() + self.LEASE_SECONDS, self.SENDING, *message_ids))
+
+    def record_results(self, connection, delivered, failed):
+        """
+        Commits the outcome of a batch at once. Failed messages are retried with exponential backoff until
+        MAX_ATTEMPTS, after which they are marked as failed
+
+        :param connection: A connection from 'connect'
+        :param delivered: List of (id, provider message id) tuples
+        :param failed: List of (id, error message) tuples
+
+        :return: None
+        """
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("UPDATE outbox SET status = ?, provider_id = ?, sent_at = ?, "
+                                   "lease_expires_at = NULL WHERE id = ?",
+                                   [(self.SENT, provider_id, now, message_id) for message_id, provider_id in delivered])
+            for message_id, error in failed:
+                attempts = connection.execute("SELECT attempts FROM outbox WHERE id = ?", (message_id,)).fetchone()[0]
+                status = self.FAILED if attempts >= self.MAX_ATTEMPTS else self.PENDING
+                connection.execute("UPDATE outbox SET status = ?, last_error = ?, available_at = ?, "
+                                   "lease_expires_at = NULL WHERE id = ?",
+                                   (status, error, now + self.RETRY_BASE_SECONDS * 2 ** (attempts - 1), message_id))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def has_unfinished(self, connection):
+        """
+        Checks whether any message is still waiting to be sent or being sent
+
+        :param connection: A connection from 'connect'
+
+        :return: True if a pending or leased message remains
+        """
+        return connection.execute("SELECT EXISTS (SELECT 1 FROM outbox WHERE status IN (?, ?))",
+                                  (self.PENDING, self.SENDING)).fetchone()[0] == 1
+
+    def count_by_status(self, connection):
+        """
+        Counts the messages in each delivery state
+
+        :param connection: A connection from 'connect'
+
+        :return: Dictionary of status -> message count
+        """
+        return dict(connection.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class Outbox_Worker_Pool:
+    """
+    Drains a Message_Outbox with several worker threads. Each worker leases a batch, renews the lease before every
+    send and commits the results together. A crash between a send and its commit re-sends that message after the lease
+    expires, so delivery is at-least-once; smaller batches narrow that window
+    """
+    IDLE_SLEEP_SECONDS = 0.2
+
+    def __init__(self, outbox, sender=Messenger.send_text, worker_count=4, batch_size=20):
+        self.outbox = outbox
+        self.sender = sender
+        self.worker_count = worker_count
+        self.batch_size = batch_size
+        self.stop_event = Event()
+        # Set by 'finish': workers exit once nothing is waiting or being sent
+        self.finish_event = Event()
+        self.workers = []
+
+    def drain_batch(self, connection):
+        """
+        Leases, sends and records one batch
+
+        :param connection: The worker's own connection
+
+        :return: Number of messages attempted
+        """
+        messages = self.outbox.claim(connection, self.batch_size)
+        message_ids = [message[0] for message in messages]
+        delivered, failed = [], []
+        for message_id, recipient, body in messages:
+            # Renewed before every send, so the lease always outlasts one send plus the batch's final commit
+            self.outbox.renew_leases(connection, message_ids)
+            try:
+                message = self.sender(body, recipient)
+                delivered.append((message_id, getattr(message, "sid", None)))
+            except Exception as error:
+                failed.append((message_id, str(error)))
+        if messages:
+            self.outbox.record_results(connection, delivered, failed)
+        return len(messages)
+
+    def work(self, stop_when_idle):
+        """
+        Worker loop: drains batches until stopped, or until nothing is ready when 'stop_when_idle' is set
+
+        :param stop_when_idle: Exits once no message is waiting or being sent
+
+        :return: None
+        """
+        connection = self.outbox.connect()
+        try:
+            while not self.stop_event.is_set():
+                if self.drain_batch(connection) == 0:
+                    if ((stop_when_idle or self.finish_event.is_set())
+                            and not self.outbox.has_unfinished(connection)):
+                        return
+                    self.stop_event.wait(self.IDLE_SLEEP_SECONDS)
+        finally:
+            connection.close()
+
+    def start(self, stop_when_idle=False):
+        """
+        Starts the worker threads
+
+        :param stop_when_idle: Workers exit once no message is waiting or being sent
+
+        :return: None
+        """
+        self.stop_event.clear()
+        self.finish_event.clear()
+        self.workers = [Thread(target=self.work, args=(stop_when_idle,), name=f"outbox-worker-{index}", daemon=True)
+                        for index in range(self.worker_count)]
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        """
+        Signals the workers to finish their current batch and waits for them
+
+        :return: None
+        """
+        self.stop_event.set()
+        self.join()
+
+    def finish(self):
+        """
+        Lets the workers deliver everything still queued, including messages retried with backoff, then waits for
+        them to exit
+
+        :return: None
+        """
+        self.finish_event.set()
+        self.join()
+
+    def join(self):
+        """
+        Waits for every worker thread to exit
+
+        :return: None
+        """
+        for worker in self.workers:
+            worker.join()
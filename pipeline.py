@@ -0,0 +1,361 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from alert import Alert_Index
+from report import Report
+from report_cache import Report_Cache
+from template import Report_Template
+from encoding_planner import Encoding_Planner
+from messenger import Messenger
+from outbox import Message_Outbox, Outbox_Worker_Pool
+from refresh_policy import Refresh_Policy
+from subscriber_roster import Subscriber_Roster
+from weather_provider import Weather_Provider
+
+
+class Stage_Statistics:
+    """
+    Counts the work done by one pipeline stage
+    """
+    __slots__ = ("name", "worker_count", "completed", "failed", "busy_seconds")
+
+    def __init__(self, name, worker_count):
+        self.name = name
+        self.worker_count = worker_count
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def to_dict(self):
+        """
+        Converts the statistics into plain data. 'stage_seconds' is the busy time divided by the worker count, the
+        wall time the stage would need on its own
+
+        :return: Dictionary of the stage's counts and timings
+        """
+        return {"workers": self.worker_count, "completed": self.completed, "failed": self.failed,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "stage_seconds": round(self.busy_seconds / self.worker_count, 3)}
+
+
+class Report_Pipeline:
+    """
+    Runs fetch -> analyze/render -> send as three concurrent stages connected by bounded queues. Fetch and send
+    workers wait on I/O on an I/O executor, render workers run on their own executor, and a full queue makes the
+    stage before it wait, so slow delivery holds back rendering instead of piling reports up in memory. The send stage
+    queues each report in the Message_Outbox, and an Outbox_Worker_Pool delivers it with retries, as main() does.
+    With a Refresh_Policy, each run only fetches the locations the policy finds due, and 'watch' keeps running,
+    picking up changes to the Subscriber_Roster between runs
+    """
+    FETCH_WORKERS = 4
+    RENDER_WORKERS = 2
+    SEND_WORKERS = 8
+    QUEUE_SIZE = 32
+    OUTBOX_PATH = "outbox.db"
+
+    def __init__(self, provider, profiles, report_cache=None, sender=Messenger.send_text, fetch_workers=FETCH_WORKERS,
+                 render_workers=RENDER_WORKERS, send_workers=SEND_WORKERS, queue_size=QUEUE_SIZE, outbox=None,
+                 refresh_policy=None, subscriber_roster=None):
+        self.provider = provider
+        self.profiles = profiles
+        self.report_cache = report_cache or Report_Cache()
+        self.sender = sender
+        self.queue_size = queue_size
+        self.outbox = outbox or Message_Outbox(self.OUTBOX_PATH)
+        self.refresh_policy = refresh_policy
+        self.subscriber_roster = subscriber_roster
+        self.stages = {"fetch": Stage_Statistics("fetch", fetch_workers),
+                       "render": Stage_Statistics("render", render_workers),
+                       "send": Stage_Statistics("send", send_workers)}
+        self.errors = []
+
+    def group_profiles(self):
+        """
+        Groups subscribers by location so each location is fetched once, for the most days any of them needs
+
+        :return: Dictionary of location -> list of Subscriber_Profile
+        """
+        profiles_by_location = {}
+        for profile in self.profiles:
+            profiles_by_location.setdefault(profile.location, []).append(profile)
+        return profiles_by_location
+
+    def select_due_locations(self, profiles_by_location):
+        """
+        Registers every location's play windows with the refresh policy, drops the locations nobody subscribes to
+        anymore and keeps the locations it finds due. Every location is due when there is no refresh policy
+
+        :param profiles_by_location: Dictionary of location -> list of Subscriber_Profile
+
+        :return: Dictionary of the due locations -> list of Subscriber_Profile
+        """
+        if self.refresh_policy is None:
+            return profiles_by_location
+        for location in self.refresh_policy.schedules.keys() - profiles_by_location.keys():
+            self.refresh_policy.unregister(location)
+        for location, location_profiles in profiles_by_location.items():
+            self.refresh_policy.register(location, [(profile.start_time, profile.end_time)
+                                                    for profile in location_profiles])
+        return {location: profiles_by_location[location] for location in self.refresh_policy.due_locations()}
+
+    def reload_profiles(self):
+        """
+        Takes the subscriber roster's profiles when its file changed. A file that can no longer be read is reported
+        and the profiles loaded before are kept
+
+        :return: True if the profiles were replaced, otherwise False
+        """
+        if self.subscriber_roster is None:
+            return False
+        try:
+            if not self.subscriber_roster.reload_if_changed():
+                return False
+        except Exception as error:
+            print(f"Subscriber Reload Failed:\n"
+                  f"{error}")
+            return False
+        if self.subscriber_roster.invalid_profiles:
+            print(self.subscriber_roster.format_validation_report())
+        self.profiles = self.subscriber_roster.profiles
+        return True
+
+    def render_report(self, forecast, alert_index, profile, forecast_day):
+        """
+        Renders one subscriber's report for a forecast day, sharing the rendering with identical subscribers
+
+        :param forecast: A Forecast instance from a weather provider
+        :param alert_index: Alert_Index holding the forecast's alerts
+        :param profile: Subscriber_Profile of the recipient
+        :param forecast_day: Index of the forecast day
+
+        :return: Tuple of the report cache key and the Cached_Report
+        """
+        cache_key = self.report_cache.build_key(forecast.build_payload_hash(), forecast_day, profile.start_time,
+                                                profile.end_time, profile.top_timeline_count,
+                                                profile.rain_check_hours_prior, profile.channel)
+
+        def render():
+            report_details = Report.build(forecast, forecast_day, profile.start_time, profile.end_time,
+                                          profile.top_timeline_count, profile.rain_check_hours_prior, alert_index,
+                                          Report_Template.CHANNEL_PROFILES[profile.channel])
+            return report_details.formatted_report, Encoding_Planner(profile.channel).plan(
+                report_details.formatted_report, Messenger.CHARACTER_LIMITS[profile.channel])
+
+        return cache_key, self.report_cache.get_or_render(cache_key, render)
+
+    def render_reports(self, forecast, alert_index, profile):
+        """
+        Renders every forecast day a subscriber receives
+
+        :param forecast: A Forecast instance from a weather provider
+        :param alert_index: Alert_Index holding the forecast's alerts
+        :param profile: Subscriber_Profile of the recipient
+
+        :return: List of (report cache key, Cached_Report) tuples, one per forecast day
+        """
+        return [self.render_report(forecast, alert_index, profile, forecast_day)
+                for forecast_day in range(profile.days_to_show)]
+
+    def send_reports(self, profile, cached_reports):
+        """
+        Queues the message bodies of a subscriber's reports in the outbox, in order, keyed on the report cache key so
+        a report queued again is stored once. The outbox delivers a recipient's messages in the order they were queued
+
+        :param profile: Subscriber_Profile of the recipient
+        :param cached_reports: List of (report cache key, Cached_Report) tuples from 'render_reports'
+
+        :return: None
+        """
+        connection = self.outbox.connect()
+        try:
+            for cache_key, cached_report in cached_reports:
+                self.outbox.enqueue(connection, profile.phone_number, cached_report.message_plan.bodies,
+                                    f"{profile.phone_number}:{cache_key}")
+        finally:
+            connection.close()
+
+    async def run_stage(self, stage, work):
+        """
+        Times one unit of a stage's work and records its outcome
+
+        :param stage: Stage_Statistics of the stage
+        :param work: Awaitable performing the work
+
+        :return: The work's result, or None when it failed
+        """
+        started = time.perf_counter()
+        try:
+            result = await work
+            stage.completed += 1
+            return result
+        except Exception as error:
+            self.record_error(stage, error)
+            return None
+        finally:
+            stage.busy_seconds += time.perf_counter() - started
+
+    def record_error(self, stage, error):
+        """
+        Counts a failed unit of a stage's work and keeps its error
+
+        :param stage: Stage_Statistics of the stage
+        :param error: The exception raised by the work
+
+        :return: None
+        """
+        stage.failed += 1
+        self.errors.append(f"{stage.name.upper()}: {error}")
+
+    async def fetch_worker(self, io_executor, location_queue, render_queue):
+        """
+        Fetches forecasts and queues one render job per subscriber. A failing job is recorded and the queue item is
+        always marked done, so 'run' never waits on it
+
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            location, location_profiles = await location_queue.get()
+            try:
+                days_to_show = max(profile.days_to_show for profile in location_profiles)
+                forecast = await self.run_stage(self.stages["fetch"], loop.run_in_executor(
+                    io_executor, self.provider.fetch_forecast, location, days_to_show))
+                if self.refresh_policy is not None:
+                    if forecast is None:
+                        self.refresh_policy.record_failure(location)
+                    else:
+                        self.refresh_policy.record_fetch(location, forecast.forecast_days)
+                if forecast is not None:
+                    # Built before the index is shared, so the render threads only ever read it
+                    alert_index = Alert_Index.for_forecast(forecast)
+                    for profile in location_profiles:
+                        await render_queue.put((forecast, alert_index, profile))
+            except Exception as error:
+                self.record_error(self.stages["fetch"], error)
+            finally:
+                location_queue.task_done()
+
+    async def render_worker(self, render_executor, render_queue, send_queue):
+        """
+        Renders reports on the render executor and queues them for delivery
+
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            forecast, alert_index, profile = await render_queue.get()
+            try:
+                cached_reports = await self.run_stage(self.stages["render"], loop.run_in_executor(
+                    render_executor, self.render_reports, forecast, alert_index, profile))
+                if cached_reports is not None:
+                    await send_queue.put((profile, cached_reports))
+            except Exception as error:
+                self.record_error(self.stages["render"], error)
+            finally:
+                render_queue.task_done()
+
+    async def send_worker(self, io_executor, send_queue):
+        """
+        Queues rendered reports for delivery
+
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            profile, cached_reports = await send_queue.get()
+            try:
+                await self.run_stage(self.stages["send"], loop.run_in_executor(
+                    io_executor, self.send_reports, profile, cached_reports))
+            except Exception as error:
+                self.record_error(self.stages["send"], error)
+            finally:
+                send_queue.task_done()
+
+    async def run(self):
+        """
+        Pushes every subscriber through the three stages while the outbox workers deliver, and waits until every
+        report is delivered or has failed. The stage statistics and errors only cover this run
+
+        :return: Dictionary with the wall time, each stage's statistics, the outbox counts by status and the report
+         cache statistics
+        """
+        started = time.perf_counter()
+        self.stages = {name: Stage_Statistics(name, stage.worker_count) for name, stage in self.stages.items()}
+        self.errors = []
+        loop = asyncio.get_running_loop()
+        outbox_pool = Outbox_Worker_Pool(self.outbox, self.sender, self.stages["send"].worker_count)
+        outbox_pool.start()
+        location_queue = asyncio.Queue()
+        render_queue = asyncio.Queue(self.queue_size)
+        send_queue = asyncio.Queue(self.queue_size)
+        for location, location_profiles in self.select_due_locations(self.group_profiles()).items():
+            location_queue.put_nowait((location, location_profiles))
+
+        io_worker_count = self.stages["fetch"].worker_count + self.stages["send"].worker_count
+        with (ThreadPoolExecutor(io_worker_count, thread_name_prefix="pipeline-io") as io_executor,
+              ThreadPoolExecutor(self.stages["render"].worker_count,
+                                 thread_name_prefix="pipeline-render") as render_executor):
+            workers = ([asyncio.create_task(self.fetch_worker(io_executor, location_queue, render_queue))
+                        for _ in range(self.stages["fetch"].worker_count)]
+                       + [asyncio.create_task(self.render_worker(render_executor, render_queue, send_queue))
+                          for _ in range(self.stages["render"].worker_count)]
+                       + [asyncio.create_task(self.send_worker(io_executor, send_queue))
+                          for _ in range(self.stages["send"].worker_count)])
+            # Each queue is only joined once the stage feeding it has drained, so no job is still in flight
+            await location_queue.join()
+            await render_queue.join()
+            await send_queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        await loop.run_in_executor(None, outbox_pool.finish)
+
+        connection = self.outbox.connect()
+        try:
+            outbox_counts = self.outbox.count_by_status(connection)
+        finally:
+            connection.close()
+        return {"wall_seconds": round(time.perf_counter() - started, 3),
+                "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+                "outbox": outbox_counts, "report_cache": self.report_cache.statistics()}
+
+    async def watch(self, max_cycles=None, idle_sleep_seconds=60):
+        """
+        Keeps running the pipeline, sleeping until the refresh policy's next refresh is due in between and reloading
+        the subscriber roster before every run. A report is only sent again when its forecast changed, since the
+        outbox stores a report queued again once
+
+        :param max_cycles: Stops after this many runs when provided (runs indefinitely otherwise)
+        :param idle_sleep_seconds: Longest sleep between runs
+
+        :return: Results of the last run
+        """
+        if self.refresh_policy is None:
+            raise Exception("- WATCHING REQUIRES A REFRESH POLICY")
+        cycle_count = 0
+        results = None
+        while max_cycles is None or cycle_count < max_cycles:
+            self.reload_profiles()
+            results = await self.run()
+            cycle_count += 1
+            if max_cycles is None or cycle_count < max_cycles:
+                next_wakeup = self.refresh_policy.next_wakeup()
+                await asyncio.sleep(idle_sleep_seconds if next_wakeup is None
+                                    else min(idle_sleep_seconds, max(0.0, next_wakeup - time.time())))
+        return results
+
+
+if __name__ == "__main__":
+    # SUBSCRIBER_FILE points to the TOML or JSON roster (see subscriber_roster.py)
+    subscriber_roster = Subscriber_Roster(os.getenv("SUBSCRIBER_FILE", "subscribers.toml"))
+    if subscriber_roster.invalid_profiles:
+        print(subscriber_roster.format_validation_report())
+    report_pipeline = Report_Pipeline(Weather_Provider.create(os.getenv("WEATHER_PROVIDER", "weatherapi")),
+                                      subscriber_roster.profiles, subscriber_roster=subscriber_roster)
+    # WATCH keeps refreshing each location when its Refresh_Policy finds it due instead of running once
+    if os.getenv("WATCH"):
+        report_pipeline.refresh_policy = Refresh_Policy(int(os.getenv("REFRESH_DAILY_QUOTA", 0)) or None)
+        print(asyncio.run(report_pipeline.watch()))
+    else:
+        print(asyncio.run(report_pipeline.run()))
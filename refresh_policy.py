@@ -0,0 +1,347 @@
+import time
+from bisect import bisect_right
+from collections import deque
+
+
+class Location_Schedule:
+    """
+    Refresh state of one location: its subscribers' play windows, the values seen in the last fetch and how much they
+    have been changing between fetches
+    """
+    __slots__ = ("location", "play_windows", "registered_at", "hourly_values", "window_starts", "settled_windows",
+                 "volatility", "urgency", "last_fetch_at", "next_fetch_at", "fetch_count")
+
+    def __init__(self, location, play_windows, registered_at, initial_volatility):
+        self.location = location
+        self.play_windows = play_windows
+        self.registered_at = registered_at
+        self.hourly_values = {}
+        self.window_starts = []
+        self.settled_windows = 0
+        self.volatility = initial_volatility
+        self.urgency = 1.0
+        self.last_fetch_at = None
+        self.next_fetch_at = registered_at
+        self.fetch_count = 0
+
+
+class Refresh_Policy:
+    """
+    Schedules forecast refreshes per location instead of on a fixed interval. After each fetch, the change in wind gust
+    and chance of rain during the play windows updates the location's volatility. Volatility together with the time
+    left before the next play window decides when to fetch again, between MIN_INTERVAL_SECONDS and
+    MAX_INTERVAL_SECONDS. A daily quota caps the calls across all locations, with the most urgent locations served
+    first
+    """
+    MIN_INTERVAL_SECONDS = 15 * 60
+    MAX_INTERVAL_SECONDS = 6 * 3600
+    # Interval of the fixed schedule the policy is measured against
+    BASELINE_INTERVAL_SECONDS = 3600
+    # A location is always refreshed once within this many seconds before each play window
+    PRE_WINDOW_LEAD_SECONDS = 3600
+    # Hours before a play window at which its proximity weight has halved
+    PROXIMITY_HOURS = 3
+    # Average hourly change treated as fully volatile (kph of gust, percentage points of chance of rain)
+    GUST_CHANGE_SCALE = 10
+    RAIN_CHANCE_CHANGE_SCALE = 20
+    GUST_WEIGHT = 0.5
+    RAIN_CHANCE_WEIGHT = 0.5
+    # Weight of the latest change in the volatility (exponential moving average)
+    VOLATILITY_SMOOTHING = 0.5
+    INITIAL_VOLATILITY = 0.5
+    QUOTA_PERIOD_SECONDS = 24 * 3600
+    # Number of recent window ages and forecast changes kept for the statistics
+    HISTORY_SIZE = 1000
+
+    def __init__(self, daily_quota=None, min_interval_seconds=MIN_INTERVAL_SECONDS,
+                 max_interval_seconds=MAX_INTERVAL_SECONDS, baseline_interval_seconds=BASELINE_INTERVAL_SECONDS):
+        self.daily_quota = daily_quota
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self.baseline_interval_seconds = baseline_interval_seconds
+        self.schedules = {}
+        # Token bucket refilled at daily_quota per QUOTA_PERIOD_SECONDS, holding up to one hour of calls
+        self.quota_capacity = max(1.0, daily_quota / 24) if daily_quota else None
+        self.quota_tokens = self.quota_capacity
+        self.quota_updated_at = None
+        self.deferred_by_quota = 0
+        self.windows_started = 0
+        self.window_ages = deque(maxlen=self.HISTORY_SIZE)
+        self.changes = deque(maxlen=self.HISTORY_SIZE)
+
+    def register(self, location, play_windows, now=None):
+        """
+        Adds a location, or replaces its play windows, and makes it due immediately if it was never fetched
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param play_windows: List of (start_time, end_time) hours of the location's subscribers
+        :param now: Current epoch time (defaults to time.time())
+
+        :return: The Location_Schedule
+        """
+        now = time.time() if now is None else now
+        schedule = self.schedules.get(location)
+        if schedule is None:
+            schedule = self.schedules[location] = Location_Schedule(location, sorted(set(play_windows)), now,
+                                                                    self.INITIAL_VOLATILITY)
+        else:
+            schedule.play_windows = sorted(set(play_windows))
+        return schedule
+
+    def unregister(self, location):
+        """
+        Stops refreshing a location, e.g. once no subscriber plays there anymore
+
+        :param location: Coordinates formatted as 'lat,lon'
+
+        :return: None
+        """
+        self.schedules.pop(location, None)
+
+    def build_window_epochs(self, schedule, forecast_days):
+        """
+        Converts the play windows into epoch ranges for every forecast day
+
+        :param schedule: Location_Schedule of the location
+        :param forecast_days: Forecast days holding 24 hourly entries with 'time_epoch'
+
+        :return: Sorted list of (window start epoch, window end epoch) tuples
+        """
+        return sorted((forecast_day["hour"][start_time]["time_epoch"],
+                       forecast_day["hour"][end_time - 1]["time_epoch"] + 3600)
+                      for forecast_day in forecast_days for start_time, end_time in schedule.play_windows)
+
+    @staticmethod
+    def merge_windows(window_epochs):
+        """
+        Merges nested, overlapping and touching windows so each hour falls in at most one window and a single binary
+        search finds it
+
+        :param window_epochs: Sorted list of (start epoch, end epoch) tuples
+
+        :return: Sorted list of disjoint (start epoch, end epoch) tuples
+        """
+        merged_windows = []
+        for window_start, window_end in window_epochs:
+            if merged_windows and window_start <= merged_windows[-1][1]:
+                merged_windows[-1] = (merged_windows[-1][0], max(merged_windows[-1][1], window_end))
+            else:
+                merged_windows.append((window_start, window_end))
+        return merged_windows
+
+    def measure_change(self, schedule, window_epochs, forecast_days, now):
+        """
+        Compares the gust and chance of rain of upcoming play-window hours with the previous fetch
+
+        :param schedule: Location_Schedule of the location
+        :param window_epochs: Play windows as (start epoch, end epoch) tuples
+        :param forecast_days: The newly fetched forecast days
+        :param now: Current epoch time
+
+        :return: Tuple of the weighted change score (1.0 = fully volatile, may exceed 1) and the new hourly values
+        """
+        merged_windows = self.merge_windows(window_epochs)
+        window_start_epochs = [window_start for window_start, _ in merged_windows]
+        hourly_values = {}
+        for forecast_day in forecast_days:
+            for each_hour in forecast_day["hour"]:
+                hour_epoch = each_hour["time_epoch"]
+                window_index = bisect_right(window_start_epochs, hour_epoch) - 1
+                if hour_epoch + 3600 > now and window_index >= 0 and hour_epoch < merged_windows[window_index][1]:
+                    hourly_values[hour_epoch] = (each_hour["gust_kph"] or 0, each_hour["chance_of_rain"] or 0)
+
+        compared_hours = hourly_values.keys() & schedule.hourly_values.keys()
+        if not compared_hours:
+            return None, hourly_values
+        gust_change = sum(abs(hourly_values[hour][0] - schedule.hourly_values[hour][0]) for hour in compared_hours)
+        rain_chance_change = sum(abs(hourly_values[hour][1] - schedule.hourly_values[hour][1])
+                                 for hour in compared_hours)
+        change = (self.GUST_WEIGHT * gust_change / self.GUST_CHANGE_SCALE
+                  + self.RAIN_CHANCE_WEIGHT * rain_chance_change / self.RAIN_CHANCE_CHANGE_SCALE) / len(compared_hours)
+        return change, hourly_values
+
+    def record_fetch(self, location, forecast_days, now=None):
+        """
+        Updates a location's volatility from a new fetch and schedules its next refresh
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param forecast_days: The fetched forecast days (e.g. Forecast.forecast_days)
+        :param now: Current epoch time (defaults to time.time())
+
+        :return: Epoch time of the next refresh
+        """
+        now = time.time() if now is None else now
+        schedule = self.schedules[location]
+        self.settle_windows(schedule, now)
+        window_epochs = self.build_window_epochs(schedule, forecast_days)
+        change, schedule.hourly_values = self.measure_change(schedule, window_epochs, forecast_days, now)
+        if change is not None:
+            self.changes.append(change)
+            schedule.volatility = (self.VOLATILITY_SMOOTHING * change
+                                   + (1 - self.VOLATILITY_SMOOTHING) * schedule.volatility)
+        schedule.window_starts = [window_start for window_start, _ in window_epochs]
+        schedule.settled_windows = bisect_right(schedule.window_starts, now)
+        schedule.last_fetch_at = now
+        schedule.fetch_count += 1
+        schedule.next_fetch_at = now + self.plan_interval(schedule, window_epochs, now)
+        return schedule.next_fetch_at
+
+    def record_failure(self, location, now=None):
+        """
+        Retries a location whose fetch failed after MIN_INTERVAL_SECONDS
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param now: Current epoch time (defaults to time.time())
+
+        :return: Epoch time of the next refresh
+        """
+        now = time.time() if now is None else now
+        schedule = self.schedules[location]
+        schedule.next_fetch_at = now + self.min_interval_seconds
+        return schedule.next_fetch_at
+
+    def plan_interval(self, schedule, window_epochs, now):
+        """
+        Picks the seconds until the next refresh. The urgency (volatility weighted by the proximity of the next play
+        window, between 0 and 1) moves the interval from MAX_INTERVAL_SECONDS down to MIN_INTERVAL_SECONDS on a
+        geometric scale. The refresh is moved earlier when it would otherwise miss the lead time before a window
+
+        :param schedule: Location_Schedule of the location, with its updated volatility
+        :param window_epochs: Play windows as (start epoch, end epoch) tuples
+        :param now: Current epoch time
+
+        :return: Seconds until the next refresh
+        """
+        upcoming_windows = [(window_start, window_end) for window_start, window_end in window_epochs
+                            if window_end > now]
+        if upcoming_windows:
+            hours_until_window = max(0.0, upcoming_windows[0][0] - now) / 3600
+            proximity = 1 / (1 + hours_until_window / self.PROXIMITY_HOURS)
+        else:
+            proximity = 0.0
+        schedule.urgency = min(1.0, schedule.volatility) * proximity
+        interval_ratio = self.min_interval_seconds / self.max_interval_seconds
+        interval = self.max_interval_seconds * interval_ratio ** schedule.urgency
+
+        for window_start, _ in upcoming_windows:
+            lead_start = window_start - self.PRE_WINDOW_LEAD_SECONDS
+            if lead_start > now:
+                interval = min(interval, max(self.min_interval_seconds, lead_start - now))
+                break
+        return interval
+
+    def settle_windows(self, schedule, now):
+        """
+        Records how old the location's data was when each play window that has started since the last check began
+
+        :param schedule: Location_Schedule of the location
+        :param now: Current epoch time
+
+        :return: None
+        """
+        started_windows = bisect_right(schedule.window_starts, now)
+        for window_start in schedule.window_starts[schedule.settled_windows:started_windows]:
+            self.window_ages.append(window_start - schedule.last_fetch_at)
+            self.windows_started += 1
+        schedule.settled_windows = max(schedule.settled_windows, started_windows)
+
+    def refill_quota(self, now):
+        """
+        Adds the calls earned since the last refill to the quota bucket
+
+        :param now: Current epoch time
+
+        :return: None
+        """
+        if self.quota_updated_at is not None:
+            self.quota_tokens = min(self.quota_capacity, self.quota_tokens + (now - self.quota_updated_at)
+                                    * self.daily_quota / self.QUOTA_PERIOD_SECONDS)
+        self.quota_updated_at = now
+
+    def due_locations(self, now=None):
+        """
+        Lists the locations to fetch now, most urgent first, and takes their calls from the quota. Due locations
+        without quota stay due and are offered again on the next call
+
+        :param now: Current epoch time (defaults to time.time())
+
+        :return: List of locations to fetch
+        """
+        now = time.time() if now is None else now
+        due_schedules = []
+        for schedule in self.schedules.values():
+            self.settle_windows(schedule, now)
+            if schedule.next_fetch_at <= now:
+                due_schedules.append(schedule)
+        due_schedules.sort(key=lambda schedule: (-schedule.urgency, schedule.next_fetch_at))
+        if self.daily_quota is None:
+            return [schedule.location for schedule in due_schedules]
+
+        self.refill_quota(now)
+        allowed_count = min(len(due_schedules), int(self.quota_tokens))
+        self.quota_tokens -= allowed_count
+        self.deferred_by_quota += len(due_schedules) - allowed_count
+        return [schedule.location for schedule in due_schedules[:allowed_count]]
+
+    def next_wakeup(self):
+        """
+        Finds when the earliest scheduled refresh is due
+
+        :return: Epoch time of the next refresh, or None when no location is registered
+        """
+        return min((schedule.next_fetch_at for schedule in self.schedules.values()), default=None)
+
+    def run(self, provider, days_to_show, on_forecast, max_cycles=None, idle_sleep_seconds=60):
+        """
+        Keeps fetching due locations and hands every fetched forecast to 'on_forecast'. A failed fetch is retried after
+        MIN_INTERVAL_SECONDS
+
+        :param provider: Weather_Provider used to fetch forecasts
+        :param days_to_show: Number of forecast days to fetch
+        :param on_forecast: Function called with (location, Forecast) after each fetch
+        :param max_cycles: Stops after this many cycles when provided (runs indefinitely otherwise)
+        :param idle_sleep_seconds: Longest sleep between cycles
+
+        :return: None
+        """
+        cycle_count = 0
+        while max_cycles is None or cycle_count < max_cycles:
+            for location in self.due_locations():
+                try:
+                    forecast = provider.fetch_forecast(location, days_to_show)
+                except Exception as error:
+                    print(f"Refresh Failed ({location}):\n"
+                          f"{error}")
+                    self.record_failure(location)
+                    continue
+                self.record_fetch(location, forecast.forecast_days)
+                on_forecast(location, forecast)
+            cycle_count += 1
+            if max_cycles is None or cycle_count < max_cycles:
+                next_wakeup = self.next_wakeup()
+                time.sleep(idle_sleep_seconds if next_wakeup is None
+                           else min(idle_sleep_seconds, max(0.0, next_wakeup - time.time())))
+
+    def statistics(self, now=None):
+        """
+        Measures the API calls saved against a fixed BASELINE_INTERVAL_SECONDS schedule and the freshness of the data
+        when play windows started (averaged over the last HISTORY_SIZE windows and forecast changes)
+
+        :param now: Current epoch time (defaults to time.time())
+
+        :return: Dictionary of call counts and freshness figures
+        """
+        now = time.time() if now is None else now
+        fetch_count = sum(schedule.fetch_count for schedule in self.schedules.values())
+        baseline_count = sum(int((now - schedule.registered_at) // self.baseline_interval_seconds) + 1
+                             for schedule in self.schedules.values())
+        window_ages = sorted(self.window_ages)
+        return {"fetches": fetch_count, "baseline_fetches": baseline_count,
+                "calls_saved": baseline_count - fetch_count,
+                "calls_saved_ratio": round(1 - fetch_count / baseline_count, 3) if baseline_count else 0.0,
+                "deferred_by_quota": self.deferred_by_quota,
+                "windows_started": self.windows_started,
+                "average_age_at_window_start_minutes": round(sum(window_ages) / len(window_ages) / 60, 1)
+                if window_ages else None,
+                "max_age_at_window_start_minutes": round(window_ages[-1] / 60, 1) if window_ages else None,
+                "average_change": round(sum(self.changes) / len(self.changes), 3) if self.changes else None}
@@ -1,9 +1,22 @@
+from template import Report_Template
+from location import Location
+from daylight import Daylight
+from rain import Rain
+from wind import Wind
+from temperature import Temperature
+from condition import Condition
+from date import Date
+from alert import Alert
+from forecast_matrix import Forecast_Matrix
+from structured_report import Structured_Report, Text_Report_Renderer
+
+
 class Report:
     """
     Gathers reports from other metric classes into the main Report class, preparing the data for full report generation
     """
     def __init__(self, location_details, daylight_details, rain_details, wind_details, temperature_details,
-                 condition_details, date_details, alert_details):
+                 condition_details, date_details, alert_details, profile=Report_Template.FULL_PROFILE):
         self.location_details = location_details
         self.daylight_details = daylight_details
         self.rain_details = rain_details
@@ -12,28 +25,45 @@ class Report:
         self.condition_details = condition_details
         self.date_details = date_details
         self.alert_details = alert_details
+        self.template = Report_Template.compile(profile)
+        self.structured_report = Structured_Report.build(self)
         self.formatted_report = self.format_report()
 
+    @staticmethod
+    def build(forecast, forecast_day, start_time, end_time, top_timeline_count, rain_check_hours_prior, alert_index,
+              profile=Report_Template.FULL_PROFILE):
+        """
+        Creates every analyzer for one forecast day and gathers them into a report. The rain, wind and temperature
+        analyzers read a view of the forecast matrix's window summary, which is computed once for all forecast days
+
+        :param forecast: A Forecast instance from a weather provider
+        :param forecast_day: Index of the forecast day
+        :param start_time: The beginning hour of the analysis period
+        :param end_time: The ending hour of the analysis period
+        :param top_timeline_count: The number of hours to display in the timeline report
+        :param rain_check_hours_prior: The number of hours before start_time to check for rain
+        :param alert_index: Alert_Index holding the forecast's alerts
+        :param profile: Name of the layout profile ('full' or 'compact')
+
+        :return: A Report instance
+        """
+        forecast_data = forecast.forecast_days[forecast_day]
+        hourly_selected_forecast_data = forecast_data["hour"][start_time:end_time]
+        day_summary = Forecast_Matrix.for_forecast(forecast).summarize(start_time, end_time,
+                                                                       top_timeline_count).day(forecast_day)
+        return Report(Location(forecast.location), Daylight(forecast_data),
+                      Rain(start_time, end_time, top_timeline_count, rain_check_hours_prior, forecast_data,
+                           day_summary),
+                      Wind(top_timeline_count, hourly_selected_forecast_data, day_summary),
+                      Temperature(top_timeline_count, hourly_selected_forecast_data, day_summary),
+                      Condition(hourly_selected_forecast_data), Date(start_time, end_time, forecast_data),
+                      Alert(alert_index, forecast_data, start_time, end_time, forecast.location_key,
+                            forecast.alerts_available), profile)
+
     def format_report(self):
         """
-        Takes the string representation of each class and formats it into a customized report
+        Renders the structured report into the compiled layout of the report's profile
 
         :return: A string containing the structured report
         """
-        return (f"[{self.date_details.display_forecast_date()}]\n"
-                f"[{self.date_details.display_generation_date()}]\n"
-                f"\n= = = 🗺️ LOCATION 🗺️ = = =\n"
-                f"{self.location_details}"
-                f"{self.daylight_details}\n"
-                f"\n= = = 📝 SUMMARY 📝 = = =\n"
-                f"{self.date_details.display_timeframe_summary()}\n"
-                f"{self.condition_details.condition_summary()}"
-                f"{self.alert_details.alert_summary()}"
-                f"{self.rain_details.rain_summary()}"
-                f"{self.wind_details.wind_summary()}"
-                f"{self.temperature_details.temperature_summary()}"
-                f"{self.alert_details.alert_report()}"
-                f"{self.rain_details.compile_pre_window_rain_report()}"
-                f"{self.rain_details.compile_during_window_rain_report()}"
-                f"{self.wind_details.compile_wind_report()}"
-                f"{self.temperature_details.compile_temperature_report()}\n")
+        return Text_Report_Renderer(self.template).render(self.structured_report)
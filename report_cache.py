@@ -0,0 +1,150 @@
+import sys
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from rain import Rain
+from condition import Condition
+from metric_registry import Metric_Registry
+# Imported so every metric is registered before a threshold profile is built
+from wind import Wind
+from temperature import Temperature
+from atmosphere import Atmosphere
+
+
+class Cached_Report:
+    """
+    Holds a rendered report and its message bodies so subscribers with identical settings share one rendering. The
+    report service also keeps the Structured_Report the text was rendered from
+    """
+    __slots__ = ("formatted_report", "message_plan", "structured_report", "size_bytes")
+
+    def __init__(self, formatted_report, message_plan, structured_report=None):
+        self.formatted_report = formatted_report
+        self.message_plan = message_plan
+        self.structured_report = structured_report
+        self.size_bytes = sys.getsizeof(formatted_report) + sum(sys.getsizeof(each_body)
+                                                                for each_body in message_plan.bodies)
+        if structured_report is not None:
+            # The packed size stands in for the footprint of the report's nested dictionaries
+            self.size_bytes += len(structured_report.to_binary())
+
+
+class Report_Cache:
+    """
+    Least-recently-used cache of rendered reports keyed on a hash of everything that determines the report's content.
+    Note that a cached report keeps the generation time of its first rendering
+    """
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.threshold_profile = self.build_threshold_profile()
+        self.lock = Lock()
+
+    @staticmethod
+    def build_threshold_profile():
+        """
+        Collects everything that turns forecast values into impact levels and labels, since changing any of it changes
+        the rendered report: the rain and condition threshold constants, the thresholds and labels of every registered
+        metric, and the condition playability of each category
+
+        :return: Tuple of (name, value) pairs
+        """
+        threshold_constants = tuple((f"{analyzer.__name__}.{name}", value) for analyzer in (Rain, Condition)
+                                    for name, value in sorted(vars(analyzer).items())
+                                    if name.isupper() and isinstance(value, (int, float)))
+        metric_definitions = tuple((f"Metric.{metric.name}", (metric.thresholds, metric.labels))
+                                   for metric in Metric_Registry.all_metrics())
+        return threshold_constants + metric_definitions + (
+            ("Condition.CATEGORY_PLAYABILITY", tuple(sorted(Condition.CATEGORY_PLAYABILITY.items()))),)
+
+    def build_key(self, payload_hash, forecast_day, start_time, end_time, top_timeline_count, rain_check_hours_prior,
+                  channel):
+        """
+        Builds the content address of a report
+
+        :param payload_hash: Hash of the forecast the report is rendered from
+        :param forecast_day: Index of the forecast day
+        :param start_time: The beginning hour of the analysis period
+        :param end_time: The ending hour of the analysis period
+        :param top_timeline_count: The number of hours to display in the timeline report
+        :param rain_check_hours_prior: The number of hours before start_time to check for rain
+        :param channel: Delivery channel, which decides the layout profile and message bodies
+
+        :return: Hexadecimal SHA-256 digest identifying the report
+        """
+        key_data = (payload_hash, forecast_day, start_time, end_time, top_timeline_count, rain_check_hours_prior,
+                    channel, self.threshold_profile)
+        return hashlib.sha256(repr(key_data).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a report and marks it as the most recently used
+
+        :param key: Content address from 'build_key'
+
+        :return: The Cached_Report, or None on a miss
+        """
+        with self.lock:
+            cached_report = self.entries.get(key)
+            if cached_report is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cached_report
+
+    def put(self, key, formatted_report, message_plan, structured_report=None):
+        """
+        Stores a rendered report, evicting the least recently used reports until the cache fits its bounds
+
+        :param key: Content address from 'build_key'
+        :param formatted_report: Rendered report text
+        :param message_plan: Message_Plan holding the report's message bodies
+        :param structured_report: Structured_Report the text was rendered from (optional)
+
+        :return: The stored Cached_Report
+        """
+        cached_report = Cached_Report(formatted_report, message_plan, structured_report)
+        with self.lock:
+            previous_report = self.entries.pop(key, None)
+            if previous_report is not None:
+                self.total_bytes -= previous_report.size_bytes
+            self.entries[key] = cached_report
+            self.total_bytes += cached_report.size_bytes
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, evicted_report = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_report.size_bytes
+                self.evictions += 1
+        return cached_report
+
+    def get_or_render(self, key, render_report):
+        """
+        Returns the cached report for a key, rendering and storing it on a miss
+
+        :param key: Content address from 'build_key'
+        :param render_report: Function returning the rendered report text and its Message_Plan, optionally followed by
+         its Structured_Report
+
+        :return: The Cached_Report
+        """
+        cached_report = self.get(key)
+        if cached_report is None:
+            cached_report = self.put(key, *render_report())
+        return cached_report
+
+    def statistics(self):
+        """
+        Reports the cache's effectiveness and footprint
+
+        :return: Dictionary with hits, misses, hit rate, evictions, entry count and estimated bytes
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                    "evictions": self.evictions, "entries": len(self.entries), "bytes": self.total_bytes}
@@ -0,0 +1,405 @@
+import json
+import asyncio
+import argparse
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from weather_provider import Weather_Provider
+from configuration_validator import Configuration_Validator
+from alert import Alert_Index
+from report import Report
+from report_cache import Report_Cache
+from template import Report_Template
+from encoding_planner import Encoding_Planner
+from messenger import Messenger
+from forecast_matrix import Forecast_Matrix
+from structured_report import Structured_Report
+from rain import Rain
+from atmosphere import Atmosphere
+
+
+class Forecast_Entry:
+    """
+    Holds a fetched forecast with the structures built from it, so every request served from the entry reuses them
+    """
+    __slots__ = ("forecast", "alert_index", "forecast_matrix", "expires_at")
+
+    def __init__(self, forecast, expires_at):
+        self.forecast = forecast
+        # Built before any request reads it, so the render threads never rebuild a shared index
+        self.alert_index = Alert_Index.for_forecast(forecast)
+        self.forecast_matrix = Forecast_Matrix.for_forecast(forecast)
+        self.expires_at = expires_at
+
+
+class Forecast_Store:
+    """
+    Time-limited forecast cache for the event loop. Concurrent requests for a location that is not cached wait on the
+    same fetch instead of each calling the weather provider. Expired entries are dropped whenever a forecast is stored,
+    and the least recently used entries are evicted beyond MAX_ENTRIES
+    """
+    TTL_SECONDS = 600
+    MAX_ENTRIES = 256
+
+    def __init__(self, provider, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.evictions = 0
+
+    async def get(self, location, days_to_show):
+        """
+        Returns the cached forecast of a location, fetching it once when missing or expired
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param days_to_show: Number of forecast days
+
+        :return: A Forecast_Entry
+        """
+        key = (location, days_to_show)
+        loop = asyncio.get_running_loop()
+        forecast_entry = self.entries.get(key)
+        if forecast_entry is not None and forecast_entry.expires_at > loop.time():
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return forecast_entry
+        fetch_task = self.in_flight.get(key)
+        if fetch_task is None:
+            fetch_task = self.in_flight[key] = loop.create_task(self.fetch(key))
+            fetch_task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so a client disconnecting does not cancel the fetch other requests are waiting on
+        return await asyncio.shield(fetch_task)
+
+    async def fetch(self, key):
+        """
+        Fetches a forecast on the default executor, since the providers use blocking HTTP calls
+
+        :param key: Tuple of location and number of forecast days
+
+        :return: The stored Forecast_Entry
+        """
+        loop = asyncio.get_running_loop()
+        self.fetches += 1
+        forecast = await loop.run_in_executor(None, self.provider.fetch_forecast, *key)
+        forecast_entry = Forecast_Entry(forecast, loop.time() + self.ttl_seconds)
+        self.store(key, forecast_entry, loop.time())
+        return forecast_entry
+
+    def store(self, key, forecast_entry, now):
+        """
+        Stores a forecast as the most recently used entry, dropping expired entries and then the least recently used
+        ones beyond 'max_entries'
+
+        :param key: Tuple of location and number of forecast days
+        :param forecast_entry: The Forecast_Entry to store
+        :param now: Current event loop time
+
+        :return: None
+        """
+        self.entries.pop(key, None)
+        expired_keys = [entry_key for entry_key, entry in self.entries.items() if entry.expires_at <= now]
+        for entry_key in expired_keys:
+            del self.entries[entry_key]
+        while len(self.entries) >= self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = forecast_entry
+
+    def statistics(self):
+        """
+        Reports how many requests were answered without calling the weather provider
+
+        :return: Dictionary with hits, coalesced waits, fetches, evictions and cached locations
+        """
+        return {"hits": self.hits, "coalesced": self.coalesced, "fetches": self.fetches, "evictions": self.evictions,
+                "entries": len(self.entries)}
+
+
+class Report_Service:
+    """
+    Minimal HTTP/1.1 JSON service answering report and best-window queries from cached forecasts
+
+    Endpoints:
+        - /report?lat=&lon=&start=&end=&days=&count=&prior=&channel=
+        - /best-window?lat=&lon=&days=&length=&earliest=&latest=
+        - /stats
+    """
+    DEFAULTS = {"start": 18, "end": 24, "days": 1, "count": 2, "prior": 4, "length": 2, "earliest": 6, "latest": 22}
+    STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   500: "Internal Server Error", 502: "Bad Gateway"}
+    BEST_WINDOW_COUNT = 3
+    # Metrics whose impact level counts towards a best-window score
+    SCORED_METRICS = ("speed", "gust", "feels_like")
+
+    def __init__(self, provider, host="127.0.0.1", port=8080, report_cache=None,
+                 ttl_seconds=Forecast_Store.TTL_SECONDS):
+        self.host = host
+        self.port = port
+        self.forecast_store = Forecast_Store(provider, ttl_seconds)
+        self.report_cache = report_cache or Report_Cache()
+        self.validator = Configuration_Validator()
+        self.routes = {"/report": self.report, "/best-window": self.best_window, "/stats": self.stats}
+
+    async def serve(self):
+        """
+        Accepts connections until cancelled
+
+        :return: None
+        """
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print(f"Serving reports on http://{self.host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads requests from one connection, keeping it open between requests unless the client asks to close it. An
+        unexpected error while answering a request is returned as a 500 instead of dropping the connection
+
+        :param reader: asyncio StreamReader of the connection
+        :param writer: asyncio StreamWriter of the connection
+
+        :return: None
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (header_line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = header_line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    status, body = await self.dispatch(method, target)
+                except Exception as error:
+                    status, body = 500, {"error": f"- INTERNAL ERROR: {error}"}
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                encoded_body = json.dumps(body, ensure_ascii=False).encode()
+                writer.write(f"{version} {status} {self.STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: application/json; charset=utf-8\r\n"
+                             f"Content-Length: {len(encoded_body)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + encoded_body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target):
+        """
+        Routes a request to its endpoint and maps errors to HTTP status codes
+
+        :param method: HTTP method
+        :param target: Request target including the query string
+
+        :return: Tuple of HTTP status code and JSON-compatible body
+        """
+        url = urlsplit(target)
+        endpoint = self.routes.get(url.path)
+        if endpoint is None:
+            return 404, {"error": f"- UNKNOWN ENDPOINT '{url.path}'"}
+        if method != "GET":
+            return 405, {"error": "- ONLY GET IS SUPPORTED"}
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            return 200, await endpoint(query)
+        except Service_Error as error:
+            return error.status, {"error": str(error)}
+
+    def read_integer(self, query, name):
+        """
+        Reads an integer query parameter, falling back to its default
+
+        :param query: Dictionary of query parameters
+        :param name: Name of the parameter
+
+        :return: Integer value of the parameter
+        """
+        try:
+            return int(query.get(name, self.DEFAULTS[name]))
+        except ValueError:
+            raise Service_Error(400, f"- INVALID {name.upper()} '{query[name]}' (USE A WHOLE NUMBER)")
+
+    async def load_forecast(self, query, days_to_show):
+        """
+        Validates the requested location and returns its cached forecast
+
+        :param query: Dictionary of query parameters holding 'lat' and 'lon'
+        :param days_to_show: Number of forecast days
+
+        :return: A Forecast_Entry
+        """
+        location = f"{query.get('lat', '')},{query.get('lon', '')}"
+        try:
+            self.validator.validate_coordinates(location)
+            self.validator.validate_forecast_days(days_to_show)
+        except Exception as error:
+            raise Service_Error(400, str(error))
+        try:
+            return await self.forecast_store.get(location, days_to_show)
+        except Exception as error:
+            raise Service_Error(502, str(error))
+
+    async def report(self, query):
+        """
+        Renders the text report and structured analysis of every requested day
+
+        :param query: Dictionary of query parameters
+
+        :return: JSON-compatible dictionary with the location and one entry per forecast day
+        """
+        start_time, end_time = self.read_integer(query, "start"), self.read_integer(query, "end")
+        top_timeline_count = self.read_integer(query, "count")
+        rain_check_hours_prior = self.read_integer(query, "prior")
+        channel = query.get("channel", "whatsapp")
+        try:
+            self.validator.validate_time_range(start_time, end_time)
+            self.validator.validate_timeline_fits_range(end_time - start_time, top_timeline_count)
+            self.validator.validate_rain_check_window(rain_check_hours_prior, start_time)
+            self.validator.validate_channel(channel, Messenger.CHARACTER_LIMITS)
+        except Exception as error:
+            raise Service_Error(400, str(error))
+        forecast_entry = await self.load_forecast(query, self.read_integer(query, "days"))
+        # Rendered on the default executor so a long rendering does not hold up the other connections
+        reports = await asyncio.get_running_loop().run_in_executor(
+            None, self.build_reports, forecast_entry, start_time, end_time, top_timeline_count, rain_check_hours_prior,
+            channel)
+        return {"location": forecast_entry.forecast.location, "provider": forecast_entry.forecast.provider_name,
+                "reports": reports}
+
+    def build_reports(self, forecast_entry, start_time, end_time, top_timeline_count, rain_check_hours_prior,
+                      channel):
+        """
+        Renders the text report and builds the structured analysis of every forecast day. The analysis is the
+        Structured_Report the text is rendered from, so both always agree
+
+        :return: List of dictionaries with each day's date, text, segment count and analysis
+        """
+        forecast = forecast_entry.forecast
+        reports = []
+        for forecast_day, forecast_data in enumerate(forecast.forecast_days):
+            cache_key = self.report_cache.build_key(forecast.build_payload_hash(), forecast_day, start_time, end_time,
+                                                    top_timeline_count, rain_check_hours_prior, channel)
+            render = lambda: self.render_report(forecast_entry, forecast_day, start_time, end_time, top_timeline_count,
+                                                rain_check_hours_prior, channel)
+            cached_report = self.report_cache.get_or_render(cache_key, render)
+            if cached_report.structured_report is None:
+                # Rendered by a sender sharing the cache, which does not keep the structured report
+                cached_report = self.report_cache.put(cache_key, *render())
+            analysis = self.build_analysis(forecast_entry, forecast_day, cached_report.structured_report, start_time,
+                                           end_time, top_timeline_count)
+            reports.append({"date": forecast_data["date"], "text": cached_report.formatted_report,
+                            "segments": cached_report.message_plan.segment_count, "analysis": analysis})
+        return reports
+
+    @staticmethod
+    def render_report(forecast_entry, forecast_day, start_time, end_time, top_timeline_count, rain_check_hours_prior,
+                      channel):
+        """
+        Renders one report and plans its messages for the channel
+
+        :return: Tuple of the rendered report text, its Message_Plan and its Structured_Report
+        """
+        report_details = Report.build(forecast_entry.forecast, forecast_day, start_time, end_time, top_timeline_count,
+                                      rain_check_hours_prior, forecast_entry.alert_index,
+                                      Report_Template.CHANNEL_PROFILES[channel])
+        return (report_details.formatted_report, Encoding_Planner(channel).plan(report_details.formatted_report,
+                                                                                Messenger.CHARACTER_LIMITS[channel]),
+                report_details.structured_report)
+
+    @staticmethod
+    def build_analysis(forecast_entry, forecast_day, structured_report, start_time, end_time, top_timeline_count):
+        """
+        Adds the atmosphere metrics, which the text report does not show, to the structured report of a day
+
+        :return: Dictionary of the structured report's sections with an 'atmosphere' section
+        """
+        hourly_selected_forecast_data = forecast_entry.forecast.forecast_days[forecast_day]["hour"][start_time:end_time]
+        day_summary = forecast_entry.forecast_matrix.summarize(start_time, end_time,
+                                                               top_timeline_count).day(forecast_day)
+        return structured_report.to_dict() | {"atmosphere": Structured_Report.describe_metrics(
+            Atmosphere(top_timeline_count, hourly_selected_forecast_data, day_summary))}
+
+    async def best_window(self, query):
+        """
+        Ranks every window of the requested length between the earliest and latest hour, for each forecast day. A
+        window's score adds the impact levels the reports give its SCORED_METRICS and its total precipitation, plus one
+        when any rain is expected; lower is better
+
+        :param query: Dictionary of query parameters
+
+        :return: JSON-compatible dictionary with the best windows of each forecast day
+        """
+        window_length = self.read_integer(query, "length")
+        earliest_hour, latest_hour = self.read_integer(query, "earliest"), self.read_integer(query, "latest")
+        try:
+            self.validator.validate_time_range(earliest_hour, latest_hour)
+            if not 1 <= window_length <= latest_hour - earliest_hour:
+                raise Exception(f"- WINDOW LENGTH MUST BE BETWEEN 1 AND {latest_hour - earliest_hour} HOURS")
+        except Exception as error:
+            raise Service_Error(400, str(error))
+        forecast_entry = await self.load_forecast(query, self.read_integer(query, "days"))
+
+        candidates = [[] for _ in forecast_entry.forecast.forecast_days]
+        for start_time in range(earliest_hour, latest_hour - window_length + 1):
+            window_summary = forecast_entry.forecast_matrix.summarize(start_time, start_time + window_length)
+            for forecast_day, day_candidates in enumerate(candidates):
+                day_summary = window_summary.day(forecast_day)
+                score = (sum(day_summary.statistics[metric_name]["impact"].level
+                                 for metric_name in self.SCORED_METRICS if metric_name in day_summary.statistics)
+                         + Rain.total_precipitation_impact(day_summary.total_precipitation).level
+                         + (day_summary.rain_coverage > 0))
+                day_candidates.append({"start": start_time, "end": start_time + window_length, "score": score,
+                                       "max_wind_speed": day_summary.max_wind_speed,
+                                       "max_wind_gust": day_summary.max_wind_gust,
+                                       "max_feels_like": day_summary.max_feels_like,
+                                       "max_uv_index": day_summary.max_uv_index,
+                                       "rain_coverage": day_summary.rain_coverage,
+                                       "total_precipitation_mm": day_summary.total_precipitation})
+        ranking_key = lambda window: (window["score"], window["rain_coverage"], window["max_wind_gust"],
+                                      window["max_feels_like"], window["start"])
+        return {"location": forecast_entry.forecast.location,
+                "days": [{"date": forecast_date, "windows": sorted(day_candidates, key=ranking_key)[
+                          :self.BEST_WINDOW_COUNT]}
+                         for forecast_date, day_candidates in zip(forecast_entry.forecast_matrix.forecast_dates,
+                                                                  candidates)]}
+
+    async def stats(self, query):
+        """
+        Reports the forecast store and report cache statistics
+
+        :param query: Dictionary of query parameters (unused)
+
+        :return: JSON-compatible dictionary of statistics
+        """
+        return {"forecasts": self.forecast_store.statistics(), "reports": self.report_cache.statistics()}
+
+
+class Service_Error(Exception):
+    """
+    Error carrying the HTTP status code the service answers with
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve on-demand pickleball weather reports over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--provider", default="weatherapi", help="'weatherapi' or 'open-meteo'")
+    parser.add_argument("--ttl", type=int, default=Forecast_Store.TTL_SECONDS, help="Seconds a forecast is reused")
+    arguments = parser.parse_args()
+    asyncio.run(Report_Service(Weather_Provider.create(arguments.provider), arguments.host, arguments.port,
+                               ttl_seconds=arguments.ttl).serve())
@@ -0,0 +1,579 @@
+import os
+import json
+import time
+import bisect
+import sqlite3
+import hashlib
+import argparse
+import multiprocessing
+from threading import Thread, Event
+from messenger import Messenger
+from pipeline import Report_Pipeline
+from outbox import Message_Outbox, Outbox_Worker_Pool
+from alert import Alert_Index
+from subscriber_roster import Subscriber_Profile, Subscriber_Roster
+from weather_provider import Weather_Provider
+
+
+class Hash_Ring:
+    """
+    Consistent hash ring mapping locations to worker names. Each worker owns VIRTUAL_NODES points on the ring and a
+    location belongs to the first point at or after its hash, so adding or removing one of n workers only moves about
+    1/n of the locations
+    """
+    VIRTUAL_NODES = 128
+
+    def __init__(self, nodes=(), virtual_nodes=VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self.nodes = set()
+        self.point_hashes = []
+        self.point_nodes = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def hash_key(key):
+        """
+        Hashes a key onto the ring
+
+        :param key: String key (a location or a virtual node label)
+
+        :return: 64-bit integer position on the ring
+        """
+        return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+    def add_node(self, node):
+        """
+        Places a worker's virtual nodes on the ring
+
+        :param node: Worker name
+
+        :return: None
+        """
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.virtual_nodes):
+            point_hash = self.hash_key(f"{node}#{replica}")
+            point_index = bisect.bisect_left(self.point_hashes, point_hash)
+            self.point_hashes.insert(point_index, point_hash)
+            self.point_nodes.insert(point_index, node)
+
+    def remove_node(self, node):
+        """
+        Takes a worker's virtual nodes off the ring
+
+        :param node: Worker name
+
+        :return: None
+        """
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        points = [(point_hash, point_node) for point_hash, point_node in zip(self.point_hashes, self.point_nodes)
+                  if point_node != node]
+        self.point_hashes = [point_hash for point_hash, _ in points]
+        self.point_nodes = [point_node for _, point_node in points]
+
+    def find_node(self, key):
+        """
+        Finds the worker that owns a key
+
+        :param key: String key (e.g. a location formatted as 'lat,lon')
+
+        :return: Worker name
+        """
+        if not self.point_hashes:
+            raise Exception("- NO SHARD WORKERS ON THE HASH RING")
+        point_index = bisect.bisect_left(self.point_hashes, self.hash_key(key)) % len(self.point_hashes)
+        return self.point_nodes[point_index]
+
+
+class Shard_Queue:
+    """
+    SQLite work queue shared by the coordinator and the worker processes. A job holds one location and the profiles of
+    every subscriber there. Jobs are owned by the worker the hash ring picks for their location and leased while they
+    run; workers heartbeat to keep their leases, and the leases of a worker that stops heartbeating expire so its jobs
+    move to another worker
+    """
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+    MAX_ATTEMPTS = 3
+    LEASE_SECONDS = 30
+    WORKER_TIMEOUT_SECONDS = 10
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        connection = self.connect()
+        with connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS shard_workers (
+                    name TEXT PRIMARY KEY,
+                    heartbeat_at REAL NOT NULL,
+                    retired INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS shard_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    location TEXT NOT NULL,
+                    profiles TEXT NOT NULL,
+                    owner TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_expires_at REAL,
+                    completed_by TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS shard_jobs_ready ON shard_jobs (owner, status);
+            """)
+        connection.close()
+
+    def connect(self):
+        """
+        Opens a connection in write-ahead-log mode. Each process and thread uses its own connection
+
+        :return: A sqlite3 connection
+        """
+        connection = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def enqueue(self, connection, location, profiles):
+        """
+        Adds one location's job
+
+        :param connection: A connection from 'connect'
+        :param location: Coordinates formatted as 'lat,lon'
+        :param profiles: List of Subscriber_Profile at the location
+
+        :return: Id of the job
+        """
+        cursor = connection.execute("INSERT INTO shard_jobs (location, profiles, created_at) VALUES (?, ?, ?)",
+                                    (location, json.dumps([profile.to_dict() for profile in profiles]), time.time()))
+        return cursor.lastrowid
+
+    def heartbeat(self, connection, worker_name):
+        """
+        Marks a worker as alive and extends the leases of the jobs it is running
+
+        :param connection: A connection from 'connect'
+        :param worker_name: Name of the worker
+
+        :return: None
+        """
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT INTO shard_workers (name, heartbeat_at) VALUES (?, ?) ON CONFLICT (name) "
+                               "DO UPDATE SET heartbeat_at = excluded.heartbeat_at, retired = 0", (worker_name, now))
+            connection.execute("UPDATE shard_jobs SET lease_expires_at = ? WHERE owner = ? AND status = ?",
+                               (now + self.LEASE_SECONDS, worker_name, self.LEASED))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def retire(self, connection, worker_name):
+        """
+        Marks a worker as shut down so its locations move at once instead of after WORKER_TIMEOUT_SECONDS
+
+        :param connection: A connection from 'connect'
+        :param worker_name: Name of the worker
+
+        :return: None
+        """
+        connection.execute("UPDATE shard_workers SET retired = 1 WHERE name = ?", (worker_name,))
+
+    def live_workers(self, connection):
+        """
+        Lists the workers that have heartbeated within WORKER_TIMEOUT_SECONDS
+
+        :param connection: A connection from 'connect'
+
+        :return: Set of worker names
+        """
+        return {row[0] for row in connection.execute(
+            "SELECT name FROM shard_workers WHERE retired = 0 AND heartbeat_at >= ?",
+            (time.time() - self.WORKER_TIMEOUT_SECONDS,))}
+
+    def assign(self, connection, hash_ring):
+        """
+        Releases expired leases, then gives every pending job to the worker the ring picks for its location. Only jobs
+        whose owner changes are written
+
+        :param connection: A connection from 'connect'
+        :param hash_ring: Hash_Ring of the live workers
+
+        :return: Number of jobs that moved from one worker to another
+        """
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("UPDATE shard_jobs SET status = ?, lease_expires_at = NULL "
+                               "WHERE status = ? AND lease_expires_at < ?", (self.PENDING, self.LEASED, now))
+            owner_changes = []
+            moved_count = 0
+            for job_id, location, owner in connection.execute(
+                    "SELECT id, location, owner FROM shard_jobs WHERE status = ?", (self.PENDING,)).fetchall():
+                new_owner = hash_ring.find_node(location)
+                if new_owner != owner:
+                    owner_changes.append((new_owner, job_id))
+                    moved_count += owner is not None
+            connection.executemany("UPDATE shard_jobs SET owner = ? WHERE id = ?", owner_changes)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return moved_count
+
+    def claim(self, connection, worker_name, batch_size):
+        """
+        Leases a batch of the worker's pending jobs
+
+        :param connection: A connection from 'connect'
+        :param worker_name: Name of the worker
+        :param batch_size: Maximum number of jobs to lease
+
+        :return: List of (id, location, profiles) tuples, with profiles as Subscriber_Profile instances
+        """
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            jobs = connection.execute("SELECT id, location, profiles FROM shard_jobs WHERE owner = ? AND status = ? "
+                                      "ORDER BY id LIMIT ?", (worker_name, self.PENDING, batch_size)).fetchall()
+            connection.executemany("UPDATE shard_jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ? "
+                                   "WHERE id = ?", [(self.LEASED, now + self.LEASE_SECONDS, job[0]) for job in jobs])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return [(job_id, location, [Subscriber_Profile(profile_data) for profile_data in json.loads(profiles)])
+                for job_id, location, profiles in jobs]
+
+    def record_result(self, connection, job_id, worker_name, error=None):
+        """
+        Commits the outcome of a job while the worker still holds its lease. Failed jobs go back to pending until
+        MAX_ATTEMPTS, after which they are marked as failed. A result arriving after the lease expired is ignored,
+        since the job is already pending again or running on another worker
+
+        :param connection: A connection from 'connect'
+        :param job_id: Id of the job
+        :param worker_name: Name of the worker that ran the job
+        :param error: Error message when the job failed
+
+        :return: True if the result was recorded, False if the worker no longer held the lease
+        """
+        now = time.time()
+        if error is None:
+            cursor = connection.execute("UPDATE shard_jobs SET status = ?, completed_by = ?, finished_at = ?, "
+                                        "lease_expires_at = NULL WHERE id = ? AND owner = ? AND status = ?",
+                                        (self.DONE, worker_name, now, job_id, worker_name, self.LEASED))
+        else:
+            cursor = connection.execute("UPDATE shard_jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                                        "last_error = ?, finished_at = ?, lease_expires_at = NULL "
+                                        "WHERE id = ? AND owner = ? AND status = ?",
+                                        (self.MAX_ATTEMPTS, self.FAILED, self.PENDING, error, now, job_id,
+                                         worker_name, self.LEASED))
+        return cursor.rowcount == 1
+
+    def has_unfinished(self, connection):
+        """
+        Checks whether any job is still waiting or running
+
+        :param connection: A connection from 'connect'
+
+        :return: True if a pending or leased job remains
+        """
+        return connection.execute("SELECT EXISTS (SELECT 1 FROM shard_jobs WHERE status IN (?, ?))",
+                                  (self.PENDING, self.LEASED)).fetchone()[0] == 1
+
+    def count_by_status(self, connection):
+        """
+        Counts the jobs in each state
+
+        :param connection: A connection from 'connect'
+
+        :return: Dictionary of status -> job count
+        """
+        return dict(connection.execute("SELECT status, COUNT(*) FROM shard_jobs GROUP BY status").fetchall())
+
+    def count_by_worker(self, connection):
+        """
+        Counts the completed jobs of each worker
+
+        :param connection: A connection from 'connect'
+
+        :return: Dictionary of worker name -> job count
+        """
+        return dict(connection.execute("SELECT completed_by, COUNT(*) FROM shard_jobs WHERE status = ? "
+                                       "GROUP BY completed_by ORDER BY completed_by", (self.DONE,)).fetchall())
+
+
+class Shard_Worker:
+    """
+    Runs the jobs the hash ring gives one worker. Since a location always maps to the same worker, the worker keeps
+    the location's forecast and rendered reports in memory across runs. A background thread heartbeats while jobs run,
+    so a long job keeps its lease. Reports are queued in a Message_Outbox kept in the queue's database and delivered
+    by the outbox workers of every process, so a job that runs again elsewhere after its worker died does not queue
+    the reports it already queued
+    """
+    BATCH_SIZE = 4
+    OUTBOX_WORKERS = 2
+    FORECAST_TTL_SECONDS = 600
+    IDLE_SLEEP_SECONDS = 0.2
+    # Well below Shard_Queue.WORKER_TIMEOUT_SECONDS and LEASE_SECONDS, so a few missed beats do not lose the leases
+    HEARTBEAT_SECONDS = 2
+
+    def __init__(self, shard_queue, name, provider, report_cache=None, sender=Messenger.send_text,
+                 batch_size=BATCH_SIZE):
+        self.shard_queue = shard_queue
+        self.name = name
+        self.provider = provider
+        self.batch_size = batch_size
+        self.sender = sender
+        self.outbox = Message_Outbox(shard_queue.database_path)
+        # Reuses the pipeline's rendering and queuing of one subscriber's reports
+        self.report_pipeline = Report_Pipeline(provider, [], report_cache, sender, outbox=self.outbox)
+        # Location -> (Forecast, Alert_Index, days fetched, expiry)
+        self.forecasts = {}
+        self.forecast_hits = 0
+        self.forecast_misses = 0
+
+    def load_forecast(self, location, days_to_show):
+        """
+        Retrieves a location's forecast from memory, fetching it when it is missing, expired or too short
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param days_to_show: Number of forecast days needed
+
+        :return: Tuple of the Forecast and its Alert_Index
+        """
+        cached_forecast = self.forecasts.get(location)
+        if cached_forecast is not None and cached_forecast[2] >= days_to_show and cached_forecast[3] > time.monotonic():
+            self.forecast_hits += 1
+            return cached_forecast[0], cached_forecast[1]
+        self.forecast_misses += 1
+        forecast = self.provider.fetch_forecast(location, days_to_show)
+        alert_index = Alert_Index.for_forecast(forecast)
+        self.forecasts[location] = (forecast, alert_index, days_to_show,
+                                    time.monotonic() + self.FORECAST_TTL_SECONDS)
+        return forecast, alert_index
+
+    def run_job(self, location, profiles):
+        """
+        Renders the reports of every subscriber at a location and queues them for delivery
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param profiles: List of Subscriber_Profile at the location
+
+        :return: None
+        """
+        forecast, alert_index = self.load_forecast(location, max(profile.days_to_show for profile in profiles))
+        for profile in profiles:
+            self.report_pipeline.send_reports(profile, self.report_pipeline.render_reports(forecast, alert_index,
+                                                                                           profile))
+
+    def heartbeat(self, stop_event):
+        """
+        Heartbeat loop of the background thread, using its own connection
+
+        :param stop_event: Event ending the loop
+
+        :return: None
+        """
+        connection = self.shard_queue.connect()
+        try:
+            while not stop_event.wait(self.HEARTBEAT_SECONDS):
+                try:
+                    self.shard_queue.heartbeat(connection, self.name)
+                except sqlite3.Error:
+                    # A missed beat is made up by the next one
+                    pass
+        finally:
+            connection.close()
+
+    def run(self, stop_when_idle=False):
+        """
+        Worker loop: leases the worker's jobs and runs them while the background thread heartbeats and the outbox
+        workers deliver, until no job is left anywhere when 'stop_when_idle' is set. The outbox is drained before the
+        worker exits
+
+        :param stop_when_idle: Exits once every job is done or has failed
+
+        :return: Number of jobs the worker ran
+        """
+        connection = self.shard_queue.connect()
+        self.shard_queue.heartbeat(connection, self.name)
+        stop_event = Event()
+        heartbeat_thread = Thread(target=self.heartbeat, args=(stop_event,), name=f"{self.name}-heartbeat",
+                                  daemon=True)
+        heartbeat_thread.start()
+        outbox_pool = Outbox_Worker_Pool(self.outbox, self.sender, self.OUTBOX_WORKERS)
+        outbox_pool.start()
+        job_count = 0
+        try:
+            while True:
+                jobs = self.shard_queue.claim(connection, self.name, self.batch_size)
+                for job_id, location, profiles in jobs:
+                    try:
+                        self.run_job(location, profiles)
+                        self.shard_queue.record_result(connection, job_id, self.name)
+                    except Exception as error:
+                        self.shard_queue.record_result(connection, job_id, self.name, str(error))
+                    job_count += 1
+                if not jobs:
+                    # Stays until every job is finished, in case another worker fails and its jobs move here
+                    if stop_when_idle and not self.shard_queue.has_unfinished(connection):
+                        # Heartbeats stop first, since a heartbeat would mark the worker live again
+                        stop_event.set()
+                        heartbeat_thread.join()
+                        self.shard_queue.retire(connection, self.name)
+                        outbox_pool.finish()
+                        return job_count
+                    time.sleep(self.IDLE_SLEEP_SECONDS)
+        finally:
+            stop_event.set()
+            heartbeat_thread.join()
+            outbox_pool.stop()
+            connection.close()
+
+
+def run_worker_process(database_path, worker_name, provider_name, provider_options, sender, stop_when_idle):
+    """
+    Entry point of a worker process
+
+    :param database_path: Path of the Shard_Queue database
+    :param worker_name: Name of the worker
+    :param provider_name: Weather backend passed to Weather_Provider.create
+    :param provider_options: Keyword arguments of the weather backend
+    :param sender: Function sending one message body to a phone number
+    :param stop_when_idle: Exits once every job is done or has failed
+
+    :return: None
+    """
+    Shard_Worker(Shard_Queue(database_path), worker_name, Weather_Provider.create(provider_name, **provider_options),
+                 sender=sender).run(stop_when_idle)
+
+
+class Shard_Coordinator:
+    """
+    Splits subscribers into one job per location, starts worker processes and keeps the hash ring in line with the
+    workers that are alive. When a worker joins, dies or retires, only the pending jobs whose owner changes are moved
+    """
+    POLL_SECONDS = 0.5
+
+    def __init__(self, database_path, provider_name="weatherapi", provider_options=None, sender=Messenger.send_text,
+                 poll_seconds=POLL_SECONDS):
+        self.database_path = database_path
+        self.shard_queue = Shard_Queue(database_path)
+        self.provider_name = provider_name
+        self.provider_options = provider_options or {}
+        self.sender = sender
+        self.poll_seconds = poll_seconds
+        self.hash_ring = Hash_Ring()
+        # Spawned processes start from a fresh interpreter, so workers never inherit the coordinator's connections
+        self.process_context = multiprocessing.get_context("spawn")
+        self.processes = {}
+        self.rebalance_count = 0
+        self.moved_job_count = 0
+
+    def submit(self, connection, profiles):
+        """
+        Queues one job per location holding every subscriber there
+
+        :param connection: A connection from Shard_Queue.connect
+        :param profiles: List of Subscriber_Profile
+
+        :return: Number of jobs queued
+        """
+        profiles_by_location = {}
+        for profile in profiles:
+            profiles_by_location.setdefault(profile.location, []).append(profile)
+        for location, location_profiles in profiles_by_location.items():
+            self.shard_queue.enqueue(connection, location, location_profiles)
+        return len(profiles_by_location)
+
+    def start_worker(self, connection, worker_name, stop_when_idle=True):
+        """
+        Starts a worker process. The worker is registered before it boots so it joins the ring at once
+
+        :param connection: A connection from Shard_Queue.connect
+        :param worker_name: Name of the worker
+        :param stop_when_idle: The worker exits once every job is done or has failed
+
+        :return: The worker's Process
+        """
+        self.shard_queue.heartbeat(connection, worker_name)
+        process = self.process_context.Process(
+            target=run_worker_process, name=worker_name, daemon=True,
+            args=(self.database_path, worker_name, self.provider_name, self.provider_options, self.sender,
+                  stop_when_idle))
+        process.start()
+        self.processes[worker_name] = process
+        return process
+
+    def rebalance(self, connection):
+        """
+        Brings the ring in line with the live workers and reassigns the pending jobs
+
+        :param connection: A connection from Shard_Queue.connect
+
+        :return: Number of jobs that moved between workers
+        """
+        live_workers = self.shard_queue.live_workers(connection)
+        if not live_workers:
+            raise Exception("- NO LIVE SHARD WORKERS")
+        if live_workers != self.hash_ring.nodes:
+            for worker_name in self.hash_ring.nodes - live_workers:
+                self.hash_ring.remove_node(worker_name)
+            for worker_name in live_workers - self.hash_ring.nodes:
+                self.hash_ring.add_node(worker_name)
+            self.rebalance_count += 1
+        moved_job_count = self.shard_queue.assign(connection, self.hash_ring)
+        self.moved_job_count += moved_job_count
+        return moved_job_count
+
+    def run(self, profiles, worker_count):
+        """
+        Sends every subscriber their reports across 'worker_count' worker processes and waits until every job is done
+        or has failed
+
+        :param profiles: List of Subscriber_Profile
+        :param worker_count: Number of worker processes
+
+        :return: Dictionary with the wall time, job counts by state and by worker, and rebalancing counts
+        """
+        started = time.perf_counter()
+        connection = self.shard_queue.connect()
+        try:
+            job_count = self.submit(connection, profiles)
+            for worker_index in range(worker_count):
+                self.start_worker(connection, f"worker-{worker_index}")
+            while self.shard_queue.has_unfinished(connection):
+                self.rebalance(connection)
+                time.sleep(self.poll_seconds)
+            for process in self.processes.values():
+                process.join()
+            return {"wall_seconds": round(time.perf_counter() - started, 3), "jobs": job_count,
+                    "jobs_by_status": self.shard_queue.count_by_status(connection),
+                    "jobs_by_worker": self.shard_queue.count_by_worker(connection),
+                    "rebalances": self.rebalance_count, "moved_jobs": self.moved_job_count}
+        finally:
+            connection.close()
+
+
+if __name__ == "__main__":
+    # SUBSCRIBER_FILE points to the TOML or JSON roster (see subscriber_roster.py)
+    argument_parser = argparse.ArgumentParser(description="Send every subscriber's reports across worker processes")
+    argument_parser.add_argument("--workers", type=int, default=4, help="number of worker processes")
+    argument_parser.add_argument("--database", default="shards.sqlite3", help="path of the shared work queue")
+    arguments = argument_parser.parse_args()
+    subscriber_roster = Subscriber_Roster(os.getenv("SUBSCRIBER_FILE", "subscribers.toml"))
+    if subscriber_roster.invalid_profiles:
+        print(subscriber_roster.format_validation_report())
+    print(Shard_Coordinator(arguments.database, os.getenv("WEATHER_PROVIDER", "weatherapi")).run(
+        subscriber_roster.profiles, arguments.workers))
@@ -0,0 +1,517 @@
+import json
+import struct
+from io import StringIO
+from datetime import datetime
+from template import Report_Template
+from analysis import Impact
+from wind import Wind
+from temperature import Temperature
+
+
+class Structured_Report:
+    """
+    Machine-readable form of one report: every value, impact level and top-N timeline behind the text report, with a
+    stable schema (SCHEMA_VERSION) and JSON and binary serializers. Impacts are stored as {'level', 'label'} (level 0
+    low, 1 moderate, 2 high or worse)
+    """
+    SCHEMA_VERSION = 3
+    SECTIONS = ("forecast_date", "generated_at", "top_timeline_count", "location", "daylight", "window", "condition",
+                "alerts", "alerts_available", "rain", "wind", "temperature")
+
+    def __init__(self, **sections):
+        for section in self.SECTIONS:
+            setattr(self, section, sections[section])
+
+    @staticmethod
+    def build(report):
+        """
+        Collects the structured values from the analyzers of a report
+
+        :param report: A Report instance
+
+        :return: A Structured_Report
+        """
+        date_details = report.date_details
+        location_data = report.location_details.forecast_location_data
+        daylight_details = report.daylight_details
+        rain_details = report.rain_details
+        condition_text, category = report.condition_details.find_condition_mode()
+        playability = report.condition_details.calculate_playability()
+        pre_window_rain, during_window_rain = rain_details.pre_window_rain, rain_details.during_window_rain
+        weighted_rain_probability = rain_details.calculate_weighted_rain_probability(during_window_rain)
+        total_precipitation = rain_details.calculate_total_precipitation(during_window_rain)
+
+        def describe_rain_hours(rain_data):
+            return [{"time": each_hour["time"], "chance": each_hour["rain_percentage"],
+                     "amount_mm": each_hour["rain_amount"]}
+                    for each_hour in rain_details.find_top_rain_hours(rain_data)]
+
+        return Structured_Report(
+            forecast_date=date_details.forecast_data["date"],
+            generated_at=datetime.now().strftime("%Y-%m-%d %H:%M"),
+            top_timeline_count=rain_details.top_timeline_count,
+            location={"name": location_data["name"], "region": location_data["region"],
+                      "country": location_data["country"], "lat": location_data.get("lat", 0.0),
+                      "lon": location_data.get("lon", 0.0)},
+            daylight={twilight: daylight_details.convert_to_military_time(
+                daylight_details.retrieve_twilight_time(twilight)) for twilight in ("sunrise", "sunset")},
+            window={"start_hour": rain_details.start_time, "end_hour": rain_details.end_time,
+                    "start": date_details.start_time, "end": date_details.end_time},
+            condition={"text": condition_text, "category": category, "playability": playability,
+                       "impact": report.condition_details.playability_impact(playability).to_dict()},
+            alerts=[{"event": record.event, "severity": record.severity, "urgency": record.urgency,
+                     "headline": record.headline, "effective": record.effective, "expires": record.expires}
+                    for record in report.alert_details.filter_alert_metrics()],
+            alerts_available=report.alert_details.alerts_available,
+            rain={"check_hours_prior": rain_details.rain_check_hours_prior, "duration": rain_details.duration,
+                  "earlier": {"hours": len(pre_window_rain),
+                              "last_hour": pre_window_rain[-1]["time"] if pre_window_rain else None,
+                              "total_precipitation_mm": rain_details.calculate_total_precipitation(pre_window_rain),
+                              "impact": rain_details.assess_pre_window_impact(pre_window_rain[-1]["time"]).to_dict()
+                              if pre_window_rain else None,
+                              "top_hours": describe_rain_hours(pre_window_rain)},
+                  "during": {"hours": len(during_window_rain),
+                             "coverage_percentage": rain_details.calculate_rain_coverage_percentage(during_window_rain),
+                             "average_chance": weighted_rain_probability,
+                             "total_precipitation_mm": total_precipitation,
+                             "probability_impact": rain_details.weighted_rain_probability_impact(
+                                 weighted_rain_probability).to_dict(),
+                             "precipitation_impact": rain_details.total_precipitation_impact(
+                                 total_precipitation).to_dict(),
+                             "top_hours": describe_rain_hours(during_window_rain)}},
+            wind=Structured_Report.describe_metrics(report.wind_details),
+            temperature=Structured_Report.describe_metrics(report.temperature_details))
+
+    @staticmethod
+    def describe_metrics(metric_analysis):
+        """
+        Collects the statistics of every metric of an analyzer that had a value in the window
+
+        :param metric_analysis: Wind, Temperature or Atmosphere analysis
+
+        :return: Dictionary of metric name -> worst value, average, impact and top-N hours
+        """
+        return {metric.name: {"worst": metric_statistics["worst"], "average": metric_statistics["average"],
+                              "impact": metric_statistics["impact"].to_dict(),
+                              "top_hours": [{"time": each_hour["time"], "value": each_hour[metric.name]}
+                                            for each_hour in metric_statistics["top_hours"]]}
+                for metric in metric_analysis.METRICS
+                if (metric_statistics := metric_analysis.statistics.get(metric.name)) is not None}
+
+    def to_dict(self):
+        """
+        Converts the report into JSON-compatible data
+
+        :return: Dictionary holding 'schema_version' and every section
+        """
+        return {"schema_version": self.SCHEMA_VERSION} | {section: getattr(self, section) for section in self.SECTIONS}
+
+    @staticmethod
+    def from_dict(report_data):
+        """
+        Rebuilds a report from the data returned by 'to_dict'
+
+        :param report_data: Dictionary holding 'schema_version' and every section
+
+        :return: A Structured_Report
+        """
+        if report_data.get("schema_version") != Structured_Report.SCHEMA_VERSION:
+            raise Exception(f"- UNSUPPORTED REPORT SCHEMA VERSION '{report_data.get('schema_version')}' "
+                            f"(EXPECTED {Structured_Report.SCHEMA_VERSION})")
+        return Structured_Report(**{section: report_data[section] for section in Structured_Report.SECTIONS})
+
+    def to_json(self):
+        """
+        Serializes the report as compact JSON
+
+        :return: JSON string
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def from_json(report_json):
+        """
+        Parses a report serialized by 'to_json'
+
+        :param report_json: JSON string or bytes
+
+        :return: A Structured_Report
+        """
+        return Structured_Report.from_dict(json.loads(report_json))
+
+    def to_binary(self):
+        """
+        Serializes the report in the struct-packed layout described by Binary_Report_Codec
+
+        :return: Bytes of the packed report
+        """
+        return Binary_Report_Codec.pack(self.to_dict())
+
+    @staticmethod
+    def from_binary(report_bytes):
+        """
+        Parses a report serialized by 'to_binary'
+
+        :param report_bytes: Bytes of the packed report
+
+        :return: A Structured_Report
+        """
+        return Structured_Report.from_dict(Binary_Report_Codec.unpack(report_bytes))
+
+
+class Binary_Report_Codec:
+    """
+    Packs Structured_Report data into a fixed field order with 'struct', so no field names are stored. Strings are
+    UTF-8 with a 16-bit length, integers are 32-bit, booleans are one byte, decimals (mm of rain) are stored in
+    hundredths, coordinates are doubles, optional values carry a presence byte and lists a 16-bit count. Metric
+    sections start with a 32-bit presence bitmap over their metric names, so a metric without data is left out as it
+    is in JSON. Metric values ('number') start with a byte marking integers and are followed by a 32-bit integer or a
+    double, so 25 is read back as an integer and 7.5 keeps its fraction. Every value is little-endian and the payload
+    starts with MAGIC and the schema version
+    """
+    MAGIC = b"PKR"
+    HEADER = struct.Struct("<3sB")
+    SCALARS = {"int": struct.Struct("<i"), "decimal": struct.Struct("<i"), "double": struct.Struct("<d"),
+               "length": struct.Struct("<H"), "flag": struct.Struct("<B"), "bool": struct.Struct("<?"),
+               "bitmap": struct.Struct("<I"),
+               "whole_number": struct.Struct("<?i"), "fractional_number": struct.Struct("<?d")}
+    IMPACT = (("level", "int"), ("label", "str"))
+    RAIN_HOUR = (("time", "str"), ("chance", "int"), ("amount_mm", "decimal"))
+    METRIC = (("worst", "number"), ("average", "number"), ("impact", IMPACT),
+              ("top_hours", ("list", (("time", "str"), ("value", "number")))))
+    LAYOUT = (
+        ("forecast_date", "str"), ("generated_at", "str"), ("top_timeline_count", "int"),
+        ("location", (("name", "str"), ("region", "str"), ("country", "str"), ("lat", "double"), ("lon", "double"))),
+        ("daylight", (("sunrise", "str"), ("sunset", "str"))),
+        ("window", (("start_hour", "int"), ("end_hour", "int"), ("start", "str"), ("end", "str"))),
+        ("condition", (("text", "str"), ("category", "str"), ("playability", "int"), ("impact", IMPACT))),
+        ("alerts", ("list", (("event", "str"), ("severity", "str"), ("urgency", "str"), ("headline", "str"),
+                             ("effective", "str"), ("expires", "str")))),
+        ("alerts_available", "bool"),
+        ("rain", (("check_hours_prior", "int"), ("duration", "int"),
+                  ("earlier", (("hours", "int"), ("last_hour", ("optional", "str")),
+                               ("total_precipitation_mm", "decimal"), ("impact", ("optional", IMPACT)),
+                               ("top_hours", ("list", RAIN_HOUR)))),
+                  ("during", (("hours", "int"), ("coverage_percentage", "int"), ("average_chance", "int"),
+                              ("total_precipitation_mm", "decimal"), ("probability_impact", IMPACT),
+                              ("precipitation_impact", IMPACT), ("top_hours", ("list", RAIN_HOUR)))))),
+        ("wind", ("metrics", Wind.METRIC_LIST, METRIC)),
+        ("temperature", ("metrics", Temperature.METRIC_LIST, METRIC)),
+    )
+
+    @staticmethod
+    def pack(report_data):
+        """
+        Packs report data following LAYOUT
+
+        :param report_data: Dictionary returned by Structured_Report.to_dict
+
+        :return: Bytes of the packed report
+        """
+        parts = [Binary_Report_Codec.HEADER.pack(Binary_Report_Codec.MAGIC, report_data["schema_version"])]
+        Binary_Report_Codec.pack_value(Binary_Report_Codec.LAYOUT, report_data, parts)
+        return b"".join(parts)
+
+    @staticmethod
+    def pack_value(layout, value, parts):
+        """
+        Appends the packed bytes of one value to 'parts'
+
+        :param layout: Type name, ('list', item layout), ('optional', layout), ('metrics', metric names, metric layout)
+         or tuple of (field, layout) pairs
+        :param value: Value to pack
+        :param parts: List of byte strings being assembled
+
+        :return: None
+        """
+        scalars = Binary_Report_Codec.SCALARS
+        if layout == "str":
+            encoded_text = value.encode()
+            parts.append(scalars["length"].pack(len(encoded_text)))
+            parts.append(encoded_text)
+        elif layout == "decimal":
+            parts.append(scalars["decimal"].pack(round(value * 100)))
+        elif layout == "number":
+            is_integer = isinstance(value, int)
+            parts.append(scalars["whole_number" if is_integer else "fractional_number"].pack(is_integer, value))
+        elif isinstance(layout, str):
+            parts.append(scalars[layout].pack(value))
+        elif layout[0] == "list":
+            parts.append(scalars["length"].pack(len(value)))
+            for item in value:
+                Binary_Report_Codec.pack_value(layout[1], item, parts)
+        elif layout[0] == "optional":
+            parts.append(scalars["flag"].pack(value is not None))
+            if value is not None:
+                Binary_Report_Codec.pack_value(layout[1], value, parts)
+        elif layout[0] == "metrics":
+            unknown_metrics = value.keys() - set(layout[1])
+            if unknown_metrics:
+                raise Exception(f"- UNKNOWN METRICS {sorted(unknown_metrics)}")
+            parts.append(scalars["bitmap"].pack(sum(1 << index for index, metric_name in enumerate(layout[1])
+                                                    if metric_name in value)))
+            for metric_name in layout[1]:
+                if metric_name in value:
+                    Binary_Report_Codec.pack_value(layout[2], value[metric_name], parts)
+        else:
+            for field, field_layout in layout:
+                Binary_Report_Codec.pack_value(field_layout, value[field], parts)
+
+    @staticmethod
+    def unpack(report_bytes):
+        """
+        Unpacks report data following LAYOUT
+
+        :param report_bytes: Bytes produced by 'pack'
+
+        :return: Dictionary in the format of Structured_Report.to_dict
+        """
+        magic, schema_version = Binary_Report_Codec.HEADER.unpack_from(report_bytes)
+        if magic != Binary_Report_Codec.MAGIC:
+            raise Exception("- NOT A PACKED REPORT")
+        report_data, _ = Binary_Report_Codec.unpack_value(Binary_Report_Codec.LAYOUT, report_bytes,
+                                                          Binary_Report_Codec.HEADER.size)
+        return {"schema_version": schema_version} | report_data
+
+    @staticmethod
+    def unpack_value(layout, report_bytes, offset):
+        """
+        Reads one value starting at 'offset'
+
+        :param layout: Type name, ('list', item layout), ('optional', layout), ('metrics', metric names, metric layout)
+         or tuple of (field, layout) pairs
+        :param report_bytes: Bytes produced by 'pack'
+        :param offset: Position of the value
+
+        :return: Tuple of the value and the position after it
+        """
+        scalars = Binary_Report_Codec.SCALARS
+        if layout == "str":
+            text_length = scalars["length"].unpack_from(report_bytes, offset)[0]
+            offset += scalars["length"].size
+            return report_bytes[offset:offset + text_length].decode(), offset + text_length
+        if layout == "decimal":
+            return scalars["decimal"].unpack_from(report_bytes, offset)[0] / 100, offset + scalars["decimal"].size
+        if layout == "number":
+            number_format = scalars["whole_number" if report_bytes[offset] else "fractional_number"]
+            return number_format.unpack_from(report_bytes, offset)[1], offset + number_format.size
+        if isinstance(layout, str):
+            return scalars[layout].unpack_from(report_bytes, offset)[0], offset + scalars[layout].size
+        if layout[0] == "list":
+            item_count = scalars["length"].unpack_from(report_bytes, offset)[0]
+            offset += scalars["length"].size
+            items = []
+            for _ in range(item_count):
+                item, offset = Binary_Report_Codec.unpack_value(layout[1], report_bytes, offset)
+                items.append(item)
+            return items, offset
+        if layout[0] == "optional":
+            present = scalars["flag"].unpack_from(report_bytes, offset)[0]
+            offset += scalars["flag"].size
+            return Binary_Report_Codec.unpack_value(layout[1], report_bytes, offset) if present else (None, offset)
+        if layout[0] == "metrics":
+            presence_bitmap = scalars["bitmap"].unpack_from(report_bytes, offset)[0]
+            offset += scalars["bitmap"].size
+            value = {}
+            for index, metric_name in enumerate(layout[1]):
+                if presence_bitmap & 1 << index:
+                    value[metric_name], offset = Binary_Report_Codec.unpack_value(layout[2], report_bytes, offset)
+            return value, offset
+        value = {}
+        for field, field_layout in layout:
+            value[field], offset = Binary_Report_Codec.unpack_value(field_layout, report_bytes, offset)
+        return value, offset
+
+
+class Text_Report_Renderer:
+    """
+    Renders a Structured_Report as the text report of a layout profile
+    """
+    def __init__(self, template=None):
+        self.template = template or Report_Template.compile()
+
+    def impact(self, impact):
+        """
+        Formats an impact with its indicator
+
+        :param impact: Dictionary with the impact 'level' and 'label'
+
+        :return: String such as '🟨 MODERATE (BALL SWERVE)' (without the indicator in the compact profile)
+        """
+        return f"{self.template.indicator(impact['level'])}{impact['label']}"
+
+    def status(self, present):
+        """
+        Formats whether rain is present
+
+        :param present: True when rain was found
+
+        :return: '🟥 YES' or '🟩 NO'
+        """
+        return f"{self.template.indicator(Impact.HIGH)}YES" if present else f"{self.template.indicator(Impact.LOW)}NO"
+
+    def alert_status(self, alerts, alerts_available=True):
+        """
+        Formats whether an alert is active, with the severity of the most severe alert
+
+        :param alerts: List of alert dictionaries, most severe first
+        :param alerts_available: False when the forecast's provider has no alert feed
+
+        :return: String describing the alert status
+        """
+        indicator = self.template.indicator
+        if alerts:
+            return f"{indicator(Impact.HIGH)}ACTIVE ({alerts[0]['severity'].upper()})"
+        return f"{indicator(Impact.LOW)}NOT ACTIVE" if alerts_available else f"{indicator(Impact.MODERATE)}UNAVAILABLE"
+
+    def rain_timeline(self, top_timeline_count, top_hours):
+        """
+        Formats the top rain hours as a chronological timeline
+
+        :return: Formatted timeline string
+        """
+        string_builder = StringIO()
+        string_builder.write(self.template.timeline_header(top_timeline_count, "RAIN"))
+        for each_hour in top_hours:
+            string_builder.write(f"{self.template.indent}{each_hour['time']}: {each_hour['chance']}% "
+                                 f"({each_hour['amount_mm']} mm)\n")
+        return string_builder.getvalue()
+
+    def pre_window_rain_report(self, structured_report):
+        """
+        Formats the rain before the assigned time period
+
+        :return: Formatted section string
+        """
+        template = self.template
+        rain = structured_report.rain
+        earlier = rain["earlier"]
+        string_builder = StringIO()
+        string_builder.write(template.section("PRIOR RAINFALL"))
+        if not earlier["hours"]:
+            string_builder.write(f"{self.status(False)} RAIN (REPORT OMITTED)\n")
+        else:
+            string_builder.write(f"Rained {earlier['hours']}/{rain['check_hours_prior']} "
+                                 f"last hours (Last {earlier['last_hour']}) | "
+                                 f"{earlier['total_precipitation_mm']} mm\n")
+            string_builder.write(f"{self.impact(earlier['impact'])}\n")
+            string_builder.write(self.rain_timeline(structured_report.top_timeline_count, earlier["top_hours"]))
+        return string_builder.getvalue()
+
+    def during_window_rain_report(self, structured_report):
+        """
+        Formats the rain during the assigned time period
+
+        :return: Formatted section string
+        """
+        template = self.template
+        rain = structured_report.rain
+        during = rain["during"]
+        string_builder = StringIO()
+        string_builder.write(template.section("RAIN"))
+        if not during["hours"]:
+            string_builder.write(f"{self.status(False)} RAIN (REPORT OMITTED)\n")
+            return string_builder.getvalue()
+        string_builder.write(f"Rain {during['hours']}/{rain['duration']} hours | "
+                             f"Avg. Chance: {during['average_chance']}% | {during['total_precipitation_mm']} mm\n")
+        # A low probability shares its line with the precipitation impact, as in the original layout
+        probability_separator = "" if during["probability_impact"]["level"] == 0 else "\n"
+        string_builder.write(f"Probability {self.impact(during['probability_impact'])}{probability_separator}"
+                             f"Precipitation {self.impact(during['precipitation_impact'])}\n")
+        string_builder.write(self.rain_timeline(structured_report.top_timeline_count, during["top_hours"]))
+        return string_builder.getvalue()
+
+    def alert_report(self, structured_report):
+        """
+        Formats the most severe alert overlapping the assigned time period
+
+        :return: Formatted section string
+        """
+        alerts = structured_report.alerts
+        alert_status = self.alert_status(alerts, structured_report.alerts_available)
+        string_builder = StringIO()
+        string_builder.write(self.template.section("ALERT"))
+        if alerts:
+            top_alert = alerts[0]
+            string_builder.write(f"{top_alert['effective']} - {top_alert['expires']}\n"
+                                 f"{alert_status}\n"
+                                 f"Hazard: {top_alert['event'].upper()}\n"
+                                 f"Note: {top_alert['headline'].upper()}\n")
+            if len(alerts) > 1:
+                string_builder.write(f"Also: {', '.join(each_alert['event'].upper() for each_alert in alerts[1:])}\n")
+        else:
+            string_builder.write(f"{alert_status} (REPORT OMITTED)\n")
+        return string_builder.getvalue()
+
+    def metric_report(self, metrics, metric_data, top_timeline_count):
+        """
+        Formats a section per metric with its worst and average values, impact and top-N timeline
+
+        :param metrics: Metric declarations of the analyzer (e.g. Wind.METRICS)
+        :param metric_data: Structured metric data keyed by metric name
+        :param top_timeline_count: The number of hours displayed in each timeline
+
+        :return: Formatted sections string
+        """
+        string_builder = StringIO()
+        for metric in metrics:
+            metric_statistics = metric_data.get(metric.name)
+            if metric_statistics is None:
+                continue
+            string_builder.write(self.template.section(metric.section_title))
+            string_builder.write(metric.statistics_format.format(worst=metric_statistics["worst"],
+                                                                 average=metric_statistics["average"],
+                                                                 unit=metric.unit))
+            string_builder.write(f"{self.impact(metric_statistics['impact'])}\n")
+            string_builder.write(self.template.timeline_header(top_timeline_count, metric.timeline_title))
+            for each_hour in metric_statistics["top_hours"]:
+                string_builder.write(metric.timeline_format.format(indent=self.template.indent, time=each_hour["time"],
+                                                                   value=each_hour["value"], unit=metric.unit))
+        return string_builder.getvalue()
+
+    def metric_summary(self, metrics, metric_data):
+        """
+        Formats one impact line per metric
+
+        :param metrics: Metric declarations of the analyzer
+        :param metric_data: Structured metric data keyed by metric name
+
+        :return: Formatted summary string
+        """
+        return "".join(f"{metric.summary_title}: {self.impact(metric_data[metric.name]['impact'])}\n"
+                       for metric in metrics if metric.name in metric_data)
+
+    def render(self, structured_report):
+        """
+        Substitutes every rendered section into the profile's layout
+
+        :param structured_report: The Structured_Report to render
+
+        :return: The complete report string
+        """
+        template = self.template
+        location, daylight, condition = structured_report.location, structured_report.daylight, \
+            structured_report.condition
+        rain = structured_report.rain
+        return template.render(
+            forecast_date=f"Forecast {structured_report.forecast_date}",
+            generation_date=f"Generated {structured_report.generated_at.replace(' ', ' | ')}",
+            location_section=template.section("LOCATION"),
+            location=f"{location['name']}, {location['region']}, {location['country']}",
+            daylight=f"\nSunrise: {daylight['sunrise']}\nSunset: {daylight['sunset']}",
+            summary_section=template.section("SUMMARY"),
+            timeframe=f"Hours: {structured_report.window['start']} - {structured_report.window['end']}",
+            condition_summary=(f"Condition: {condition['text']} ({condition['category'].upper()})\n"
+                               f"Playability: {self.impact(condition['impact'])}\n"),
+            alert_summary=f"Alert: {self.alert_status(structured_report.alerts, structured_report.alerts_available)}\n",
+            rain_summary=(f"Rain Earlier: {self.status(rain['earlier']['hours'])}\n"
+                          f"Rain Expected: {self.status(rain['during']['hours'])}\n"),
+            wind_summary=self.metric_summary(Wind.METRICS, structured_report.wind),
+            temperature_summary=self.metric_summary(Temperature.METRICS, structured_report.temperature),
+            alert_report=self.alert_report(structured_report),
+            pre_window_rain_report=self.pre_window_rain_report(structured_report),
+            during_window_rain_report=self.during_window_rain_report(structured_report),
+            wind_report=self.metric_report(Wind.METRICS, structured_report.wind,
+                                           structured_report.top_timeline_count),
+            temperature_report=self.metric_report(Temperature.METRICS, structured_report.temperature,
+                                                  structured_report.top_timeline_count))
@@ -0,0 +1,219 @@
+import os
+import json
+import hashlib
+import tomllib
+from threading import Lock
+from configuration import Configuration
+from configuration_validator import Configuration_Validator
+from template import Report_Template
+
+
+class Subscriber_Profile:
+    """
+    Holds the validated report settings of one subscriber
+    """
+    FIELDS = ("name", "phone_number", "channel", "location", "start_time", "end_time", "top_timeline_count",
+              "rain_check_hours_prior", "days_to_show")
+    INTEGER_FIELDS = ("start_time", "end_time", "top_timeline_count", "rain_check_hours_prior", "days_to_show")
+
+    def __init__(self, profile_data):
+        for field in self.FIELDS:
+            setattr(self, field, profile_data[field])
+
+    def to_dict(self):
+        """
+        Converts the profile back into plain data for the compiled cache
+
+        :return: Dictionary of the profile's fields
+        """
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @staticmethod
+    def build_hash(profile_data):
+        """
+        Hashes a raw profile so unchanged profiles can be recognized without validating them again
+
+        :param profile_data: A raw profile entry from the configuration file
+
+        :return: Hexadecimal SHA-256 digest of the profile
+        """
+        return hashlib.sha256(json.dumps(profile_data, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def collect_validation_errors(profile_data):
+        """
+        Validates every field of a raw profile, collecting all failures
+
+        :param profile_data: A raw profile entry from the configuration file
+
+        :return: List of error messages (empty when the profile is valid)
+        """
+        if not isinstance(profile_data, dict):
+            return ["- PROFILE MUST BE A TABLE OF SETTINGS"]
+        missing_fields = [field for field in Subscriber_Profile.FIELDS if field not in profile_data]
+        if missing_fields:
+            return [f"- MISSING FIELD(S): {', '.join(missing_fields).upper()}"]
+        non_integer_fields = [field for field in Subscriber_Profile.INTEGER_FIELDS
+                              if type(profile_data[field]) is not int]
+        if non_integer_fields:
+            return [f"- FIELD(S) MUST BE WHOLE NUMBERS: {', '.join(non_integer_fields).upper()}"]
+
+        validator = Configuration_Validator()
+        validation_errors = Configuration(profile_data["start_time"], profile_data["end_time"],
+                                          profile_data["top_timeline_count"], profile_data["rain_check_hours_prior"],
+                                          profile_data["days_to_show"], validate=False).collect_validation_errors()
+        validations = [(validator.validate_phone_number, (profile_data["phone_number"],)),
+                       (validator.validate_channel, (profile_data["channel"], Report_Template.CHANNEL_PROFILES)),
+                       (validator.validate_coordinates, (profile_data["location"],))]
+        for validation, arguments in validations:
+            try:
+                validation(*arguments)
+            except Exception as error:
+                validation_errors.append(str(error))
+        return validation_errors
+
+
+class Subscriber_Roster:
+    """
+    Loads subscriber profiles from a TOML or JSON file, validates them in one batch and reloads them when the file
+    changes. The compiled profiles are cached next to the file, keyed by the file's hash
+    """
+    def __init__(self, configuration_path, cache_path=None):
+        self.configuration_path = configuration_path
+        self.cache_path = cache_path or f"{configuration_path}.cache.json"
+        self.file_hash = None
+        self.file_signature = None
+        self.profiles = []
+        self.invalid_profiles = []
+        self.validated_count = 0
+        self.reload_lock = Lock()
+        self.reload_if_changed()
+
+    def read_profiles(self, file_bytes):
+        """
+        Parses the configuration file, which holds a 'subscribers' list of profiles
+
+        :param file_bytes: Raw content of the configuration file
+
+        :return: List of raw profile entries
+        """
+        try:
+            if self.configuration_path.endswith(".toml"):
+                configuration_data = tomllib.loads(file_bytes.decode())
+            else:
+                configuration_data = json.loads(file_bytes)
+        except (tomllib.TOMLDecodeError, json.JSONDecodeError, UnicodeDecodeError) as error:
+            raise Exception(f"- UNREADABLE SUBSCRIBER FILE '{self.configuration_path}': {error}")
+        if not isinstance(configuration_data, dict):
+            raise Exception(f"- SUBSCRIBER FILE '{self.configuration_path}' MUST HOLD A 'subscribers' LIST AT THE TOP")
+        profiles = configuration_data.get("subscribers", [])
+        if not isinstance(profiles, list):
+            raise Exception(f"- 'subscribers' IN '{self.configuration_path}' MUST BE A LIST OF PROFILES")
+        return profiles
+
+    def load_cache(self):
+        """
+        Reads the compiled cache written by a previous run
+
+        :return: Cache dictionary, or an empty one when there is no usable cache
+        """
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_cache(self, compiled_profiles, valid_profile_hashes):
+        """
+        Writes the compiled profiles and the hashes of every valid profile, replacing the cache atomically
+
+        :param compiled_profiles: List of validated profiles as dictionaries
+        :param valid_profile_hashes: Hashes of the raw profiles that passed validation
+
+        :return: None
+        """
+        temporary_path = f"{self.cache_path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"file_hash": self.file_hash, "profiles": compiled_profiles,
+                           "invalid_profiles": self.invalid_profiles,
+                           "valid_profile_hashes": sorted(valid_profile_hashes)}, cache_file)
+            os.replace(temporary_path, self.cache_path)
+        except OSError as error:
+            print(f"Subscriber Cache Not Saved:\n"
+                  f"{error}")
+
+    def compile_profiles(self, file_bytes):
+        """
+        Validates every profile of the file in one pass. Profiles whose hash was valid in the previous compile are
+        accepted without validating them again, and every invalid profile is recorded instead of stopping the load
+
+        :param file_bytes: Raw content of the configuration file
+
+        :return: None
+        """
+        cache = self.load_cache()
+        if cache.get("file_hash") == self.file_hash:
+            self.profiles = [Subscriber_Profile(profile_data) for profile_data in cache["profiles"]]
+            self.invalid_profiles = cache["invalid_profiles"]
+            self.validated_count = 0
+            return
+
+        known_valid_hashes = set(cache.get("valid_profile_hashes", []))
+        valid_profile_hashes = set()
+        profiles = []
+        invalid_profiles = []
+        validated_count = 0
+        for index, profile_data in enumerate(self.read_profiles(file_bytes)):
+            profile_hash = Subscriber_Profile.build_hash(profile_data)
+            if profile_hash not in known_valid_hashes:
+                validated_count += 1
+                validation_errors = Subscriber_Profile.collect_validation_errors(profile_data)
+                if validation_errors:
+                    name = profile_data.get("name", "UNNAMED") if isinstance(profile_data, dict) else "UNNAMED"
+                    invalid_profiles.append({"index": index, "name": name, "errors": validation_errors})
+                    continue
+            valid_profile_hashes.add(profile_hash)
+            profiles.append(Subscriber_Profile(profile_data))
+
+        self.profiles = profiles
+        self.invalid_profiles = invalid_profiles
+        self.validated_count = validated_count
+        self.save_cache([each_profile.to_dict() for each_profile in profiles], valid_profile_hashes)
+
+    def reload_if_changed(self):
+        """
+        Reloads the roster when the file's modification time or size changed and its content hash differs from the
+        loaded version. Safe to call from a running loop on every iteration
+
+        :return: True if the roster was reloaded, otherwise False
+        """
+        with self.reload_lock:
+            try:
+                file_status = os.stat(self.configuration_path)
+            except OSError:
+                raise Exception(f"- SUBSCRIBER FILE '{self.configuration_path}' NOT FOUND")
+            file_signature = (file_status.st_mtime_ns, file_status.st_size)
+            if file_signature == self.file_signature:
+                return False
+            with open(self.configuration_path, "rb") as configuration_file:
+                file_bytes = configuration_file.read()
+            self.file_signature = file_signature
+            file_hash = hashlib.sha256(file_bytes).hexdigest()
+            if file_hash == self.file_hash:
+                return False
+            self.file_hash = file_hash
+            self.compile_profiles(file_bytes)
+            return True
+
+    def format_validation_report(self):
+        """
+        Summarizes the outcome of the last compile, listing every invalid profile
+
+        :return: A formatted string with the valid profile count and each invalid profile's errors
+        """
+        lines = [f"Subscribers: {len(self.profiles)} valid | {len(self.invalid_profiles)} invalid"]
+        for invalid_profile in self.invalid_profiles:
+            lines.append(f"#{invalid_profile['index']} {invalid_profile['name']}:")
+            lines.extend(f"  {error}" for error in invalid_profile["errors"])
+        return "\n".join(lines)
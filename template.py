@@ -0,0 +1,153 @@
+class Report_Template:
+    """
+    Compiles the layout of a report channel once so rendering a report only substitutes values into prepared strings.
+    Decoration a profile drops (section emoji, impact indicators, timeline indentation) is left out when the profile is
+    compiled, so the rendered values are never rewritten
+    """
+    FULL_PROFILE = "full"
+    COMPACT_PROFILE = "compact"
+    # Channel used to deliver the report -> layout profile rendered for it
+    CHANNEL_PROFILES = {"whatsapp": FULL_PROFILE, "sms": COMPACT_PROFILE}
+    SECTION_EMOJI = {"LOCATION": "🗺️", "SUMMARY": "📝", "ALERT": "⚠️", "PRIOR RAINFALL": "🌦️", "RAIN": "🌦️",
+                     "WIND SPEED": "🍃", "WIND GUST": "🍃", "FEELS LIKE": "☀️", "HUMIDITY": "☀️", "UV INDEX": "☀️",
+                     "VISIBILITY": "🌫️", "DEW POINT": "☀️"}
+    # Impact level (0 low, 1 moderate, 2 high) -> indicator
+    IMPACT_INDICATORS = ("🟩", "🟨", "🟥")
+    PROFILES = {
+        FULL_PROFILE: {
+            "section": "\n= = = {emoji} {title} {emoji} = = =\n",
+            "timeline": "- - - TOP {count} PEAK {title} HOURS - - -\n",
+            "layout": ("[{forecast_date}]\n"
+                       "[{generation_date}]\n"
+                       "{location_section}"
+                       "{location}"
+                       "{daylight}\n"
+                       "{summary_section}"
+                       "{timeframe}\n"
+                       "{condition_summary}"
+                       "{alert_summary}"
+                       "{rain_summary}"
+                       "{wind_summary}"
+                       "{temperature_summary}"
+                       "{alert_report}"
+                       "{pre_window_rain_report}"
+                       "{during_window_rain_report}"
+                       "{wind_report}"
+                       "{temperature_report}\n"),
+            "indicator": "{indicator} ",
+            "indent": "\t",
+        },
+        # Drops decoration, emoji and timeline indentation to keep SMS messages to as few segments as possible
+        COMPACT_PROFILE: {
+            "section": "\n{title}\n",
+            "timeline": "Top {count} {title} hrs\n",
+            "layout": ("{forecast_date} | {generation_date}\n"
+                       "{location}"
+                       "{daylight}\n"
+                       "{summary_section}"
+                       "{timeframe}\n"
+                       "{condition_summary}"
+                       "{alert_summary}"
+                       "{rain_summary}"
+                       "{wind_summary}"
+                       "{temperature_summary}"
+                       "{alert_report}"
+                       "{pre_window_rain_report}"
+                       "{during_window_rain_report}"
+                       "{wind_report}"
+                       "{temperature_report}"),
+            "indicator": "",
+            "indent": "",
+        },
+    }
+    COMPILED = {}
+
+    def __init__(self, profile):
+        if profile not in self.PROFILES:
+            raise Exception(f"- UNKNOWN REPORT PROFILE '{profile}' (CHOOSE FROM {', '.join(self.PROFILES)})")
+        layout = self.PROFILES[profile]
+        self.profile = profile
+        self.layout = layout["layout"]
+        self.section_format = layout["section"]
+        self.timeline_format = layout["timeline"]
+        self.sections = {title: self.section_format.format(emoji=emoji, title=title)
+                         for title, emoji in self.SECTION_EMOJI.items()}
+        self.timeline_headers = {}
+        self.indicators = tuple(layout["indicator"].format(indicator=indicator) for indicator in self.IMPACT_INDICATORS)
+        self.indent = layout["indent"]
+
+    @staticmethod
+    def compile(profile=FULL_PROFILE):
+        """
+        Returns the compiled template of a profile, compiling it on first use only
+
+        :param profile: Name of the layout profile ('full' or 'compact')
+
+        :return: The shared Report_Template instance for the profile
+        """
+        template = Report_Template.COMPILED.get(profile)
+        if template is None:
+            template = Report_Template.COMPILED[profile] = Report_Template(profile)
+        return template
+
+    @staticmethod
+    def for_channel(channel):
+        """
+        Returns the compiled template used for a delivery channel
+
+        :param channel: Delivery channel ('whatsapp' or 'sms')
+
+        :return: The shared Report_Template instance for the channel's profile
+        """
+        if channel not in Report_Template.CHANNEL_PROFILES:
+            raise Exception(f"- UNKNOWN CHANNEL '{channel}' "
+                            f"(CHOOSE FROM {', '.join(Report_Template.CHANNEL_PROFILES)})")
+        return Report_Template.compile(Report_Template.CHANNEL_PROFILES[channel])
+
+    def section(self, title):
+        """
+        Retrieves the prepared header of a report section
+
+        :param title: Section title in upper case (e.g. 'WIND SPEED'); titles without an emoji get none
+
+        :return: Header string of the section for this profile
+        """
+        header = self.sections.get(title)
+        if header is None:
+            header = self.sections[title] = self.section_format.format(emoji=self.SECTION_EMOJI.get(title, ""),
+                                                                       title=title)
+        return header
+
+    def indicator(self, level):
+        """
+        Retrieves the prefix marking an impact level
+
+        :param level: Impact level (0 low, 1 moderate, 2 high)
+
+        :return: The level's indicator followed by a space, or an empty string when the profile drops indicators
+        """
+        return self.indicators[level]
+
+    def timeline_header(self, count, title):
+        """
+        Retrieves the header of a top-N timeline, preparing it the first time a count and title pair is requested
+
+        :param count: Number of hours displayed in the timeline
+        :param title: Metric name in upper case (e.g. 'GUST')
+
+        :return: Header string of the timeline for this profile
+        """
+        header = self.timeline_headers.get((count, title))
+        if header is None:
+            header = self.timeline_headers[(count, title)] = self.timeline_format.format(count=count, title=title)
+        return header
+
+    def render(self, **values):
+        """
+        Substitutes the rendered sections into the profile's layout
+
+        :param values: Rendered text of each layout field
+
+        :return: The complete report string
+        """
+        return self.layout.format(**values)
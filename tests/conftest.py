@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import Weather_API_Stub
+from weather_provider import WeatherAPI_Provider
+
+
+@pytest.fixture
+def weather_stub():
+    stub = Weather_API_Stub().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def forecast(weather_stub):
+    return WeatherAPI_Provider(f"{weather_stub.url}/v1/forecast.json").fetch_forecast("40.00,-80.00", 2)
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from alert import Alert_Index
+from main import render_report
+from configuration import Configuration
+
+START = datetime(2026, 10, 19, tzinfo=timezone.utc)
+
+
+def build_alert(event, effective_hour, expires_hour, severity="Moderate", urgency="Expected"):
+    return {"headline": f"{event} in effect", "msgtype": "Alert", "severity": severity, "urgency": urgency,
+            "event": event, "areas": "Area",
+            "effective": (START + timedelta(hours=effective_hour)).strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "expires": (START + timedelta(hours=expires_hour)).strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def hour_epoch(hour):
+    return int((START + timedelta(hours=hour)).timestamp())
+
+
+def query_events(alert_index, start_hour, end_hour, location_key=None):
+    return [record.event for record in alert_index.query(hour_epoch(start_hour), hour_epoch(end_hour), location_key)]
+
+
+def build_index(alerts, location_key="40.0,-80.0"):
+    alert_index = Alert_Index()
+    alert_index.add_alerts(alerts, location_key)
+    return alert_index
+
+
+def test_long_running_alert_is_found_past_the_alerts_it_contains():
+    # The heat advisory runs for days, while the storm warnings that start after it expire within hours
+    alert_index = build_index([build_alert("Heat Advisory", 0, 72), build_alert("Storm Warning", 10, 12),
+                               build_alert("Flood Watch", 20, 22)])
+
+    assert alert_index.rebuild()[1] == (hour_epoch(72),) * 3
+    assert query_events(alert_index, 40, 42) == ["Heat Advisory"]
+    # Equal severity and urgency keep the alert that took effect first
+    assert query_events(alert_index, 11, 21) == ["Heat Advisory", "Storm Warning", "Flood Watch"]
+    assert query_events(alert_index, 72, 80) == []
+
+
+def test_nested_alerts_are_ranked_by_severity_then_urgency():
+    alert_index = build_index([build_alert("Wind Advisory", 0, 24, "Minor"),
+                               build_alert("Tornado Warning", 6, 8, "Extreme", "Immediate"),
+                               build_alert("Thunderstorm Watch", 5, 9, "Extreme", "Expected"),
+                               build_alert("Fog Advisory", 2, 4)])
+
+    assert query_events(alert_index, 6, 7) == ["Tornado Warning", "Thunderstorm Watch", "Wind Advisory"]
+    assert query_events(alert_index, 9, 12) == ["Wind Advisory"]
+
+
+def test_window_touching_an_alert_does_not_overlap_it():
+    alert_index = build_index([build_alert("Storm Warning", 10, 12)])
+
+    assert query_events(alert_index, 12, 14) == []
+    assert query_events(alert_index, 8, 10) == []
+    assert query_events(alert_index, 11, 11) == ["Storm Warning"]
+
+
+def test_repeated_alerts_are_stored_once_per_location():
+    alert_index = build_index([build_alert("Storm Warning", 10, 12)], "a")
+    assert alert_index.add_alerts([build_alert("Storm Warning", 10, 12)], "b") == []
+
+    assert len(alert_index.records) == 1
+    assert query_events(alert_index, 10, 11, "b") == ["Storm Warning"]
+    assert query_events(alert_index, 10, 11, "c") == []
+
+
+def test_added_and_evicted_alerts_rebuild_the_index():
+    alert_index = build_index([build_alert("Storm Warning", 10, 12)])
+    assert query_events(alert_index, 0, 48) == ["Storm Warning"]
+
+    alert_index.add_alerts([build_alert("Flood Watch", 20, 30)], "40.0,-80.0")
+    assert query_events(alert_index, 0, 48) == ["Storm Warning", "Flood Watch"]
+    assert alert_index.evict_expired(hour_epoch(12)) == 1
+    assert query_events(alert_index, 0, 48) == ["Flood Watch"]
+
+
+def test_every_report_of_a_forecast_shares_its_index(forecast):
+    forecast.alerts = [build_alert("Wind Advisory", 0, 72)]
+    alert_index = Alert_Index.for_forecast(forecast)
+
+    assert Alert_Index.for_forecast(forecast) is alert_index
+    assert not alert_index.is_stale
+    for forecast_day in range(2):
+        render_report(forecast, forecast_day, Alert_Index.for_forecast(forecast), Configuration(18, 24, 2, 4, 2), "sms")
+    assert len(alert_index.records) == 1
@@ -0,0 +1,113 @@
+from alert_monitor import Alert_Monitor
+
+
+def build_alert(event, expires="2099-01-01T06:00:00-05:00"):
+    return {"headline": f"{event} issued", "msgtype": "Alert", "severity": "Severe", "event": event,
+            "urgency": "Expected", "effective": "2026-10-19T18:00:00-05:00", "expires": expires, "areas": "Area"}
+
+
+class Stub_Alert_Provider:
+    """
+    Returns the alerts set per location, raising for locations listed in 'failing_locations'
+    """
+    def __init__(self, alerts_by_location):
+        self.alerts_by_location = alerts_by_location
+        self.failing_locations = set()
+
+    def __call__(self, location, max_age_seconds):
+        if location in self.failing_locations:
+            raise Exception(f"- NO ALERTS FOR '{location}'")
+        return {"location": {"name": location}, "alerts": {"alert": self.alerts_by_location.get(location, [])}}
+
+
+class Stub_Sender:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def __call__(self, body):
+        if self.failures:
+            self.failures -= 1
+            raise Exception("- SEND FAILED")
+        self.sent.append(body)
+
+
+def build_monitor(provider, sender, locations=("a", "b")):
+    return Alert_Monitor(list(locations), notify=sender, fetch_alerts=provider)
+
+
+def test_existing_and_already_seen_alerts_are_not_repeated():
+    provider = Stub_Alert_Provider({"a": [build_alert("Thunderstorm")]})
+    sender = Stub_Sender()
+    alert_monitor = build_monitor(provider, sender)
+
+    assert alert_monitor.poll_once() == []
+    provider.alerts_by_location["a"].append(build_alert("Tornado"))
+    notified = alert_monitor.poll_once()
+    assert [(location, record.event) for location, record in notified] == [("a", "Tornado")]
+    assert alert_monitor.poll_once() == []
+    assert len(sender.sent) == 1
+    assert sender.sent[0].startswith("⚠️ TORNADO (SEVERE) - a")
+
+
+def test_alert_issued_again_is_announced_again():
+    provider = Stub_Alert_Provider({"a": []})
+    sender = Stub_Sender()
+    alert_monitor = build_monitor(provider, sender, locations=("a",))
+    alert_monitor.poll_once()
+
+    provider.alerts_by_location["a"] = [build_alert("Tornado")]
+    alert_monitor.poll_once()
+    provider.alerts_by_location["a"] = []
+    alert_monitor.poll_once()
+    provider.alerts_by_location["a"] = [build_alert("Tornado")]
+    alert_monitor.poll_once()
+    assert len(sender.sent) == 2
+
+
+def test_failing_location_does_not_hold_back_the_others(capsys):
+    provider = Stub_Alert_Provider({"a": [], "b": []})
+    sender = Stub_Sender()
+    alert_monitor = build_monitor(provider, sender)
+    alert_monitor.poll_once()
+
+    provider.failing_locations.add("a")
+    provider.alerts_by_location["a"].append(build_alert("Tornado"))
+    provider.alerts_by_location["b"].append(build_alert("Hail"))
+    notified = alert_monitor.poll_once()
+    assert [(location, record.event) for location, record in notified] == [("b", "Hail")]
+    assert "Alert Poll Failed (a):\n- NO ALERTS FOR 'a'" in capsys.readouterr().out
+
+    provider.failing_locations.clear()
+    notified = alert_monitor.poll_once()
+    assert [(location, record.event) for location, record in notified] == [("a", "Tornado")]
+
+
+def test_failed_notification_is_retried_on_the_next_poll(capsys):
+    provider = Stub_Alert_Provider({"a": [], "b": []})
+    sender = Stub_Sender()
+    alert_monitor = build_monitor(provider, sender)
+    alert_monitor.poll_once()
+
+    provider.alerts_by_location["a"].append(build_alert("Tornado"))
+    provider.alerts_by_location["b"].append(build_alert("Hail"))
+    sender.failures = 1
+    notified = alert_monitor.poll_once()
+    assert [(location, record.event) for location, record in notified] == [("b", "Hail")]
+    assert "- SEND FAILED" in capsys.readouterr().out
+
+    notified = alert_monitor.poll_once()
+    assert [(location, record.event) for location, record in notified] == [("a", "Tornado")]
+    assert alert_monitor.poll_once() == []
+    assert len(sender.sent) == 2
+
+
+def test_notification_latencies_are_bounded():
+    provider = Stub_Alert_Provider({"a": []})
+    alert_monitor = build_monitor(provider, Stub_Sender(), locations=("a",))
+    alert_monitor.poll_once()
+    for index in range(Alert_Monitor.HISTORY_SIZE + 5):
+        provider.alerts_by_location["a"] = [build_alert(f"Alert {index}")]
+        alert_monitor.poll_once()
+
+    assert len(alert_monitor.notification_latencies) == Alert_Monitor.HISTORY_SIZE
@@ -0,0 +1,58 @@
+import pytest
+from encoding_planner import Encoding_Planner
+from messenger import Messenger
+
+SMS_LIMIT = Messenger.CHARACTER_LIMITS["sms"]
+
+
+@pytest.mark.parametrize("text", ["a" * (SMS_LIMIT - 1), "a" * SMS_LIMIT, "a" * (SMS_LIMIT + 1),
+                                  ("a" * (SMS_LIMIT - 1) + "\n") * 3, ("line\n" * 1000)],
+                         ids=["below_limit", "at_limit", "above_limit", "full_lines", "short_lines"])
+def test_bodies_never_exceed_the_character_limit(text):
+    message_plan = Encoding_Planner("sms").plan(text, SMS_LIMIT)
+    assert all(len(each_body) <= SMS_LIMIT for each_body in message_plan.bodies)
+    assert "".join(each_body[:-1] for each_body in message_plan.bodies) == text
+
+
+def test_text_one_below_the_limit_is_one_body():
+    message_plan = Encoding_Planner("sms").plan("a" * (SMS_LIMIT - 1), SMS_LIMIT)
+    assert message_plan.bodies == ["a" * (SMS_LIMIT - 1) + "\n"]
+
+
+@pytest.mark.parametrize("text, segment_count", [("a" * 160, 1), ("a" * 161, 2), ("a" * 306, 2), ("a" * 307, 3),
+                                                 ("€" * 80, 1), ("€" * 81, 2), ("a" * 159 + "€", 2),
+                                                 ("a" * 158 + "€" + "a", 2),
+                                                 ("a" * 152 + "€" + "a" * 152, 3)])
+def test_gsm_7_extension_characters_cost_two_septets(text, segment_count):
+    encoding_planner = Encoding_Planner("sms")
+    assert encoding_planner.detect_encoding(text) == Encoding_Planner.GSM_7
+    assert encoding_planner.count_sms_segments(text, Encoding_Planner.GSM_7) == segment_count
+
+
+@pytest.mark.parametrize("text, segment_count", [("☂" * 70, 1), ("☂" * 71, 2), ("☂" * 134, 2), ("☂" * 135, 3),
+                                                 ("😀" * 35, 1), ("😀" * 36, 2)])
+def test_ucs_2_segments(text, segment_count):
+    encoding_planner = Encoding_Planner("sms")
+    assert encoding_planner.detect_encoding(text) == Encoding_Planner.UCS_2
+    assert encoding_planner.count_sms_segments(text, Encoding_Planner.UCS_2) == segment_count
+
+
+def test_sms_falls_back_to_ucs_2_when_transliterating_saves_nothing():
+    message_plan = Encoding_Planner("sms").plan("Wind 🟩", SMS_LIMIT)
+    assert message_plan.encoding == Encoding_Planner.UCS_2
+    assert message_plan.text == "Wind 🟩"
+    assert message_plan.segment_count == 1
+
+
+def test_sms_is_transliterated_when_it_saves_segments():
+    text = "= = =  🍃 WIND  = = =\nGust 🟥 HIGH 40 kph\n" * 4
+    message_plan = Encoding_Planner("sms").plan(text, SMS_LIMIT)
+    assert message_plan.encoding == Encoding_Planner.GSM_7
+    assert "🟥" not in message_plan.text and "Gust ! HIGH 40 kph" in message_plan.text
+    assert message_plan.segment_count == 1
+
+
+def test_whatsapp_is_billed_per_message():
+    message_plan = Encoding_Planner("whatsapp").plan("a" * 2000, Messenger.CHARACTER_LIMITS["whatsapp"])
+    assert message_plan.encoding == Encoding_Planner.UNICODE
+    assert message_plan.segment_count == len(message_plan.bodies) == 3
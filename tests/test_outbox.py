@@ -0,0 +1,152 @@
+import time
+from datetime import datetime
+from threading import Lock
+import structured_report
+from alert import Alert_Index
+from configuration import Configuration
+from date import Date
+from main import render_report
+from report_cache import Report_Cache
+from encoding_planner import Encoding_Planner
+from messenger import Messenger
+from outbox import Message_Outbox, Outbox_Worker_Pool
+
+
+class Recording_Sender:
+    """
+    Stands in for Messenger.send_text and records every message it is asked to send
+    """
+    def __init__(self, send_seconds=0.0):
+        self.send_seconds = send_seconds
+        self.sent = []
+        self.lock = Lock()
+
+    def __call__(self, body, to):
+        time.sleep(self.send_seconds)
+        with self.lock:
+            self.sent.append((to, body))
+
+    def bodies_for(self, recipient):
+        return [body for to, body in self.sent if to == recipient]
+
+
+def drain(outbox, sender, worker_count=2, batch_size=20):
+    worker_pool = Outbox_Worker_Pool(outbox, sender=sender, worker_count=worker_count, batch_size=batch_size)
+    worker_pool.start(stop_when_idle=True)
+    worker_pool.join()
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    connection = outbox.connect()
+    assert outbox.enqueue(connection, "+15550000001", ["first", "second"], "report-1") == 2
+    assert outbox.enqueue(connection, "+15550000001", ["first", "second"], "report-1") == 0
+    assert outbox.count_by_status(connection) == {Message_Outbox.PENDING: 2}
+
+
+def test_crashed_batch_is_redelivered_after_its_lease_expires(tmp_path):
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    connection = outbox.connect()
+    outbox.enqueue(connection, "+15550000001", ["first", "second"], "report-1")
+    outbox.enqueue(connection, "+15550000002", ["other"], "report-2")
+    sender = Recording_Sender()
+
+    # A worker leases a batch and sends it, then dies before committing the results; its lease expires at once
+    outbox.LEASE_SECONDS = 0
+    crashed_batch = outbox.claim(connection, 20)
+    for message_id, recipient, body in crashed_batch:
+        sender(body, recipient)
+    del outbox.LEASE_SECONDS
+    time.sleep(0.01)
+
+    # Only the first message of each recipient was ready, the second one waits for the first to be sent
+    assert sorted(body for message_id, recipient, body in crashed_batch) == ["first", "other"]
+    drain(outbox, sender)
+    assert sender.bodies_for("+15550000001") == ["first", "first", "second"]
+    assert sender.bodies_for("+15550000002") == ["other", "other"]
+    assert outbox.count_by_status(connection) == {Message_Outbox.SENT: 3}
+
+
+def test_restarted_workers_do_not_resend_delivered_messages(tmp_path):
+    database_path = str(tmp_path / "outbox.db")
+    outbox = Message_Outbox(database_path)
+    connection = outbox.connect()
+    outbox.enqueue(connection, "+15550000001", ["first", "second"], "report-1")
+    sender = Recording_Sender()
+    drain(outbox, sender)
+
+    # A new process opens the same database and enqueues the same report again
+    restarted_outbox = Message_Outbox(database_path)
+    restarted_connection = restarted_outbox.connect()
+    assert restarted_outbox.enqueue(restarted_connection, "+15550000001", ["first", "second"], "report-1") == 0
+    drain(restarted_outbox, sender)
+    assert sender.sent == [("+15550000001", "first"), ("+15550000001", "second")]
+
+
+def test_failed_messages_are_retried(tmp_path):
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    outbox.RETRY_BASE_SECONDS = 0
+    connection = outbox.connect()
+    outbox.enqueue(connection, "+15550000001", ["first", "second"], "report-1")
+    sender = Recording_Sender()
+    attempts = []
+
+    def flaky_sender(body, to):
+        attempts.append(body)
+        if len(attempts) == 1:
+            raise Exception("- TWILIO UNAVAILABLE")
+        sender(body, to)
+
+    drain(outbox, flaky_sender, worker_count=1)
+    assert attempts == ["first", "first", "second"]
+    assert sender.bodies_for("+15550000001") == ["first", "second"]
+
+
+def test_slow_batch_keeps_its_lease(tmp_path):
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    # The batch takes longer to send than one lease, so it is only kept by renewing the lease before each send
+    outbox.LEASE_SECONDS = 0.5
+    connection = outbox.connect()
+    recipients = [f"+1555000000{index}" for index in range(4)]
+    for recipient in recipients:
+        outbox.enqueue(connection, recipient, ["report"], f"report-{recipient}")
+    sender = Recording_Sender(send_seconds=0.2)
+    drain(outbox, sender, worker_count=2, batch_size=len(recipients))
+    assert sorted(sender.sent) == [(recipient, "report") for recipient in recipients]
+
+
+def test_messenger_queues_report_in_outbox(tmp_path):
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    report_text = "Weather report\n" * 200
+    message_plan = Encoding_Planner("sms").plan(report_text, Messenger.CHARACTER_LIMITS["sms"])
+    date_details = Date(18, 24, {"date": "2026-10-19"})
+    for _ in range(2):
+        Messenger(None, date_details, "sms", message_plan, outbox, "+15550000001")
+
+    connection = outbox.connect()
+    assert outbox.count_by_status(connection) == {Message_Outbox.PENDING: len(message_plan.bodies)}
+    sender = Recording_Sender()
+    drain(outbox, sender)
+    assert sender.bodies_for("+15550000001") == list(message_plan.bodies)
+
+
+def test_report_rendered_again_later_is_queued_once(tmp_path, monkeypatch, forecast):
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    configuration = Configuration(18, 24, 2, 4, 1)
+    alert_index = Alert_Index()
+    alert_index.add_alerts(forecast.alerts, forecast.location_key)
+    cache_key = Report_Cache().build_key(forecast.build_payload_hash(), 0, 18, 24, 2, 4, "sms")
+    date_details = Date(18, 24, forecast.forecast_days[0])
+
+    # The same report rendered a minute apart, e.g. re-run after a crash, differs only in its generation time
+    rendered_reports = []
+    for generated_at in (datetime(2026, 10, 19, 17, 0), datetime(2026, 10, 19, 17, 1)):
+        monkeypatch.setattr(structured_report, "datetime", type("Fixed_Clock", (datetime,), {
+            "now": classmethod(lambda cls, generated_at=generated_at: generated_at)}))
+        rendered_reports.append(render_report(forecast, 0, alert_index, configuration, "sms"))
+    assert rendered_reports[0][0] != rendered_reports[1][0]
+
+    for formatted_report, message_plan in rendered_reports:
+        Messenger(None, date_details, "sms", message_plan, outbox, "+15550000001", cache_key)
+    connection = outbox.connect()
+    assert outbox.count_by_status(connection) == {Message_Outbox.PENDING: len(rendered_reports[0][1].bodies)}
@@ -0,0 +1,130 @@
+import time
+import asyncio
+from threading import Event, Lock
+from outbox import Message_Outbox
+from pipeline import Report_Pipeline
+from subscriber_roster import Subscriber_Profile
+
+
+class Stub_Provider:
+    """
+    Answers every location with the same forecast, failing for the locations listed in 'failing_locations'
+    """
+    def __init__(self, forecast, failing_locations=()):
+        self.forecast = forecast
+        self.failing_locations = failing_locations
+
+    def fetch_forecast(self, location, days_to_show):
+        if location in self.failing_locations:
+            raise Exception(f"- NO FORECAST FOR '{location}'")
+        return self.forecast
+
+
+class Recording_Sender:
+    def __init__(self):
+        self.sent = []
+        self.lock = Lock()
+
+    def __call__(self, body, to):
+        with self.lock:
+            self.sent.append((to, body))
+
+
+def build_profiles(locations, subscribers_per_location=1):
+    return [Subscriber_Profile({"name": f"subscriber-{location}-{index}", "phone_number": f"+1555{number:07d}",
+                                "channel": "sms", "location": location, "start_time": 18, "end_time": 24,
+                                "top_timeline_count": 2, "rain_check_hours_prior": 4, "days_to_show": 1})
+            for number, (location, index) in enumerate((location, index) for location in locations
+                                                       for index in range(subscribers_per_location))]
+
+
+def run_pipeline(report_pipeline):
+    return asyncio.run(asyncio.wait_for(report_pipeline.run(), timeout=30))
+
+
+def test_every_report_is_delivered_through_the_outbox(tmp_path, forecast):
+    sender = Recording_Sender()
+    profiles = build_profiles(["40.00,-80.00", "41.00,-80.00"], subscribers_per_location=3)
+    outbox = Message_Outbox(str(tmp_path / "outbox.db"))
+    results = run_pipeline(Report_Pipeline(Stub_Provider(forecast), profiles, sender=sender, outbox=outbox))
+
+    assert results["stages"]["fetch"]["completed"] == 2
+    assert results["stages"]["render"]["completed"] == 6
+    assert results["stages"]["send"]["completed"] == 6
+    assert set(results["outbox"]) == {Message_Outbox.SENT}
+    assert {to for to, body in sender.sent} == {profile.phone_number for profile in profiles}
+    assert len(sender.sent) == results["outbox"][Message_Outbox.SENT]
+
+
+def test_failed_stage_is_isolated(tmp_path, forecast):
+    sender = Recording_Sender()
+    profiles = build_profiles(["40.00,-80.00", "bad", "41.00,-80.00"])
+    report_pipeline = Report_Pipeline(Stub_Provider(forecast, failing_locations=("bad",)), profiles, sender=sender,
+                                      outbox=Message_Outbox(str(tmp_path / "outbox.db")))
+    results = run_pipeline(report_pipeline)
+
+    assert results["stages"]["fetch"]["failed"] == 1
+    assert report_pipeline.errors == ["FETCH: - NO FORECAST FOR 'bad'"]
+    assert {to for to, body in sender.sent} == {profile.phone_number for profile in profiles
+                                                if profile.location != "bad"}
+
+
+def test_failure_outside_a_stage_marks_the_item_done(tmp_path, forecast):
+    # Alerts without the expected fields fail while the fetch worker indexes them, after the fetch stage succeeded
+    forecast.alerts = [{"headline": "incomplete alert"}]
+    report_pipeline = Report_Pipeline(Stub_Provider(forecast), build_profiles(["40.00,-80.00"]),
+                                      sender=Recording_Sender(), outbox=Message_Outbox(str(tmp_path / "outbox.db")))
+    results = run_pipeline(report_pipeline)
+
+    assert results["stages"]["fetch"]["failed"] == 1
+    assert len(report_pipeline.errors) == 1
+    assert results["outbox"] == {}
+
+
+def test_full_queues_hold_back_rendering(tmp_path, forecast):
+    release_sends = Event()
+    rendered_count = 0
+    report_pipeline = Report_Pipeline(Stub_Provider(forecast), build_profiles(["40.00,-80.00"], 20),
+                                      sender=Recording_Sender(), render_workers=1, send_workers=1, queue_size=2,
+                                      outbox=Message_Outbox(str(tmp_path / "outbox.db")))
+    render_reports, send_reports = report_pipeline.render_reports, report_pipeline.send_reports
+
+    def counting_render_reports(*arguments):
+        nonlocal rendered_count
+        rendered_count += 1
+        return render_reports(*arguments)
+
+    def blocked_send_reports(*arguments):
+        release_sends.wait()
+        return send_reports(*arguments)
+
+    report_pipeline.render_reports = counting_render_reports
+    report_pipeline.send_reports = blocked_send_reports
+
+    async def run_with_blocked_sends():
+        pipeline_task = asyncio.create_task(report_pipeline.run())
+        await asyncio.sleep(0.5)
+        # One report held by the send worker, two in the send queue and one waiting for a free slot
+        rendered_while_blocked = rendered_count
+        release_sends.set()
+        return rendered_while_blocked, await asyncio.wait_for(pipeline_task, timeout=30)
+
+    rendered_while_blocked, results = asyncio.run(run_with_blocked_sends())
+    assert rendered_while_blocked == 4
+    assert results["stages"]["send"]["completed"] == 20
+
+
+def test_run_shuts_down_cleanly(tmp_path, forecast):
+    report_pipeline = Report_Pipeline(Stub_Provider(forecast, failing_locations=("bad",)),
+                                      build_profiles(["40.00,-80.00", "bad"]), sender=Recording_Sender(),
+                                      outbox=Message_Outbox(str(tmp_path / "outbox.db")))
+
+    async def run_and_collect_tasks():
+        results = await report_pipeline.run()
+        return results, [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    started = time.perf_counter()
+    results, remaining_tasks = asyncio.run(run_and_collect_tasks())
+    assert remaining_tasks == []
+    assert time.perf_counter() - started < 10
+    assert set(results["outbox"]) == {Message_Outbox.SENT}
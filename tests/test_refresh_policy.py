@@ -0,0 +1,101 @@
+import time
+import asyncio
+from outbox import Message_Outbox
+from pipeline import Report_Pipeline
+from refresh_policy import Refresh_Policy
+from subscriber_roster import Subscriber_Profile
+
+DAY_START = 1_700_000_000
+
+
+def build_forecast_days(gust_by_hour=None, day_count=1):
+    gust_by_hour = gust_by_hour or {}
+    return [{"hour": [{"time_epoch": DAY_START + (day * 24 + hour) * 3600, "gust_kph": gust_by_hour.get(hour, 10),
+                       "chance_of_rain": 0} for hour in range(24)]} for day in range(day_count)]
+
+
+class Counting_Provider:
+    def __init__(self, forecast, failing=False):
+        self.forecast = forecast
+        self.failing = failing
+        self.fetched = []
+
+    def fetch_forecast(self, location, days_to_show):
+        self.fetched.append(location)
+        if self.failing:
+            raise Exception(f"- NO FORECAST FOR '{location}'")
+        return self.forecast
+
+
+def build_profile(location, start_time=18, end_time=24):
+    return Subscriber_Profile({"name": f"subscriber-{location}", "phone_number": "+15550000001", "channel": "sms",
+                               "location": location, "start_time": start_time, "end_time": end_time,
+                               "top_timeline_count": 2, "rain_check_hours_prior": 4, "days_to_show": 1})
+
+
+def test_merge_windows_joins_nested_overlapping_and_touching_windows():
+    assert Refresh_Policy.merge_windows([(0, 10), (2, 4), (8, 12), (12, 14), (20, 30)]) == [(0, 14), (20, 30)]
+
+
+def test_nested_windows_cover_every_hour_of_the_outer_window():
+    refresh_policy = Refresh_Policy()
+    schedule = refresh_policy.register("40.00,-80.00", [(17, 24), (18, 20)], now=DAY_START)
+    forecast_days = build_forecast_days()
+    window_epochs = refresh_policy.build_window_epochs(schedule, forecast_days)
+    _, hourly_values = refresh_policy.measure_change(schedule, window_epochs, forecast_days, DAY_START)
+
+    assert sorted(hourly_values) == [DAY_START + hour * 3600 for hour in range(17, 24)]
+
+
+def test_change_after_the_nested_window_raises_volatility():
+    refresh_policy = Refresh_Policy()
+    refresh_policy.register("40.00,-80.00", [(17, 24), (18, 20)], now=DAY_START)
+    refresh_policy.record_fetch("40.00,-80.00", build_forecast_days(), now=DAY_START)
+    refresh_policy.record_fetch("40.00,-80.00", build_forecast_days({21: 50, 22: 50, 23: 50}), now=DAY_START + 60)
+
+    assert refresh_policy.changes[-1] > 0
+    assert refresh_policy.schedules["40.00,-80.00"].volatility > Refresh_Policy.INITIAL_VOLATILITY / 2
+
+
+def test_pipeline_only_fetches_due_locations(tmp_path, forecast):
+    provider = Counting_Provider(forecast)
+    refresh_policy = Refresh_Policy()
+    report_pipeline = Report_Pipeline(provider, [build_profile("40.00,-80.00"), build_profile("41.00,-80.00")],
+                                      sender=lambda body, to: None, outbox=Message_Outbox(str(tmp_path / "outbox.db")),
+                                      refresh_policy=refresh_policy)
+    asyncio.run(report_pipeline.run())
+    assert sorted(provider.fetched) == ["40.00,-80.00", "41.00,-80.00"]
+    assert all(schedule.next_fetch_at > time.time() for schedule in refresh_policy.schedules.values())
+
+    results = asyncio.run(report_pipeline.run())
+    assert results["stages"]["fetch"]["completed"] == 0
+    assert len(provider.fetched) == 2
+
+    refresh_policy.schedules["41.00,-80.00"].next_fetch_at = 0
+    asyncio.run(report_pipeline.run())
+    assert provider.fetched[2:] == ["41.00,-80.00"]
+    assert refresh_policy.statistics()["fetches"] == 3
+
+
+def test_failed_fetch_is_retried_after_the_minimum_interval(tmp_path, forecast):
+    refresh_policy = Refresh_Policy()
+    report_pipeline = Report_Pipeline(Counting_Provider(forecast, failing=True), [build_profile("40.00,-80.00")],
+                                      sender=lambda body, to: None, outbox=Message_Outbox(str(tmp_path / "outbox.db")),
+                                      refresh_policy=refresh_policy)
+    before = time.time()
+    asyncio.run(report_pipeline.run())
+
+    schedule = refresh_policy.schedules["40.00,-80.00"]
+    assert schedule.fetch_count == 0
+    assert schedule.next_fetch_at >= before + Refresh_Policy.MIN_INTERVAL_SECONDS
+
+
+def test_watch_runs_until_max_cycles(tmp_path, forecast):
+    provider = Counting_Provider(forecast)
+    report_pipeline = Report_Pipeline(provider, [build_profile("40.00,-80.00")], sender=lambda body, to: None,
+                                      outbox=Message_Outbox(str(tmp_path / "outbox.db")),
+                                      refresh_policy=Refresh_Policy())
+    results = asyncio.run(asyncio.wait_for(report_pipeline.watch(max_cycles=3, idle_sleep_seconds=0), timeout=30))
+
+    assert provider.fetched == ["40.00,-80.00"]
+    assert results["stages"]["fetch"]["completed"] == 0
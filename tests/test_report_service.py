@@ -0,0 +1,105 @@
+import json
+import time
+import asyncio
+from threading import Lock
+from report_service import Report_Service
+from structured_report import Structured_Report
+from wind import Wind
+
+QUERY = "lat=40.00&lon=-80.00"
+
+
+class Counting_Provider:
+    """
+    Answers with the same forecast after 'latency_seconds', counting the calls
+    """
+    def __init__(self, forecast, latency_seconds=0.0):
+        self.forecast = forecast
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.lock = Lock()
+
+    def fetch_forecast(self, location, days_to_show):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency_seconds)
+        return self.forecast
+
+
+async def request(port, target):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def serve_requests(report_service, targets):
+    async def run():
+        server = await asyncio.start_server(report_service.handle_connection, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            return await asyncio.gather(*(request(port, target) for target in targets))
+
+    return asyncio.run(asyncio.wait_for(run(), timeout=30))
+
+
+def test_report_analysis_is_the_structured_report(forecast):
+    [(status, body)] = serve_requests(Report_Service(Counting_Provider(forecast)), [f"/report?{QUERY}&days=2"])
+
+    assert status == 200
+    assert len(body["reports"]) == 2
+    analysis = body["reports"][0]["analysis"]
+    assert analysis["schema_version"] == Structured_Report.SCHEMA_VERSION
+    assert set(Structured_Report.SECTIONS) | {"atmosphere"} <= set(analysis)
+    # The impact the analysis reports is the one the text report shows
+    assert analysis["wind"]["gust"]["impact"]["label"] in body["reports"][0]["text"]
+
+
+def test_best_window_scores_with_the_metric_impacts(forecast):
+    [(status, body)] = serve_requests(Report_Service(Counting_Provider(forecast)),
+                                      [f"/best-window?{QUERY}&length=3"])
+
+    assert status == 200
+    windows = body["days"][0]["windows"]
+    assert len(windows) == Report_Service.BEST_WINDOW_COUNT
+    for window in windows:
+        minimum_score = (Wind.find_metric("speed").impact(window["max_wind_speed"]).level
+                         + Wind.find_metric("gust").impact(window["max_wind_gust"]).level)
+        assert window["score"] >= minimum_score
+    assert [window["score"] for window in windows] == sorted(window["score"] for window in windows)
+
+
+def test_bad_queries_answer_400(forecast):
+    responses = serve_requests(Report_Service(Counting_Provider(forecast)),
+                               [f"/report?{QUERY}&start=x", "/report?lat=999&lon=1", f"/report?{QUERY}&start=20&end=18",
+                                f"/best-window?{QUERY}&length=40"])
+
+    assert [status for status, _ in responses] == [400, 400, 400, 400]
+    assert responses[0][1] == {"error": "- INVALID START 'x' (USE A WHOLE NUMBER)"}
+
+
+def test_unexpected_error_answers_500(forecast):
+    report_service = Report_Service(Counting_Provider(forecast))
+
+    def failing_build_reports(*arguments):
+        raise RuntimeError("render crashed")
+
+    report_service.build_reports = failing_build_reports
+    [(status, body)] = serve_requests(report_service, [f"/report?{QUERY}"])
+
+    assert status == 500
+    assert body == {"error": "- INTERNAL ERROR: render crashed"}
+
+
+def test_concurrent_requests_share_one_fetch(forecast):
+    provider = Counting_Provider(forecast, latency_seconds=0.3)
+    report_service = Report_Service(provider)
+    responses = serve_requests(report_service, [f"/report?{QUERY}"] * 8)
+
+    assert [status for status, _ in responses] == [200] * 8
+    assert provider.calls == 1
+    assert report_service.forecast_store.statistics()["coalesced"] == 7
+    assert len({body["reports"][0]["text"] for _, body in responses}) == 1
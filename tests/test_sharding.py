@@ -0,0 +1,124 @@
+import json
+import time
+from threading import Thread
+from load_test import Weather_API_Stub
+from sharding import Hash_Ring, Shard_Queue, Shard_Worker, Shard_Coordinator
+from subscriber_roster import Subscriber_Profile
+from weather_provider import WeatherAPI_Provider
+
+
+class File_Sender:
+    """
+    Sender shared with the worker processes; every process appends the messages it sends to the same file
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, body, to):
+        with open(self.path, "a") as sink:
+            sink.write(json.dumps({"to": to, "body": body}) + "\n")
+
+    def read(self):
+        with open(self.path) as sink:
+            return [json.loads(line) for line in sink]
+
+
+class Slow_Provider(WeatherAPI_Provider):
+    """
+    Weather provider that takes longer than a lease to answer
+    """
+    def __init__(self, url, delay_seconds):
+        super().__init__(url)
+        self.delay_seconds = delay_seconds
+
+    def fetch_forecast(self, location, days_to_show):
+        time.sleep(self.delay_seconds)
+        return super().fetch_forecast(location, days_to_show)
+
+
+def build_profiles(location_count, subscribers_per_location):
+    return [Subscriber_Profile({"name": f"subscriber-{location_index}-{subscriber_index}",
+                                "phone_number": f"+1555{location_index:04d}{subscriber_index:03d}",
+                                "channel": ("sms", "whatsapp")[subscriber_index % 2],
+                                "location": f"{40 + location_index * 0.01:.2f},-80.00", "start_time": 18,
+                                "end_time": 24, "top_timeline_count": 2, "rain_check_hours_prior": 4,
+                                "days_to_show": 1})
+            for location_index in range(location_count) for subscriber_index in range(subscribers_per_location)]
+
+
+def test_hash_ring_moves_only_the_new_workers_share():
+    locations = [f"{40 + index * 0.001:.3f},-80.000" for index in range(2000)]
+    hash_ring = Hash_Ring([f"worker-{index}" for index in range(4)])
+    before = {location: hash_ring.find_node(location) for location in locations}
+    hash_ring.add_node("worker-4")
+    moved = [location for location in locations if hash_ring.find_node(location) != before[location]]
+    assert all(hash_ring.find_node(location) == "worker-4" for location in moved)
+    assert 0.1 < len(moved) / len(locations) < 0.3
+
+
+def test_worker_processes_run_every_job_once(tmp_path):
+    weather_stub = Weather_API_Stub().start()
+    sender = File_Sender(str(tmp_path / "sent.jsonl"))
+    profiles = build_profiles(location_count=12, subscribers_per_location=2)
+    try:
+        results = Shard_Coordinator(str(tmp_path / "shards.sqlite3"), "weatherapi",
+                                    {"url": f"{weather_stub.url}/v1/forecast.json"}, sender,
+                                    poll_seconds=0.1).run(profiles, worker_count=3)
+    finally:
+        weather_stub.stop()
+
+    assert results["jobs_by_status"] == {Shard_Queue.DONE: 12}
+    assert sum(results["jobs_by_worker"].values()) == 12
+    assert len(results["jobs_by_worker"]) > 1
+    sent_messages = sender.read()
+    assert {message["to"] for message in sent_messages} == {profile.phone_number for profile in profiles}
+    sent_pairs = [(message["to"], message["body"]) for message in sent_messages]
+    assert len(sent_pairs) == len(set(sent_pairs))
+
+
+def test_result_after_lost_lease_is_ignored(tmp_path):
+    shard_queue = Shard_Queue(str(tmp_path / "shards.sqlite3"))
+    connection = shard_queue.connect()
+    job_id = shard_queue.enqueue(connection, "40.00,-80.00", build_profiles(1, 1))
+    shard_queue.assign(connection, Hash_Ring(["worker-0"]))
+    shard_queue.LEASE_SECONDS = 0
+    assert [job[0] for job in shard_queue.claim(connection, "worker-0", 1)] == [job_id]
+    time.sleep(0.01)
+
+    # worker-0 stops heartbeating, so its lease expires and the job moves to worker-1
+    shard_queue.assign(connection, Hash_Ring(["worker-1"]))
+    del shard_queue.LEASE_SECONDS
+    assert [job[0] for job in shard_queue.claim(connection, "worker-1", 1)] == [job_id]
+    assert not shard_queue.record_result(connection, job_id, "worker-0")
+    assert shard_queue.count_by_status(connection) == {Shard_Queue.LEASED: 1}
+    assert shard_queue.record_result(connection, job_id, "worker-1")
+    assert shard_queue.count_by_worker(connection) == {"worker-1": 1}
+
+
+def test_long_job_keeps_its_lease(tmp_path):
+    weather_stub = Weather_API_Stub().start()
+    shard_queue = Shard_Queue(str(tmp_path / "shards.sqlite3"))
+    # The job runs for several leases, so it is only kept by the background heartbeats
+    shard_queue.LEASE_SECONDS = 0.5
+    connection = shard_queue.connect()
+    shard_queue.enqueue(connection, "40.00,-80.00", build_profiles(1, 1))
+    hash_ring = Hash_Ring(["worker-0"])
+    shard_queue.assign(connection, hash_ring)
+    sender = File_Sender(str(tmp_path / "sent.jsonl"))
+    shard_worker = Shard_Worker(shard_queue, "worker-0",
+                                Slow_Provider(f"{weather_stub.url}/v1/forecast.json", delay_seconds=1.5),
+                                sender=sender)
+    shard_worker.HEARTBEAT_SECONDS = 0.1
+    worker_thread = Thread(target=shard_worker.run, args=(True,))
+    try:
+        worker_thread.start()
+        # Plays the coordinator, which releases expired leases on every poll
+        while worker_thread.is_alive():
+            shard_queue.assign(connection, hash_ring)
+            time.sleep(0.05)
+    finally:
+        worker_thread.join()
+        weather_stub.stop()
+
+    assert connection.execute("SELECT status, attempts FROM shard_jobs").fetchall() == [(Shard_Queue.DONE, 1)]
+    assert len(sender.read()) > 0
@@ -0,0 +1,56 @@
+import pytest
+from alert import Alert_Index
+from report import Report
+from wind import Wind
+from temperature import Temperature
+from structured_report import Structured_Report, Text_Report_Renderer
+
+
+@pytest.fixture
+def structured_report(forecast):
+    alert_index = Alert_Index()
+    alert_index.add_alerts(forecast.alerts, forecast.location_key)
+    return Report.build(forecast, 0, 18, 24, 2, 4, alert_index).structured_report
+
+
+def round_trips(structured_report):
+    return {"json": Structured_Report.from_json(structured_report.to_json()),
+            "binary": Structured_Report.from_binary(structured_report.to_binary())}
+
+
+def test_both_codecs_round_trip(structured_report):
+    for codec, decoded_report in round_trips(structured_report).items():
+        assert decoded_report.to_dict() == structured_report.to_dict(), codec
+    assert set(structured_report.wind) == set(Wind.METRIC_LIST)
+    assert set(structured_report.temperature) == set(Temperature.METRIC_LIST)
+
+
+def test_both_codecs_round_trip_a_missing_metric(structured_report):
+    del structured_report.wind[Wind.METRIC_LIST[-1]]
+    del structured_report.temperature[Temperature.METRIC_LIST[0]]
+    rendered_report = Text_Report_Renderer().render(structured_report)
+
+    for codec, decoded_report in round_trips(structured_report).items():
+        assert decoded_report.to_dict() == structured_report.to_dict(), codec
+        assert Text_Report_Renderer().render(decoded_report) == rendered_report, codec
+
+
+def test_binary_codec_keeps_integer_and_fractional_values(structured_report):
+    metric = structured_report.wind[Wind.METRIC_LIST[0]]
+    metric["worst"], metric["average"] = 25, 7.5
+    decoded_metric = Structured_Report.from_binary(structured_report.to_binary()).wind[Wind.METRIC_LIST[0]]
+
+    assert (decoded_metric["worst"], decoded_metric["average"]) == (25, 7.5)
+    assert isinstance(decoded_metric["worst"], int)
+
+
+def test_binary_codec_rejects_an_unknown_metric(structured_report):
+    structured_report.wind["pressure"] = structured_report.wind[Wind.METRIC_LIST[0]]
+    with pytest.raises(Exception, match="UNKNOWN METRICS"):
+        structured_report.to_binary()
+
+
+def test_other_schema_versions_are_rejected(structured_report):
+    report_data = structured_report.to_dict() | {"schema_version": Structured_Report.SCHEMA_VERSION - 1}
+    with pytest.raises(Exception, match="UNSUPPORTED REPORT SCHEMA VERSION"):
+        Structured_Report.from_dict(report_data)
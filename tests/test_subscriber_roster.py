@@ -0,0 +1,132 @@
+import os
+import json
+import asyncio
+from outbox import Message_Outbox
+from pipeline import Report_Pipeline
+from refresh_policy import Refresh_Policy
+from subscriber_roster import Subscriber_Roster
+
+
+def build_profile(name, location="40.00,-80.00", **fields):
+    return {"name": name, "phone_number": "+15550000001", "channel": "sms", "location": location, "start_time": 18,
+            "end_time": 24, "top_timeline_count": 2, "rain_check_hours_prior": 4, "days_to_show": 1} | fields
+
+
+def write_toml(path, profiles):
+    lines = []
+    for profile in profiles:
+        lines.append("[[subscribers]]")
+        lines.extend(f"{field} = {json.dumps(value)}" for field, value in profile.items())
+    write_file(path, "\n".join(lines))
+
+
+def write_json(path, profiles):
+    write_file(path, json.dumps({"subscribers": profiles}))
+
+
+def write_file(path, content):
+    # Moves the modification time forward so a rewrite within the same clock tick is still noticed
+    previous_mtime_ns = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    path.write_text(content, encoding="utf-8")
+    modified_ns = max(os.stat(path).st_mtime_ns, previous_mtime_ns + 1_000_000)
+    os.utime(path, ns=(modified_ns, modified_ns))
+
+
+def test_toml_and_json_files_load_the_same_profiles(tmp_path):
+    profiles = [build_profile("alice"), build_profile("bob", location="41.00,-80.00", channel="whatsapp")]
+    write_toml(tmp_path / "subscribers.toml", profiles)
+    write_json(tmp_path / "subscribers.json", profiles)
+
+    for file_name in ("subscribers.toml", "subscribers.json"):
+        subscriber_roster = Subscriber_Roster(str(tmp_path / file_name))
+        assert [profile.to_dict() for profile in subscriber_roster.profiles] == profiles
+        assert subscriber_roster.invalid_profiles == []
+
+
+def test_invalid_profile_is_rejected_without_stopping_the_batch(tmp_path):
+    write_toml(tmp_path / "subscribers.toml", [build_profile("alice"),
+                                               build_profile("bob", phone_number="5550000002", start_time=25),
+                                               build_profile("carol")])
+    subscriber_roster = Subscriber_Roster(str(tmp_path / "subscribers.toml"))
+
+    assert [profile.name for profile in subscriber_roster.profiles] == ["alice", "carol"]
+    assert [(invalid["index"], invalid["name"]) for invalid in subscriber_roster.invalid_profiles] == [(1, "bob")]
+    errors = subscriber_roster.invalid_profiles[0]["errors"]
+    assert "- INVALID PHONE NUMBER '5550000002' (USE +<COUNTRY CODE><NUMBER>)" in errors
+    assert any(error.startswith("- INVALID TIME") for error in errors)
+    assert subscriber_roster.format_validation_report().startswith("Subscribers: 2 valid | 1 invalid\n#1 bob:")
+
+
+def test_unchanged_profiles_are_not_validated_again(tmp_path):
+    path = tmp_path / "subscribers.json"
+    write_json(path, [build_profile("alice"), build_profile("bob")])
+    assert Subscriber_Roster(str(path)).validated_count == 2
+
+    write_json(path, [build_profile("alice"), build_profile("bob"), build_profile("carol")])
+    subscriber_roster = Subscriber_Roster(str(path))
+    assert subscriber_roster.validated_count == 1
+    assert len(subscriber_roster.profiles) == 3
+
+
+def test_roster_reloads_after_the_file_changes(tmp_path):
+    path = tmp_path / "subscribers.toml"
+    write_toml(path, [build_profile("alice")])
+    subscriber_roster = Subscriber_Roster(str(path))
+    assert subscriber_roster.reload_if_changed() is False
+
+    # A new modification time with the same content is read but not compiled again
+    write_toml(path, [build_profile("alice")])
+    assert subscriber_roster.reload_if_changed() is False
+
+    write_toml(path, [build_profile("alice"), build_profile("bob")])
+    assert subscriber_roster.reload_if_changed() is True
+    assert [profile.name for profile in subscriber_roster.profiles] == ["alice", "bob"]
+
+
+class Roster_Editing_Provider:
+    """
+    Answers with the same forecast and rewrites the roster during the first fetch, as an operator editing the file
+    while the pipeline runs
+    """
+    def __init__(self, forecast, path, profiles):
+        self.forecast = forecast
+        self.path = path
+        self.profiles = profiles
+        self.fetched = []
+
+    def fetch_forecast(self, location, days_to_show):
+        if not self.fetched:
+            write_toml(self.path, self.profiles)
+        self.fetched.append(location)
+        return self.forecast
+
+
+def test_watching_pipeline_picks_up_roster_changes(tmp_path, forecast, capsys):
+    path = tmp_path / "subscribers.toml"
+    write_toml(path, [build_profile("alice")])
+    subscriber_roster = Subscriber_Roster(str(path))
+    provider = Roster_Editing_Provider(forecast, path, [build_profile("bob", location="41.00,-80.00"),
+                                                        build_profile("eve", phone_number="invalid")])
+    refresh_policy = Refresh_Policy()
+    report_pipeline = Report_Pipeline(provider, subscriber_roster.profiles, sender=lambda body, to: None,
+                                      outbox=Message_Outbox(str(tmp_path / "outbox.db")),
+                                      refresh_policy=refresh_policy, subscriber_roster=subscriber_roster)
+    asyncio.run(asyncio.wait_for(report_pipeline.watch(max_cycles=2, idle_sleep_seconds=0), timeout=30))
+
+    assert provider.fetched == ["40.00,-80.00", "41.00,-80.00"]
+    assert [profile.name for profile in report_pipeline.profiles] == ["bob"]
+    assert set(refresh_policy.schedules) == {"41.00,-80.00"}
+    assert "#1 eve:" in capsys.readouterr().out
+
+
+def test_unreadable_roster_keeps_the_loaded_profiles(tmp_path, capsys):
+    path = tmp_path / "subscribers.toml"
+    write_toml(path, [build_profile("alice")])
+    subscriber_roster = Subscriber_Roster(str(path))
+    report_pipeline = Report_Pipeline(None, subscriber_roster.profiles, outbox=Message_Outbox(str(tmp_path / "o.db")),
+                                      subscriber_roster=subscriber_roster)
+    write_file(path, "[[subscribers]\nname =")
+
+    assert report_pipeline.reload_profiles() is False
+    assert [profile.name for profile in report_pipeline.profiles] == ["alice"]
+    assert "UNREADABLE SUBSCRIBER FILE" in capsys.readouterr().out
@@ -0,0 +1,121 @@
+import time
+import pytest
+from urllib.parse import urlparse, parse_qs
+from load_test import Weather_API_Stub
+from weather_provider import Forecast, WeatherAPI_Provider, Open_Meteo_Provider, Hedged_Provider
+
+LOCATION = "40.00,-80.00"
+
+
+class Open_Meteo_Stub(Weather_API_Stub):
+    """
+    Serves the Weather_API_Stub forecast of a location in Open-Meteo's format, so both adapters read the same weather
+    """
+    # WeatherAPI condition code -> WMO weather code mapped back to it by Open_Meteo_Provider
+    WMO_CODES = {1000: 0, 1003: 1, 1183: 61, 1273: 96}
+
+    def respond(self, method, path, form):
+        query = parse_qs(urlparse(path).query)
+        weather_data = self.build_forecast(f"{query['latitude'][0]},{query['longitude'][0]}",
+                                           int(query["forecast_days"][0]))
+        hours = [each_hour for forecast_day in weather_data["forecast"]["forecastday"]
+                 for each_hour in forecast_day["hour"]]
+        hourly_fields = {"time": "time_epoch", "apparent_temperature": "feelslike_c",
+                         "relative_humidity_2m": "humidity", "precipitation_probability": "chance_of_rain",
+                         "precipitation": "precip_mm", "wind_speed_10m": "wind_kph", "wind_gusts_10m": "gust_kph",
+                         "uv_index": "uv", "dew_point_2m": "dewpoint_c"}
+        hourly_data = {variable: [each_hour[field] for each_hour in hours] for variable, field in hourly_fields.items()}
+        hourly_data["weather_code"] = [self.WMO_CODES[each_hour["condition"]["code"]] for each_hour in hours]
+        hourly_data["visibility"] = [each_hour["vis_km"] * 1000 for each_hour in hours]
+        day_epochs = [forecast_day["date_epoch"] for forecast_day in weather_data["forecast"]["forecastday"]]
+        daily_data = {"time": day_epochs, "sunrise": [day_epoch + 6 * 3600 + 45 * 60 for day_epoch in day_epochs],
+                      "sunset": [day_epoch + 19 * 3600 + 30 * 60 for day_epoch in day_epochs]}
+        return 200, {"utc_offset_seconds": 0, "timezone": "UTC", "hourly": hourly_data, "daily": daily_data}
+
+
+@pytest.fixture
+def start_stub():
+    stubs = []
+
+    def start(stub_class, **options):
+        stubs.append(stub_class(**options).start())
+        return stubs[-1]
+
+    yield start
+    for stub in stubs:
+        stub.stop()
+
+
+def build_providers(start_stub, primary_options=None, secondary_options=None):
+    primary_stub = start_stub(Weather_API_Stub, **(primary_options or {}))
+    secondary_stub = start_stub(Open_Meteo_Stub, **(secondary_options or {}))
+    place = {"name": f"Court {LOCATION}", "region": "Stub Region", "country": "Stubland"}
+    return (primary_stub, secondary_stub, WeatherAPI_Provider(f"{primary_stub.url}/v1/forecast.json"),
+            Open_Meteo_Provider(f"{secondary_stub.url}/v1/forecast", place))
+
+
+def timed_fetch(provider):
+    started = time.monotonic()
+    forecast = provider.fetch_forecast(LOCATION, 2)
+    return forecast, time.monotonic() - started
+
+
+def test_both_adapters_normalize_into_the_same_forecast(start_stub):
+    _, _, weather_api_provider, open_meteo_provider = build_providers(start_stub)
+    weather_api_forecast = weather_api_provider.fetch_forecast(LOCATION, 2)
+    open_meteo_forecast = open_meteo_provider.fetch_forecast(LOCATION, 2)
+
+    def without_condition_text(forecast):
+        return [{**forecast_day, "hour": [{**each_hour, "condition": each_hour["condition"]["code"]}
+                                          for each_hour in forecast_day["hour"]]}
+                for forecast_day in forecast.forecast_days]
+
+    assert open_meteo_forecast.location == weather_api_forecast.location
+    assert without_condition_text(open_meteo_forecast) == without_condition_text(weather_api_forecast)
+    assert all(set(each_hour) == set(Forecast.HOURLY_FIELDS)
+               for forecast_day in open_meteo_forecast.forecast_days for each_hour in forecast_day["hour"])
+    assert (weather_api_forecast.alerts_available, open_meteo_forecast.alerts_available) == (True, False)
+
+
+def test_primary_answering_within_the_budget_wins(start_stub):
+    _, secondary_stub, primary, secondary = build_providers(start_stub, {"latency_seconds": 0.05})
+    forecast, _ = timed_fetch(Hedged_Provider(primary, secondary, latency_budget_seconds=1))
+
+    assert forecast.provider_name == WeatherAPI_Provider.NAME
+    assert secondary_stub.request_count == 0
+
+
+def test_secondary_wins_when_the_primary_is_slow(start_stub, capsys):
+    _, secondary_stub, primary, secondary = build_providers(start_stub, {"latency_seconds": 1.5})
+    forecast, elapsed = timed_fetch(Hedged_Provider(primary, secondary, latency_budget_seconds=0.1))
+
+    assert forecast.provider_name == Open_Meteo_Provider.NAME
+    assert elapsed < 1.0
+    assert secondary_stub.request_count == 1
+    assert "WEATHER ALERTS ARE UNAVAILABLE" in capsys.readouterr().out
+
+
+def test_failed_primary_is_hedged_without_waiting_for_the_budget(start_stub):
+    _, _, primary, secondary = build_providers(start_stub, {"error_rate": 1.0}, {"latency_seconds": 0.05})
+    forecast, elapsed = timed_fetch(Hedged_Provider(primary, secondary, latency_budget_seconds=2))
+
+    assert forecast.provider_name == Open_Meteo_Provider.NAME
+    assert elapsed < 1.0
+
+
+def test_error_lists_every_failed_provider(start_stub):
+    _, _, primary, secondary = build_providers(start_stub, {"error_rate": 1.0}, {"error_rate": 1.0})
+    with pytest.raises(Exception, match="ALL PROVIDERS FAILED") as error:
+        Hedged_Provider(primary, secondary, latency_budget_seconds=1).fetch_forecast(LOCATION, 2)
+
+    assert str(error.value).count("500 error") == 2
+
+
+def test_providers_slower_than_the_request_timeout_are_abandoned(start_stub):
+    _, _, primary, secondary = build_providers(start_stub, {"latency_seconds": 1.5}, {"latency_seconds": 1.5})
+    hedged_provider = Hedged_Provider(primary, secondary, latency_budget_seconds=0.1, request_timeout_seconds=0.3)
+    started = time.monotonic()
+    with pytest.raises(Exception, match="NO ANSWER WITHIN 0.3 SECONDS"):
+        hedged_provider.fetch_forecast(LOCATION, 2)
+
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,87 @@
+from functools import lru_cache
+from datetime import datetime
+
+
+class Time_Lookup:
+    """
+    Shared time tables and memoized parsers. Hours of the day are handled as integers and minutes past midnight, and
+    every raw API string (hourly times, sunrise/sunset, alert timestamps) is parsed once per process no matter how many
+    reports read it
+    """
+    # Hour setting (0-24) -> display label; 24 is midnight at the end of the current day and displays as 23:59
+    HOUR_LABELS = tuple(f"{hour:02d}:00" for hour in range(24)) + ("23:59",)
+    # Hour setting (0-24) -> minutes past midnight of the time it displays
+    HOUR_MINUTES = tuple(hour * 60 for hour in range(24)) + (23 * 60 + 59,)
+    CACHE_SIZE = 4096
+
+    @staticmethod
+    def hour_label(hour):
+        """
+        Looks up the display label of an hour setting
+
+        :param hour: An integer hour in 24-hour format (0-24)
+
+        :return: String formatted as 'HH:MM' (24 returns '23:59')
+        """
+        return Time_Lookup.HOUR_LABELS[hour]
+
+    @staticmethod
+    def hour_minutes(hour):
+        """
+        Looks up the minutes past midnight of an hour setting
+
+        :param hour: An integer hour in 24-hour format (0-24)
+
+        :return: Integer minutes past midnight (24 returns the minutes of 23:59)
+        """
+        return Time_Lookup.HOUR_MINUTES[hour]
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def parse_hour_time(raw_time):
+        """
+        Parses the local time of an hourly forecast entry
+
+        :param raw_time: Hourly time formatted as 'YYYY-MM-DD HH:MM'
+
+        :return: Tuple of the minutes past midnight and the 'HH:MM' label
+        """
+        return int(raw_time[11:13]) * 60 + int(raw_time[14:16]), raw_time[11:16]
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def parse_clock_label(clock_label):
+        """
+        Converts an 'HH:MM' label back to minutes past midnight
+
+        :param clock_label: Time formatted as 'HH:MM'
+
+        :return: Integer minutes past midnight
+        """
+        parsed_time = datetime.strptime(clock_label, "%H:%M")
+        return parsed_time.hour * 60 + parsed_time.minute
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def parse_astro_time(raw_time):
+        """
+        Converts a sunrise or sunset time from the API to military time
+
+        :param raw_time: Time in standard 12-hour format (e.g. '07:12 AM')
+
+        :return: Time in military (24-hour) format
+        """
+        return datetime.strptime(raw_time, "%I:%M %p").strftime("%H:%M")
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def parse_alert_timestamp(raw_timestamp):
+        """
+        Parses an alert's effective or expiry timestamp
+
+        :param raw_timestamp: ISO 8601 timestamp with a UTC offset (e.g. '2026-10-19T18:00:00-04:00')
+
+        :return: Tuple of the display label formatted as 'YYYY-MM-DD (HH:MM)' and the Unix timestamp
+        """
+        parsed_timestamp = datetime.strptime(raw_timestamp, "%Y-%m-%dT%H:%M:%S%z")
+        return parsed_timestamp.strftime("%Y-%m-%d (%H:%M)"), int(parsed_timestamp.timestamp())
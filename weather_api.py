@@ -1,5 +1,7 @@
 import requests
 import os
+import time
+from threading import Lock
 from dotenv import load_dotenv
 
 
@@ -7,23 +9,70 @@ class Weather_API:
     """
     A class to interact with a weather API and fetch forecast data
     """
+    # Responses younger than this are served from the cache instead of calling the API again
+    CACHE_TTL_SECONDS = 600
+    # Seconds to wait for the server to connect and to send each part of the response
+    REQUEST_TIMEOUT_SECONDS = 10
+    SESSION = requests.Session()
+    RESPONSE_CACHE = {}
+    CACHE_LOCK = Lock()
+
     @staticmethod
-    def fetch_weather_forecast(days_to_show):
+    def fetch_weather_forecast(days_to_show, location=None):
         """
         Sends a request to the API server with specific parameters to retrieve the weather forecast for the current day
         and the next two days
 
         :param days_to_show: Number of days to include in forecast
+        :param location: Coordinates formatted as 'lat,lon' (defaults to the LAT and LON environment variables)
 
         :return: The API's weather forecast response in JSON format
         """
+        load_dotenv()
+        return Weather_API.fetch_json(os.getenv("URL"), {"q": location or f"{os.getenv('LAT')},{os.getenv('LON')}",
+                                                         "key": os.getenv("API_KEY"), "days": days_to_show,
+                                                         "alerts": "yes"})
+
+    @staticmethod
+    def fetch_weather_alerts(location, max_age_seconds):
+        """
+        Retrieves only the active weather alerts for a location. Uses the ALERT_URL environment variable when it is set
+        (e.g. WeatherAPI's alerts endpoint), otherwise falls back to a one day forecast request
+
+        :param location: Coordinates formatted as 'lat,lon'
+        :param max_age_seconds: Oldest cached response (in seconds) that may be reused
+
+        :return: The API's response in JSON format, containing the 'alerts' key
+        """
+        load_dotenv()
+        return Weather_API.fetch_json(os.getenv("ALERT_URL") or os.getenv("URL"),
+                                      {"q": location, "key": os.getenv("API_KEY"), "days": 1, "alerts": "yes"},
+                                      max_age_seconds)
+
+    @staticmethod
+    def fetch_json(url, params, max_age_seconds=None):
+        """
+        Sends a GET request through the shared HTTP session, reusing a cached response when it is recent enough
+
+        :param url: Endpoint of the weather API
+        :param params: Query parameters of the request
+        :param max_age_seconds: Oldest cached response (in seconds) that may be reused (defaults to CACHE_TTL_SECONDS)
+
+        :return: The API's response in JSON format
+        """
+        max_age_seconds = Weather_API.CACHE_TTL_SECONDS if max_age_seconds is None else max_age_seconds
+        cache_key = (url, tuple(sorted((key, str(value)) for key, value in params.items())))
+        with Weather_API.CACHE_LOCK:
+            cached_response = Weather_API.RESPONSE_CACHE.get(cache_key)
+        if cached_response and time.monotonic() - cached_response[0] <= max_age_seconds:
+            return cached_response[1]
+
         try:
-            load_dotenv()
-            weather_response = requests.get(os.getenv("URL"), params={"q": f"{os.getenv('LAT')},{os.getenv('LON')}",
-                                                                      "key": os.getenv("API_KEY"), "days": days_to_show,
-                                                                      "alerts": "yes"})
+            weather_response = Weather_API.SESSION.get(url, params=params, timeout=Weather_API.REQUEST_TIMEOUT_SECONDS)
             weather_response.raise_for_status()
             weather_response_json = weather_response.json()
+        except requests.exceptions.Timeout:
+            raise Exception(f"TIMEOUT ERROR: NO RESPONSE WITHIN {Weather_API.REQUEST_TIMEOUT_SECONDS} SECONDS")
         except requests.exceptions.ConnectionError:
             raise Exception(f"NETWORK ERROR: FAILED TO CONNECT TO SERVER")
         except requests.exceptions.HTTPError:
@@ -33,4 +82,27 @@ class Weather_API:
         except requests.exceptions.RequestException as error:
             raise Exception(f"MISCELLANEOUS ERROR: {error}")
         else:
+            with Weather_API.CACHE_LOCK:
+                # Re-inserting keeps the cache ordered from the oldest to the newest response
+                Weather_API.RESPONSE_CACHE.pop(cache_key, None)
+                Weather_API.RESPONSE_CACHE[cache_key] = (time.monotonic(), weather_response_json)
+                Weather_API.evict_expired()
             return weather_response_json
+
+    @staticmethod
+    def evict_expired():
+        """
+        Drops the cached responses older than CACHE_TTL_SECONDS. The cache is ordered by age, so the scan stops at the
+        first response that is still fresh. Must be called while holding CACHE_LOCK
+
+        :return: Number of responses dropped
+        """
+        oldest_allowed = time.monotonic() - Weather_API.CACHE_TTL_SECONDS
+        expired_keys = []
+        for cache_key, (stored_at, _) in Weather_API.RESPONSE_CACHE.items():
+            if stored_at >= oldest_allowed:
+                break
+            expired_keys.append(cache_key)
+        for cache_key in expired_keys:
+            del Weather_API.RESPONSE_CACHE[cache_key]
+        return len(expired_keys)
@@ -0,0 +1,300 @@
+import os
+import json
+import hashlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait, as_completed
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from weather_api import Weather_API
+
+
+class Forecast:
+    """
+    Internal forecast model shared by every provider. Each forecast day holds 'date', 'date_epoch', 'astro' (sunrise
+    and sunset in 12-hour format) and 24 'hour' entries with the keys listed in HOURLY_FIELDS. 'alerts_available' is
+    False when the provider has no alert feed, so an empty alert list means "unknown" rather than "no alerts"
+    """
+    HOURLY_FIELDS = ("time", "time_epoch", "wind_kph", "gust_kph", "feelslike_c", "humidity", "uv", "chance_of_rain",
+                     "will_it_rain", "precip_mm", "vis_km", "dewpoint_c", "condition")
+
+    def __init__(self, location, forecast_days, alerts, provider_name, alerts_available=True):
+        self.location = location
+        self.forecast_days = forecast_days
+        self.alerts = alerts
+        self.provider_name = provider_name
+        self.alerts_available = alerts_available
+        self.payload_hash = None
+        # Built on first use by Forecast_Matrix.for_forecast and Alert_Index.for_forecast and shared by every report
+        # of the forecast
+        self.forecast_matrix = None
+        self.alert_index = None
+
+    @staticmethod
+    def hash_payload(payload):
+        """
+        Hashes forecast data so identical forecasts produce identical cache keys
+
+        :param payload: JSON-compatible forecast data
+
+        :return: Hexadecimal SHA-256 digest of the payload
+        """
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+    def build_payload_hash(self):
+        """
+        Hashes the forecast's content once so every report rendered from it can share cache entries
+
+        :return: Hexadecimal SHA-256 digest of the location, forecast days, alerts and their availability
+        """
+        if self.payload_hash is None:
+            self.payload_hash = self.hash_payload([self.location, self.forecast_days, self.alerts,
+                                                   self.alerts_available])
+        return self.payload_hash
+
+    @property
+    def location_key(self):
+        """
+        Identifies the forecast's location by its coordinates
+
+        :return: String formatted as 'lat,lon'
+        """
+        return f"{self.location['lat']},{self.location['lon']}"
+
+
+class Weather_Provider(ABC):
+    """
+    Base class of the weather forecast backends. Adapters fetch their own JSON format and normalize it into a Forecast
+    """
+    NAME = None
+
+    @abstractmethod
+    def fetch_forecast(self, location, days_to_show):
+        """
+        Retrieves and normalizes the forecast of a location
+
+        :param location: Coordinates formatted as 'lat,lon' (None uses the LAT and LON environment variables)
+        :param days_to_show: Number of days to include in forecast
+
+        :return: A Forecast instance
+        """
+
+    @staticmethod
+    def resolve_location(location):
+        """
+        Falls back to the coordinates stored in the environment when no location is given
+
+        :param location: Coordinates formatted as 'lat,lon' or None
+
+        :return: Coordinates formatted as 'lat,lon'
+        """
+        load_dotenv()
+        return location or f"{os.getenv('LAT')},{os.getenv('LON')}"
+
+    @staticmethod
+    def create(name, **options):
+        """
+        Builds a provider from its name
+
+        :param name: Provider name ('weatherapi' or 'open-meteo')
+        :param options: Keyword arguments passed to the provider's constructor
+
+        :return: A Weather_Provider instance
+        """
+        providers = {WeatherAPI_Provider.NAME: WeatherAPI_Provider, Open_Meteo_Provider.NAME: Open_Meteo_Provider}
+        if name not in providers:
+            raise Exception(f"- UNKNOWN WEATHER PROVIDER '{name}' (CHOOSE FROM {', '.join(providers)})")
+        return providers[name](**options)
+
+
+class WeatherAPI_Provider(Weather_Provider):
+    """
+    Adapter for the WeatherAPI.com forecast endpoint
+    """
+    NAME = "weatherapi"
+
+    def __init__(self, url=None):
+        self.url = url
+
+    def fetch_forecast(self, location, days_to_show):
+        """
+        Retrieves the WeatherAPI.com forecast and keeps the fields of the internal model
+
+        :param location: Coordinates formatted as 'lat,lon' (None uses the LAT and LON environment variables)
+        :param days_to_show: Number of days to include in forecast
+
+        :return: A Forecast instance
+        """
+        location = self.resolve_location(location)
+        weather_data = Weather_API.fetch_json(self.url or os.getenv("URL"),
+                                              {"q": location, "key": os.getenv("API_KEY"), "days": days_to_show,
+                                               "alerts": "yes"})
+        forecast_days = [{"date": forecast_day["date"], "date_epoch": forecast_day["date_epoch"],
+                          "astro": {"sunrise": forecast_day["astro"]["sunrise"],
+                                    "sunset": forecast_day["astro"]["sunset"]},
+                          "hour": [{field: each_hour.get(field) for field in Forecast.HOURLY_FIELDS}
+                                   for each_hour in forecast_day["hour"]]}
+                         for forecast_day in weather_data["forecast"]["forecastday"]]
+        location_data = weather_data["location"]
+        return Forecast({"name": location_data["name"], "region": location_data["region"],
+                         "country": location_data["country"], "lat": location_data["lat"],
+                         "lon": location_data["lon"], "tz_id": location_data.get("tz_id")},
+                        forecast_days, weather_data.get("alerts", {}).get("alert", []), self.NAME)
+
+
+class Open_Meteo_Provider(Weather_Provider):
+    """
+    Adapter for the Open-Meteo forecast endpoint, which needs no API key but has no place names or alerts
+    """
+    NAME = "open-meteo"
+    DEFAULT_URL = "https://api.open-meteo.com/v1/forecast"
+    HOURLY_VARIABLES = ("apparent_temperature", "relative_humidity_2m", "precipitation_probability", "precipitation",
+                        "weather_code", "wind_speed_10m", "wind_gusts_10m", "uv_index", "visibility", "dew_point_2m")
+    # Probability (%) from which an hour is flagged as rainy, mirroring WeatherAPI's 'will_it_rain'
+    WILL_IT_RAIN_PROBABILITY = 50
+    # WMO weather interpretation code -> closest WeatherAPI condition code and text
+    WMO_CONDITIONS = {0: (1000, "Clear"), 1: (1003, "Partly cloudy"), 2: (1003, "Partly cloudy"),
+                      3: (1009, "Overcast"), 45: (1135, "Fog"), 48: (1147, "Freezing fog"),
+                      51: (1153, "Light drizzle"), 53: (1153, "Light drizzle"), 55: (1153, "Light drizzle"),
+                      56: (1168, "Freezing drizzle"), 57: (1171, "Heavy freezing drizzle"), 61: (1183, "Light rain"),
+                      63: (1189, "Moderate rain"), 65: (1195, "Heavy rain"), 66: (1198, "Light freezing rain"),
+                      67: (1201, "Moderate or heavy freezing rain"), 71: (1213, "Light snow"),
+                      73: (1219, "Moderate snow"), 75: (1225, "Heavy snow"), 77: (1237, "Ice pellets"),
+                      80: (1240, "Light rain shower"), 81: (1243, "Moderate or heavy rain shower"),
+                      82: (1246, "Torrential rain shower"), 85: (1255, "Light snow showers"),
+                      86: (1258, "Moderate or heavy snow showers"), 95: (1276, "Moderate or heavy rain with thunder"),
+                      96: (1273, "Patchy light rain with thunder"), 99: (1276, "Moderate or heavy rain with thunder")}
+
+    def __init__(self, url=None, place=None):
+        self.url = url
+        self.place = place
+
+    def convert_epoch(self, epoch, utc_offset_seconds, time_format):
+        """
+        Converts a Unix timestamp to the location's local time
+
+        :param epoch: Unix timestamp
+        :param utc_offset_seconds: Offset of the location's time zone from UTC
+        :param time_format: strftime format of the result
+
+        :return: Formatted local time
+        """
+        return datetime.fromtimestamp(epoch + utc_offset_seconds, tz=timezone.utc).strftime(time_format)
+
+    def fetch_forecast(self, location, days_to_show):
+        """
+        Retrieves the Open-Meteo forecast and converts it into the internal model
+
+        :param location: Coordinates formatted as 'lat,lon' (None uses the LAT and LON environment variables)
+        :param days_to_show: Number of days to include in forecast
+
+        :return: A Forecast instance
+        """
+        location = self.resolve_location(location)
+        latitude, longitude = location.split(",")
+        weather_data = Weather_API.fetch_json(self.url or os.getenv("OPEN_METEO_URL") or self.DEFAULT_URL,
+                                              {"latitude": latitude, "longitude": longitude,
+                                               "hourly": ",".join(self.HOURLY_VARIABLES),
+                                               "daily": "sunrise,sunset", "timezone": "auto",
+                                               "timeformat": "unixtime", "wind_speed_unit": "kmh",
+                                               "forecast_days": days_to_show})
+        utc_offset_seconds = weather_data.get("utc_offset_seconds", 0)
+        hourly_data = weather_data["hourly"]
+        daily_data = weather_data["daily"]
+
+        forecast_days = []
+        for day_index, day_epoch in enumerate(daily_data["time"]):
+            hourly_forecast_data = []
+            for hour_index in range(day_index * 24, day_index * 24 + 24):
+                chance_of_rain = hourly_data["precipitation_probability"][hour_index] or 0
+                code, text = self.WMO_CONDITIONS.get(hourly_data["weather_code"][hour_index], (1000, "Clear"))
+                visibility = hourly_data["visibility"][hour_index]
+                hourly_forecast_data.append({
+                    "time": self.convert_epoch(hourly_data["time"][hour_index], utc_offset_seconds, "%Y-%m-%d %H:%M"),
+                    "time_epoch": hourly_data["time"][hour_index],
+                    "wind_kph": hourly_data["wind_speed_10m"][hour_index] or 0,
+                    "gust_kph": hourly_data["wind_gusts_10m"][hour_index] or 0,
+                    "feelslike_c": hourly_data["apparent_temperature"][hour_index] or 0,
+                    "humidity": hourly_data["relative_humidity_2m"][hour_index] or 0,
+                    "uv": hourly_data["uv_index"][hour_index] or 0,
+                    "chance_of_rain": chance_of_rain,
+                    "will_it_rain": 1 if chance_of_rain >= self.WILL_IT_RAIN_PROBABILITY else 0,
+                    "precip_mm": hourly_data["precipitation"][hour_index] or 0,
+                    "vis_km": None if visibility is None else round(visibility / 1000, 1),
+                    "dewpoint_c": hourly_data["dew_point_2m"][hour_index],
+                    "condition": {"text": text, "code": code},
+                })
+            forecast_days.append({
+                "date": self.convert_epoch(day_epoch, utc_offset_seconds, "%Y-%m-%d"),
+                "date_epoch": day_epoch,
+                "astro": {"sunrise": self.convert_epoch(daily_data["sunrise"][day_index], utc_offset_seconds,
+                                                        "%I:%M %p"),
+                          "sunset": self.convert_epoch(daily_data["sunset"][day_index], utc_offset_seconds,
+                                                       "%I:%M %p")},
+                "hour": hourly_forecast_data,
+            })
+
+        place = self.place or {"name": os.getenv("LOCATION_NAME") or location,
+                               "region": os.getenv("LOCATION_REGION", ""),
+                               "country": os.getenv("LOCATION_COUNTRY", "")}
+        return Forecast({"name": place["name"], "region": place["region"], "country": place["country"],
+                         "lat": float(latitude), "lon": float(longitude), "tz_id": weather_data.get("timezone")},
+                        forecast_days, [], self.NAME, alerts_available=False)
+
+
+class Hedged_Provider(Weather_Provider):
+    """
+    Sends the request to a primary provider and, if it has not answered within a latency budget (or failed), also to a
+    secondary provider, returning the first good answer. A request still running after 'request_timeout_seconds' is
+    abandoned; its thread is freed once Weather_API's own HTTP timeout fires
+    """
+    EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedged-request")
+    REQUEST_TIMEOUT_SECONDS = Weather_API.REQUEST_TIMEOUT_SECONDS
+
+    def __init__(self, primary_provider, secondary_provider, latency_budget_seconds=1.5,
+                 request_timeout_seconds=REQUEST_TIMEOUT_SECONDS):
+        self.primary_provider = primary_provider
+        self.secondary_provider = secondary_provider
+        self.latency_budget_seconds = latency_budget_seconds
+        self.request_timeout_seconds = request_timeout_seconds
+        self.NAME = f"{primary_provider.NAME}+{secondary_provider.NAME}"
+
+    def fetch_forecast(self, location, days_to_show):
+        """
+        Retrieves the forecast from whichever provider answers successfully first
+
+        :param location: Coordinates formatted as 'lat,lon' (None uses the LAT and LON environment variables)
+        :param days_to_show: Number of days to include in forecast
+
+        :return: A Forecast instance
+        """
+        primary_request = self.EXECUTOR.submit(self.primary_provider.fetch_forecast, location, days_to_show)
+        finished, _ = wait([primary_request], timeout=self.latency_budget_seconds)
+        if finished and primary_request.exception() is None:
+            return self.check_alerts(primary_request.result())
+
+        secondary_request = self.EXECUTOR.submit(self.secondary_provider.fetch_forecast, location, days_to_show)
+        pending_requests = [secondary_request] if finished else [primary_request, secondary_request]
+        errors = [primary_request.exception()] if finished else []
+        try:
+            for request in as_completed(pending_requests, timeout=self.request_timeout_seconds):
+                if request.exception() is None:
+                    return self.check_alerts(request.result())
+                errors.append(request.exception())
+        except TimeoutError:
+            for request in pending_requests:
+                request.cancel()
+            errors.append(f"NO ANSWER WITHIN {self.request_timeout_seconds} SECONDS")
+        raise Exception(f"ALL PROVIDERS FAILED: {' | '.join(str(error) for error in errors)}")
+
+    def check_alerts(self, forecast):
+        """
+        Warns when the answering provider has no alert feed, so a report without alerts is not mistaken for a clear one
+
+        :param forecast: The Forecast returned by one of the providers
+
+        :return: The same Forecast
+        """
+        if not forecast.alerts_available:
+            print(f"- WARNING: {forecast.provider_name.upper()} ANSWERED FOR {forecast.location_key}; "
+                  f"WEATHER ALERTS ARE UNAVAILABLE")
+        return forecast